@@ -1,4 +1,3 @@
-import requests
 from bs4 import BeautifulSoup
 import re
 import time
@@ -8,11 +7,18 @@ import os
 import urllib.parse
 from datetime import datetime
 import csv
+import sys
+from concurrent.futures import Future
 from urllib.parse import urljoin, urlparse
-import urllib.request
+
+# Shared fetch helpers live in the v2 scraper
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scraper-v2'))
+from http_session import get_session
+from download_manager import DownloadManager
+from report_store import get_report_store
 
 class FinancialStatementFinder:
-    def __init__(self, download_folder="downloaded_reports"):
+    def __init__(self, download_folder="downloaded_reports", download_workers=4, max_file_mb=200, max_total_mb=None):
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
             "Accept-Language": "en-US,en;q=0.9",
@@ -23,6 +29,16 @@ class FinancialStatementFinder:
         self.download_folder = download_folder
         os.makedirs(self.download_folder, exist_ok=True)
         
+        # Reports are downloaded in the background, resumably, into a deduplicated store;
+        # download_folder gets a link to each one
+        self.store = get_report_store()
+        self.downloads = DownloadManager(
+            store=self.store,
+            workers=download_workers,
+            max_file_bytes=max_file_mb * 1024 * 1024,
+            max_total_bytes=max_total_mb * 1024 * 1024 if max_total_mb else None
+        )
+        
         # Current year
         self.current_year = datetime.now().year
     
@@ -39,7 +55,7 @@ class FinancialStatementFinder:
             encoded_query = urllib.parse.quote_plus(search_query)
             search_url = f"https://duckduckgo.com/html/?q={encoded_query}"
             
-            response = requests.get(search_url, headers=self.headers, timeout=15)
+            response = get_session().get(search_url, headers=self.headers, timeout=15)
             if response.status_code != 200:
                 print(f"  Search failed with status code: {response.status_code}")
                 return []
@@ -89,14 +105,27 @@ class FinancialStatementFinder:
             print(f"  Error in search: {e}")
             return []
     
-    def find_and_download_report(self, url, company_name):
+    def download_outcome(self, result, candidate):
+        """Turn a DownloadResult into (path, year), falling back to the URL if the download failed"""
+        if result.path:
+            print(f"  Saved {result.size / (1024 * 1024):.1f} MB to {result.path} ({result.source})")
+            return result.path, candidate['year']
+        
+        print(f"  Error downloading file {result.url}: {result.error}")
+        # Return the URL even if download failed
+        return candidate['url'], candidate['year']
+    
+    def find_and_download_report(self, url, company_name, wait=True):
         """
         Find download links and download the PDF report
+        
+        With wait=False the download runs in the background and a Future of its
+        DownloadResult is returned in place of the path.
         """
         try:
             print(f"  Checking page: {url}")
             
-            response = requests.get(url, headers=self.headers, timeout=15)
+            response = get_session().get(url, headers=self.headers, timeout=15)
             if response.status_code != 200:
                 print(f"  Failed to load page: {response.status_code}")
                 return None, None
@@ -216,27 +245,17 @@ class FinancialStatementFinder:
                     filename = f"{safe_company_name}_annual_report_{best_candidate['year']}.pdf"
                     filepath = os.path.join(self.download_folder, filename)
                     
-                    try:
-                        # Download the file
-                        print(f"  Downloading to: {filepath}")
-                        
-                        # Use a different User-Agent for file download
-                        download_headers = {
-                            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                            "Accept": "application/pdf,*/*",
-                            "Referer": url  # Add referer to appear legitimate
-                        }
-                        
-                        req = urllib.request.Request(best_candidate['url'], headers=download_headers)
-                        with urllib.request.urlopen(req) as response, open(filepath, 'wb') as out_file:
-                            out_file.write(response.read())
-                        
-                        return filepath, best_candidate['year']
-                        
-                    except Exception as e:
-                        print(f"  Error downloading file: {e}")
-                        # Return the URL even if download failed
-                        return best_candidate['url'], best_candidate['year']
+                    # Download the file
+                    print(f"  Downloading to: {filepath}")
+                    future = self.downloads.submit(
+                        best_candidate['url'], filepath,
+                        headers={"Referer": url}  # Add referer to appear legitimate
+                    )
+                    future.candidate = best_candidate
+                    
+                    if not wait:
+                        return future, best_candidate['year']
+                    return self.download_outcome(future.result(), best_candidate)
             
             # If we couldn't find a direct PDF link, check if this is an investor relations page
             # that might have links to annual reports
@@ -255,7 +274,7 @@ class FinancialStatementFinder:
                         
                     # Recursively check this page (with a depth limit of 1)
                     if href != url:  # Avoid infinite recursion
-                        return self.find_and_download_report(href, company_name)
+                        return self.find_and_download_report(href, company_name, wait)
             
             return None, None
             
@@ -263,9 +282,11 @@ class FinancialStatementFinder:
             print(f"  Error processing page {url}: {e}")
             return None, None
     
-    def process_company(self, company_name):
+    def process_company(self, company_name, wait=True):
         """
         Process a single company to find and download its annual report
+        
+        With wait=False the report path is a Future of the running download.
         """
         print(f"Processing: {company_name}")
         
@@ -290,7 +311,7 @@ class FinancialStatementFinder:
         
         # Try each search result
         for result in search_results:
-            report_path, year = self.find_and_download_report(result['url'], company_name)
+            report_path, year = self.find_and_download_report(result['url'], company_name, wait)
             
             if report_path:
                 return report_path, year
@@ -317,6 +338,20 @@ class FinancialStatementFinder:
             companies = company_list
             
         total = len(companies)
+        pending = []  # (result row, download future)
+        
+        def save_results():
+            with open(output_file, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=['company_name', 'report_path', 'year', 'timestamp'])
+                writer.writeheader()
+                writer.writerows(results)
+        
+        def collect_downloads(block):
+            # Finished downloads replace the report URL with the local path
+            for row, future in list(pending):
+                if block or future.done():
+                    row['report_path'], row['year'] = self.download_outcome(future.result(), future.candidate)
+                    pending.remove((row, future))
         
         for i, company in enumerate(companies):
             print(f"Processing {i+1}/{total}: {company}")
@@ -324,21 +359,29 @@ class FinancialStatementFinder:
             # Add random delay between companies to avoid being blocked
             if i > 0:
                 time.sleep(random.uniform(2, 5))
-                
-            report_path, year = self.process_company(company)
             
-            results.append({
+            # The download continues while the next company is searched
+            report_path, year = self.process_company(company, wait=False)
+            
+            row = {
                 'company_name': company,
                 'report_path': report_path,
                 'year': year,
                 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            })
+            }
+            if isinstance(report_path, Future):
+                row['report_path'] = report_path.candidate['url']
+                pending.append((row, report_path))
+            results.append(row)
             
             # Save intermediate results after each company
-            with open(output_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=['company_name', 'report_path', 'year', 'timestamp'])
-                writer.writeheader()
-                writer.writerows(results)
+            collect_downloads(block=False)
+            save_results()
+        
+        collect_downloads(block=True)
+        save_results()
+        self.downloads.print_stats()
+        self.store.print_stats()
                 
         return pd.DataFrame(results)
 
@@ -1,25 +1,106 @@
 # annual_report_finder.py
 import argparse
-import json
 import csv
 import time
 import random
 import os
-import sys
-from google_search import search_google
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from google_search import search_google, is_search_cached
 from link_processor import is_pdf_link, extract_year, extract_pdf_links
-from result_ranker import rank_results
-from api_tracker import APITracker
-from config_handler import get_api_credentials, get_setting, CONFIG_FILE
+from pdf_sniffer import sniff_pdf
+from result_ranker import rank_results, is_company_host
+from url_canonical import dedupe_urls, dedupe_results
+from api_tracker import get_tracker
+from http_session import print_connection_stats
+from response_cache import get_response_cache
+from negative_cache import configure_negative_cache, get_negative_cache
+from html_links import available_backends, get_backend, set_backend
+from report_keywords import VOCABULARIES, set_vocabulary
+from parse_pool import configure_parse_pool, get_parse_pool, PARSE_DEFAULTS
+from search_cache import get_search_cache
+from sitemap_index import get_sitemap_index, origin_of, MAX_SITEMAP_REPORTS
+from results_journal import ResultsJournal, journal_path_for, journal_to_json
+from config_handler import get_api_credentials, get_setting, watch_config, CONFIG_FILE
 
-def process_company(company_name, max_results=10, api_key=None, search_engine_id=None):
+def process_search_hit(url, extract=True):
+    """Turn one search hit into result entries, extracting PDFs if it is a web page"""
+    # Check if it's a PDF
+    is_pdf = is_pdf_link(url)
+    year = extract_year(url)
+    
+    entries = [{
+        'url': url,
+        'is_pdf': is_pdf,
+        'year': year,
+        'source': 'search'
+    }]
+    
+    # If not a PDF, try to extract PDFs from the page
+    if not is_pdf and extract:
+        print(f"  Extracting PDFs from: {url}")
+        pdf_links = extract_pdf_links(url)
+        
+        for pdf in pdf_links:
+            entries.append({
+                'url': pdf['url'],
+                'text': pdf.get('text', ''),
+                'is_pdf': True,
+                'year': pdf.get('year'),
+                'keyword_hits': pdf.get('keyword_hits'),
+                'source': f"extracted from {url}"
+            })
+    
+    return entries
+
+def sitemap_reports(origin):
+    """Recent annual report PDFs from the sitemaps of `origin`, as result entries"""
+    try:
+        reports = get_sitemap_index().report_pdfs(origin)
+    except Exception as e:
+        print(f"  Could not use the sitemaps of {origin}: {e}")
+        return []
+    if len(reports) > MAX_SITEMAP_REPORTS:
+        print(f"  Ignoring the sitemaps of {origin}: {len(reports)} recent reports, not one company's")
+        return []
+    if reports:
+        print(f"  {len(reports)} recent reports in the sitemaps of {origin}")
+    
+    return [{
+        'url': report['url'],
+        'text': report['text'],
+        'is_pdf': True,
+        'year': report['year'],
+        'source': 'sitemap'
+    } for report in reports]
+
+def apply_pdf_metadata(entry):
+    """Check a PDF without a year in its URL with a Range request and take the year from its metadata"""
+    try:
+        info, _ = sniff_pdf(entry['url'])
+    except Exception as e:
+        print(f"  Could not sniff {entry['url']}: {e}")
+        return
+    
+    if info.is_pdf is False:
+        # Dead link or an HTML page behind a .pdf URL
+        print(f"  Not a PDF (status {info.status}): {entry['url']}")
+        entry['is_pdf'] = False
+    elif info.is_pdf:
+        if info.title:
+            entry['title'] = info.title
+        if info.year:
+            print(f"  Year {info.year} from PDF {info.year_source}: {entry['url']}")
+            entry['year'] = info.year
+            entry['year_source'] = info.year_source
+
+def process_company(company_name, max_results=10, api_key=None, search_engine_id=None, page_workers=1):
     """Process a single company to find its annual reports"""
     print(f"\nProcessing: {company_name}")
     
-    # Check API quota first
-    tracker = APITracker()
+    # Check API quota first (cached searches are free)
+    tracker = get_tracker()
     daily_limit = get_setting('daily_api_limit', None, 100)
-    if not tracker.can_make_request(daily_limit):
+    if not tracker.can_make_request(daily_limit) and not is_search_cached(company_name, max_results, api_key, search_engine_id):
         print(f"Daily API limit reached ({daily_limit} requests). Try again tomorrow.")
         return []
     
@@ -30,43 +111,120 @@ def process_company(company_name, max_results=10, api_key=None, search_engine_id
         print(f"No search results found for {company_name}")
         return []
     
+    # The same page is often found as http/https or with tracking parameters
+    urls = dedupe_urls(urls)
     processed_results = []
     
-    # Process each search result
-    for url in urls:
-        # Check if it's a PDF
-        is_pdf = is_pdf_link(url)
-        year = extract_year(url)
-        
-        processed_results.append({
-            'url': url,
-            'is_pdf': is_pdf,
-            'year': year,
-            'source': 'search'
-        })
-        
-        # If not a PDF, try to extract PDFs from the page
-        if not is_pdf:
-            print(f"  Extracting PDFs from: {url}")
-            pdf_links = extract_pdf_links(url)
+    # A site's sitemaps list its reports without fetching any of its pages. Only the
+    # company's own sites: news and filing sites have huge sitemaps of others' reports
+    sitemap_origins = []
+    if get_setting('use_sitemaps', None, True):
+        sitemap_origins = [origin for origin in dict.fromkeys(origin_of(url) for url in urls)
+                           if is_company_host(origin, company_name)]
+    
+    if page_workers > 1:
+        with ThreadPoolExecutor(max_workers=page_workers) as executor:
+            # Sitemap lookups are queued first, so a hit waiting for one never waits on a queued task
+            lookups = {origin: executor.submit(sitemap_reports, origin) for origin in sitemap_origins}
+            
+            def process_hit(url):
+                lookup = lookups.get(origin_of(url))
+                # Pages on a site whose sitemaps listed reports are not fetched for their links
+                return process_search_hit(url, extract=lookup is None or not lookup.result())
             
-            for pdf in pdf_links:
-                processed_results.append({
-                    'url': pdf['url'],
-                    'text': pdf.get('text', ''),
-                    'is_pdf': True,
-                    'year': pdf.get('year'),
-                    'source': f"extracted from {url}"
-                })
+            # Fetch all result pages at once; map() keeps the search order
+            hits = list(executor.map(process_hit, urls))
+            for lookup in lookups.values():
+                processed_results.extend(lookup.result())
+            for entries in hits:
+                processed_results.extend(entries)
+    else:
+        reports = {origin: sitemap_reports(origin) for origin in sitemap_origins}
+        for entries in reports.values():
+            processed_results.extend(entries)
         
-        # Add a small delay
-        time.sleep(random.uniform(0.5, 1.5))
+        # Process each search result
+        for url in urls:
+            processed_results.extend(process_search_hit(url, extract=not reports.get(origin_of(url))))
+            
+            # Add a small delay
+            time.sleep(random.uniform(0.5, 1.5))
     
-    # Rank results
-    ranked_results = rank_results(processed_results)
+    # One entry per document before anything is checked or scored
+    processed_results = dedupe_results(processed_results)
+    
+    if get_setting('sniff_pdfs', None, True):
+        unsniffed = [entry for entry in processed_results if entry['is_pdf'] and not entry['year']]
+        if page_workers > 1:
+            with ThreadPoolExecutor(max_workers=page_workers) as executor:
+                list(executor.map(apply_pdf_metadata, unsniffed))
+        else:
+            for entry in unsniffed:
+                apply_pdf_metadata(entry)
+    
+    # Rank results; all candidates are kept with their score for re-ranking later,
+    # only the best RESULTS_USED end up in the CSV
+    ranked_results = rank_results(processed_results, None, get_setting('ranking_weights', None, None),
+                                  company_name)
     
     return ranked_results
 
+def print_top_results(company, results):
+    """Print the top 3 results for a company"""
+    print(f"\nTop results for {company}:")
+    for i, result in enumerate(results[:3], 1):
+        pdf_status = "PDF" if result.get('is_pdf') else "Web Page"
+        year = result.get('year', 'Unknown')
+        print(f"  {i}. [{pdf_status}] {result['url']}")
+        print(f"     Year: {year}, Score: {result.get('score', 0)}")
+
+def _journal_company(company, future, journal):
+    """Journal a finished company's results, returns 1 if there were any"""
+    try:
+        results = future.result()
+    except Exception as e:
+        print(f"Error processing {company}: {e}")
+        return 0
+
+    if not results:
+        return 0
+    journal.append(company, results)
+    print_top_results(company, results)
+    return 1
+
+def process_companies_concurrently(companies, workers, max_results, api_key, search_engine_id, journal,
+                                   page_workers=1):
+    """
+    Process several companies at once, writing each to the journal as it finishes
+
+    Each company fetches its result pages with page_workers threads of its own, so up
+    to workers * page_workers requests run at once.
+    """
+    processed_count = 0
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {
+        executor.submit(process_company, company, max_results, api_key, search_engine_id, page_workers): company
+        for company in companies
+    }
+    pending = set(futures)
+
+    try:
+        for future in as_completed(futures):
+            pending.discard(future)
+            processed_count += _journal_company(futures[future], future, journal)
+    except BaseException:
+        # On Ctrl-C, drop the queued companies instead of waiting for them to spend
+        # quota, but keep whatever finished in the meantime
+        executor.shutdown(wait=False, cancel_futures=True)
+        for future in pending:
+            if future.done() and not future.cancelled():
+                processed_count += _journal_company(futures[future], future, journal)
+        raise
+
+    executor.shutdown()
+    
+    return processed_count
+
 def main():
     parser = argparse.ArgumentParser(description='Find company annual reports using Google API')
     parser.add_argument('--companies', nargs='+', help='List of company names')
@@ -77,6 +235,20 @@ def main():
     parser.add_argument('--search-engine-id', help='Google Search Engine ID (overrides config file)')
     parser.add_argument('--dry-run', action='store_true', help='Check API quota without making requests')
     parser.add_argument('--init-config', action='store_true', help='Initialize config.json file and exit')
+    parser.add_argument('--workers', type=int, default=1, help='Number of companies to process at once')
+    parser.add_argument('--page-workers', type=int, default=3,
+                        help='Result pages and PDFs fetched at once per company (1: one after another)')
+    parser.add_argument('--watch-config', action='store_true', help='Pick up changes to config.json (e.g. daily_api_limit) while running')
+    parser.add_argument('--resume', action='store_true', help='Skip companies already in the results journal of a previous run')
+    parser.add_argument('--no-cache', action='store_true', help='Fetch every page from the network instead of the response cache')
+    parser.add_argument('--html-parser', choices=available_backends(), default=get_backend(),
+                        help='Parser used to extract links from pages (default: fastest installed)')
+    parser.add_argument('--report-terms', choices=VOCABULARIES,
+                        help="Terms that make a link a report: 'legacy' (English, the default) or 'multilingual'")
+    parser.add_argument('--parse-workers', type=int, default=PARSE_DEFAULTS['workers'],
+                        help='Processes parsing pages next to the fetching threads (0: parse in the fetching thread)')
+    parser.add_argument('--parse-timeout', type=int, default=PARSE_DEFAULTS['cpu_timeout'],
+                        help='CPU seconds one page may take to parse before it is given up')
     
     args = parser.parse_args()
     
@@ -87,15 +259,23 @@ def main():
         print(f"Please edit {CONFIG_FILE} with your API credentials.")
         return
     
+    if args.watch_config:
+        watch_config()
+    
     # Get API credentials from config or args
     api_key, search_engine_id = get_api_credentials(args)
     
     # Just check quota and exit if dry run
     if args.dry_run:
-        tracker = APITracker()
+        tracker = get_tracker()
         daily_limit = get_setting('daily_api_limit', None, 100)
         quota = tracker.get_remaining_quota(daily_limit)
         print(f"Remaining API quota for today: {quota}/{daily_limit}")
+        
+        search_cache = get_search_cache()
+        saved_today, saved_total = search_cache.saved_requests()
+        print(f"Quota saved by the search cache: {saved_today} today, {saved_total} in total "
+              f"({search_cache.cached_queries()} cached queries)")
         return
     
     # Check if we have valid credentials
@@ -104,6 +284,19 @@ def main():
         print(f"Please edit {CONFIG_FILE} or provide them as command line arguments.")
         return
     
+    if args.no_cache:
+        get_response_cache().enabled = False
+    
+    set_backend(args.html_parser)
+    set_vocabulary(get_setting('report_terms', args.report_terms, 'legacy'))
+    configure_parse_pool(workers=args.parse_workers, cpu_timeout=args.parse_timeout,
+                         wall_timeout=max(PARSE_DEFAULTS['wall_timeout'], 3 * args.parse_timeout))
+    
+    configure_negative_cache(
+        dead_url_ttl=get_setting('dead_url_days', None, 7) * 24 * 60 * 60,
+        failing_host_ttl=get_setting('failing_host_hours', None, 24) * 60 * 60
+    )
+    
     # Get other settings
     max_results = get_setting('max_results_per_query', args.max_results, 10)
     output_file = get_setting('default_output_file', args.output, 'results.json')
@@ -128,52 +321,83 @@ def main():
         print("Error: Please provide either --companies or --input-file")
         return
     
-    # Check if we have enough quota
-    tracker = APITracker()
+    # Results are streamed to a journal, one line per finished company
+    journal_file = journal_path_for(output_file)
+    journal = ResultsJournal(journal_file, resume=args.resume)
+    pending = [company for company in companies if company not in journal.done]
+    if args.resume:
+        print(f"Resuming from {journal_file}: {len(companies) - len(pending)} companies already done, {len(pending)} to go.")
+    
+    # Check if we have enough quota; companies with cached searches don't need any
+    tracker = get_tracker()
     daily_limit = get_setting('daily_api_limit', None, 100)
     quota = tracker.get_remaining_quota(daily_limit)
+    cached = {company for company in pending if is_search_cached(company, max_results, api_key, search_engine_id)}
+    uncached_count = len(pending) - len(cached)
+    if cached:
+        print(f"{len(cached)} companies have cached search results and won't use any quota.")
     
-    if quota < len(companies):
+    if quota < uncached_count:
         print(f"Warning: Not enough API quota left for all companies.")
-        print(f"Remaining quota: {quota}, Companies to process: {len(companies)}")
+        print(f"Remaining quota: {quota}, Companies needing a search: {uncached_count}")
         
         proceed = input("Do you want to process as many as possible? (y/n): ")
         if proceed.lower() != 'y':
             print("Aborted.")
+            journal.close()
             return
     
-    all_results = {}
     processed_count = 0
     
-    for company in companies:
-        # Check if we still have quota
-        if not tracker.can_make_request(daily_limit):
-            print(f"Daily API limit reached ({daily_limit} requests). Try again tomorrow.")
-            break
-        
-        results = process_company(company, max_results, api_key, search_engine_id)
-        if results:  # Only count if we got results (if API limit wasn't reached)
-            all_results[company] = results
-            processed_count += 1
+    try:
+        if args.workers > 1:
+            # Every company costs one search query, so only schedule what the quota allows
+            scheduled = []
+            budget = quota
+            for company in pending:
+                if company in cached:
+                    scheduled.append(company)
+                elif budget > 0:
+                    scheduled.append(company)
+                    budget -= 1
             
-            # Print top 3 results
-            print(f"\nTop results for {company}:")
-            for i, result in enumerate(results[:3], 1):
-                pdf_status = "PDF" if result.get('is_pdf') else "Web Page"
-                year = result.get('year', 'Unknown')
-                print(f"  {i}. [{pdf_status}] {result['url']}")
-                print(f"     Year: {year}, Score: {result.get('score', 0)}")
+            processed_count = process_companies_concurrently(scheduled, args.workers, max_results, api_key,
+                                                             search_engine_id, journal, args.page_workers)
+        else:
+            for company in pending:
+                # Check if we still have quota (the limit may change with --watch-config)
+                daily_limit = get_setting('daily_api_limit', None, 100)
+                if not tracker.can_make_request(daily_limit) and company not in cached:
+                    print(f"Daily API limit reached ({daily_limit} requests). Try again tomorrow.")
+                    break
+                
+                results = process_company(company, max_results, api_key, search_engine_id, args.page_workers)
+                if results:  # Only count if we got results (if API limit wasn't reached)
+                    journal.append(company, results)
+                    processed_count += 1
+                    
+                    # Print top 3 results
+                    print_top_results(company, results)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted. Finished companies are kept in {journal_file}; rerun with --resume to continue.")
+    finally:
+        journal.close()
     
-    # Save results to file
-    with open(output_file, 'w') as f:
-        json.dump(all_results, f, indent=2)
+    # Save results to file, in input order
+    saved_count = journal_to_json(journal_file, output_file, order=companies)
     
-    print(f"\nProcessed {processed_count} out of {len(companies)} companies.")
-    print(f"Results saved to {output_file}")
+    print(f"\nProcessed {processed_count} out of {len(pending)} pending companies ({saved_count}/{len(companies)} done in total).")
+    print(f"Results saved to {output_file} (journal: {journal_file})")
     
     # Report remaining quota
     remaining = tracker.get_remaining_quota(daily_limit)
     print(f"Remaining API quota for today: {remaining}/{daily_limit}")
+    print_connection_stats()
+    get_response_cache().print_stats()
+    get_negative_cache().print_stats()
+    get_parse_pool().print_stats()
+    get_sitemap_index().print_stats()
+    get_parse_pool().shutdown()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,74 +1,109 @@
 # api_tracker.py
 import os
 import csv
+import atexit
 import datetime
+import sqlite3
+import threading
 from config_handler import get_setting
 
+DEFAULT_TRACKER_FILE = 'google_api_usage.sqlite'
+LEGACY_TRACKER_FILE = 'google_api_usage.csv'
+
 class APITracker:
-    def __init__(self, tracker_file=None):
-        self.tracker_file = tracker_file or 'google_api_usage.csv'
-        self.today = datetime.datetime.now().strftime('%Y-%m-%d')
-        self.usage_count = 0
-        self._load_usage()
-    
-    def _load_usage(self):
-        """Load current usage for today"""
-        if not os.path.exists(self.tracker_file):
-            # Create the file with headers if it doesn't exist
-            with open(self.tracker_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['date', 'count'])
+    """
+    Daily API usage counter stored in SQLite
+
+    Every request is a single atomic increment, so any number of threads, processes
+    and tracker instances can share the same file without losing counts. With
+    flush_every > 1 requests are counted in memory and written in batches.
+    """
+    def __init__(self, tracker_file=None, flush_every=None):
+        self.tracker_file = tracker_file or DEFAULT_TRACKER_FILE
+        self.flush_every = flush_every or get_setting('api_tracker_flush_every', None, 1)
+        self.pending = 0
+        self.lock = threading.Lock()
+
+        is_new = not os.path.exists(self.tracker_file)
+        self.conn = sqlite3.connect(self.tracker_file, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS usage (date TEXT PRIMARY KEY, count INTEGER NOT NULL)')
+        self.conn.commit()
+        if is_new:
+            self._import_legacy_csv()
+
+        if self.flush_every > 1:
+            atexit.register(self.flush)
+
+    @property
+    def today(self):
+        return datetime.datetime.now().strftime('%Y-%m-%d')
+
+    def _import_legacy_csv(self):
+        """Carry over counts from the old google_api_usage.csv file"""
+        if not os.path.exists(LEGACY_TRACKER_FILE):
             return
-        
-        # Load the current count for today
-        with open(self.tracker_file, 'r') as f:
+
+        with open(LEGACY_TRACKER_FILE, 'r') as f:
             reader = csv.reader(f)
-            next(reader)  # Skip header
-            for row in reader:
-                if row and row[0] == self.today:
-                    self.usage_count = int(row[1])
-                    break
-    
+            next(reader, None)  # Skip header
+            rows = [(row[0], int(row[1])) for row in reader if row]
+
+        with self.lock:
+            self.conn.executemany('INSERT OR IGNORE INTO usage VALUES (?, ?)', rows)
+            self.conn.commit()
+
+    def _increment(self, amount):
+        # Callers hold self.lock
+        self.conn.execute(
+            'INSERT INTO usage VALUES (?, ?) ON CONFLICT(date) DO UPDATE SET count = count + excluded.count',
+            (self.today, amount)
+        )
+        self.conn.commit()
+
+    @property
+    def usage_count(self):
+        """Requests made today, including ones not flushed yet"""
+        with self.lock:
+            row = self.conn.execute('SELECT count FROM usage WHERE date = ?', (self.today,)).fetchone()
+            return (row[0] if row else 0) + self.pending
+
     def can_make_request(self, daily_limit=None):
         """Check if we can make another request today"""
         if daily_limit is None:
             daily_limit = get_setting('daily_api_limit', None, 100)
         return self.usage_count < daily_limit
-    
+
     def log_request(self):
         """Log a request and update the tracker file"""
-        self.usage_count += 1
-        
-        # Read existing data
-        rows = []
-        today_updated = False
-        
-        if os.path.exists(self.tracker_file):
-            with open(self.tracker_file, 'r') as f:
-                reader = csv.reader(f)
-                header = next(reader)
-                rows.append(header)
-                
-                for row in reader:
-                    if row and row[0] == self.today:
-                        rows.append([self.today, self.usage_count])
-                        today_updated = True
-                    elif row:
-                        rows.append(row)
-        
-        # Add today's entry if not updated
-        if not today_updated:
-            rows.append([self.today, self.usage_count])
-        
-        # Write back to file
-        with open(self.tracker_file, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerows(rows)
-        
+        with self.lock:
+            self.pending += 1
+            if self.pending >= self.flush_every:
+                self._increment(self.pending)
+                self.pending = 0
+
         return self.usage_count
-    
+
+    def flush(self):
+        """Write requests counted in memory to the tracker file"""
+        with self.lock:
+            if self.pending:
+                self._increment(self.pending)
+                self.pending = 0
+
     def get_remaining_quota(self, daily_limit=None):
         """Get remaining API quota for today"""
         if daily_limit is None:
             daily_limit = get_setting('daily_api_limit', None, 100)
-        return daily_limit - self.usage_count
\ No newline at end of file
+        return daily_limit - self.usage_count
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def get_tracker():
+    """Return the tracker shared by all modules in this process"""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = APITracker()
+        return _tracker
@@ -0,0 +1,97 @@
+# benchmark_html_parsers.py
+"""
+Micro-benchmark of the html_links parser backends
+
+Pages come from a folder of saved pages, from the response cache, or are generated:
+    python benchmark_html_parsers.py --corpus saved_ir_pages/
+    python benchmark_html_parsers.py --cache http_cache.sqlite
+    python benchmark_html_parsers.py --synthetic 200
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sqlite3
+import time
+from html_links import available_backends, decode_html, parse_link_elements
+
+def load_corpus(folder):
+    """Raw bytes of every .html/.htm file in a folder"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(folder, '*.htm*'))):
+        with open(path, 'rb') as f:
+            pages.append((f.read(), None))
+    return pages
+
+def load_cache(path):
+    """HTML bodies (and their Content-Type) stored in the response cache"""
+    pages = []
+    conn = sqlite3.connect(path)
+    for headers, body in conn.execute('SELECT headers, body FROM responses'):
+        content_type = {k.lower(): v for k, v in json.loads(headers).items()}.get('content-type', '')
+        if 'html' in content_type:
+            pages.append((body, content_type))
+    conn.close()
+    return pages
+
+def synthetic_page(rng, links):
+    """An IR-style page with navigation, report tables and download buttons"""
+    parts = ['<html><head><meta charset="utf-8"><title>Investor Relations</title>',
+             '<script>var x = "<a href=\'nope\'>";</script></head><body>']
+    parts.append('<nav><ul>' + ''.join(f'<li><a href="/section-{i}/">Section {i}</a></li>' for i in range(40)) + '</ul></nav>')
+    parts.append('<table>')
+    for i in range(links):
+        year = rng.randint(2010, 2024)
+        kind = rng.choice(['annual-report', 'half-year-report', 'presentation', 'geschaeftsbericht', 'factsheet'])
+        parts.append(f'<tr><td class="date">{year}-03-{rng.randint(10, 28)}</td>'
+                     f'<td><a class="download pdf" href="/media/{kind}-{year}-{i}.pdf">'
+                     f'<span class="icon"></span>{kind.replace("-", " ").title()} {year}</a></td>'
+                     f'<td><p>{"Lorem ipsum dolor sit amet. " * rng.randint(1, 4)}</p></td></tr>')
+        if i % 25 == 0:
+            parts.append(f'<tr><td><button class="btn-download" data-url="/files/{kind}-{year}.pdf">Download</button></td></tr>')
+    parts.append('</table><footer>&copy; Company AG &amp; Co.</footer></body></html>')
+    return ''.join(parts).encode('utf-8')
+
+def benchmark(pages, backend, repeat):
+    """Return (pages per second, links found) for one backend"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = 0
+        for content, content_type in pages:
+            found += len(parse_link_elements(decode_html(content, content_type), backend))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(pages) / best, found
+
+def main():
+    parser = argparse.ArgumentParser(description='Pages parsed per second for each HTML parser backend')
+    parser.add_argument('--corpus', help='Folder with saved .html pages')
+    parser.add_argument('--cache', help='Response cache (http_cache.sqlite) to take HTML pages from')
+    parser.add_argument('--synthetic', type=int, default=100, help='Number of generated pages if no corpus is given')
+    parser.add_argument('--links', type=int, default=300, help='Report links per generated page')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per backend (the fastest counts)')
+    args = parser.parse_args()
+
+    if args.corpus:
+        pages = load_corpus(args.corpus)
+    elif args.cache:
+        pages = load_cache(args.cache)
+    else:
+        rng = random.Random(42)
+        pages = [(synthetic_page(rng, args.links), 'text/html; charset=utf-8') for _ in range(args.synthetic)]
+
+    if not pages:
+        print("No HTML pages found.")
+        return
+
+    total_mb = sum(len(content) for content, _ in pages) / (1024 * 1024)
+    print(f"{len(pages)} pages, {total_mb:.1f} MB")
+    print(f"{'backend':>14} {'pages/s':>10} {'links':>8}")
+    for backend in available_backends():
+        pages_per_second, found = benchmark(pages, backend, args.repeat)
+        print(f"{backend:>14} {pages_per_second:>10.1f} {found:>8}")
+
+if __name__ == "__main__":
+    main()
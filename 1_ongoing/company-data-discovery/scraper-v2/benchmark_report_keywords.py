@@ -0,0 +1,122 @@
+# benchmark_report_keywords.py
+"""
+Micro-benchmark of link scoring: the old keyword loops against the matcher
+
+The matcher runs with both vocabularies: 'matcher' with the legacy terms, which should
+be at least as fast as the loops, and 'matcher-eu' with the multilingual ones. Two
+runs: every link distinct, and a crawl where menus and footers repeat the same links
+on every page of a site (--pages-per-site, --links-per-page, --menu-links). The
+matcher's cache is cleared before every timed run, so repeats only help within a run.
+
+    python benchmark_report_keywords.py --links 100000 --report-share 0.1
+"""
+import argparse
+import random
+import re
+import time
+from report_keywords import REPORT_TERMS, match_report_keywords, set_vocabulary
+
+LEGACY_KEYWORDS = [
+    'annual report', 'annual-report', 'financial report',
+    'financial-report', 'annual financial', 'jahresbericht',
+    'yearly report', 'yearly-report', 'annual results'
+]
+
+# What the loops would cost with the matcher's dictionary (accents stripped, as in URLs)
+MULTILINGUAL_KEYWORDS = sorted({spelling for terms in REPORT_TERMS.values() for term in terms
+                                for spelling in (term, term.replace(' ', '-'))})
+
+REPORT_KINDS = ['annual-report', 'geschaeftsbericht', 'rapport-financier-annuel', 'jaarverslag',
+                'relazione-finanziaria', 'informe-anual']
+OTHER_KINDS = ['presentation', 'press-release', 'factsheet', 'contact', 'careers', 'governance',
+               'agm-invitation', 'half-year-report', 'news', 'about-us', 'sustainability', 'privacy-policy']
+
+def _link(rng, kind, i, host='www.example.com'):
+    year = rng.randint(2010, 2024)
+    return (f"https://{host}/investors/{kind}/{kind}-{year}-{i}.pdf",
+            f"{kind.replace('-', ' ').title()} {year}")
+
+def synthetic_links(rng, count, report_share=0.4, start=0, host='www.example.com'):
+    """(href, text) pairs as found on IR pages, `report_share` of them reports"""
+    links = []
+    for i in range(start, start + count):
+        kinds = REPORT_KINDS if rng.random() < report_share else OTHER_KINDS
+        links.append(_link(rng, rng.choice(kinds), i, host))
+    return links
+
+def crawled_links(rng, count, report_share, pages_per_site, links_per_page, menu_links):
+    """
+    The links of a crawl over several sites, `count` in total
+
+    Every page of a site has the same menu and footer links, plus links of its own.
+    """
+    links = []
+    site = 0
+    while len(links) < count:
+        host = f"www.company{site}.com"
+        menu = [_link(rng, rng.choice(OTHER_KINDS), i, host) for i in range(menu_links)]
+        for page in range(pages_per_site):
+            links.extend(menu)
+            links.extend(synthetic_links(rng, links_per_page - menu_links, report_share, len(links), host))
+        site += 1
+    return links[:count]
+
+def legacy_score(href, text, keywords=LEGACY_KEYWORDS):
+    link_text = text.strip().lower()
+    if not any(keyword in link_text or keyword in href.lower() for keyword in keywords):
+        return None
+    year_match = re.search(r'20\d{2}', href) or re.search(r'20\d{2}', link_text)
+    year = year_match.group(0) if year_match else "Unknown"
+    score = 0
+    if 'annual' in link_text or 'annual' in href.lower():
+        score += 3
+    if 'financial' in link_text or 'financial' in href.lower():
+        score += 2
+    return year, score
+
+def multilingual_score(href, text):
+    return legacy_score(href, text, MULTILINGUAL_KEYWORDS)
+
+def matcher_score(href, text):
+    match = match_report_keywords(href, text)
+    if not match.is_report:
+        return None
+    return match.year or "Unknown", 3 * match.annual + 2 * match.financial
+
+def benchmark(links, score, repeat, vocabulary='legacy'):
+    """Return (links per second, report links found)"""
+    set_vocabulary(vocabulary)
+    best = None
+    for _ in range(repeat):
+        match_report_keywords.cache_clear()
+        start = time.perf_counter()
+        found = sum(1 for href, text in links if score(href, text) is not None)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(links) / best, found
+
+def main():
+    parser = argparse.ArgumentParser(description='Links scored per second, old keyword loops vs the matcher')
+    parser.add_argument('--links', type=int, default=100000, help='Number of generated links')
+    parser.add_argument('--report-share', type=float, default=0.1, help='Share of the links that are reports')
+    parser.add_argument('--pages-per-site', type=int, default=25, help='Pages crawled per site')
+    parser.add_argument('--links-per-page', type=int, default=200, help='Links per page of the crawl')
+    parser.add_argument('--menu-links', type=int, default=120,
+                        help='Links of the header menu and footer, on every page of the crawl')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per scorer (the fastest counts)')
+    args = parser.parse_args()
+
+    runs = (('distinct links', synthetic_links(random.Random(42), args.links, args.report_share)),
+            ('crawl', crawled_links(random.Random(42), args.links, args.report_share, args.pages_per_site,
+                                    args.links_per_page, args.menu_links)))
+    for label, links in runs:
+        print(f"\n{label}: {len(links)} links, {len(set(links))} distinct, {args.report_share:.0%} reports")
+        print(f"{'scorer':>10} {'links/s':>12} {'reports':>8}")
+        scorers = (('legacy', legacy_score, 'legacy'), ('matcher', matcher_score, 'legacy'),
+                   ('loops-eu', multilingual_score, 'legacy'), ('matcher-eu', matcher_score, 'multilingual'))
+        for name, score, vocabulary in scorers:
+            links_per_second, found = benchmark(links, score, args.repeat, vocabulary)
+            print(f"{name:>10} {links_per_second:>12.0f} {found:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmark_result_ranker.py
+"""
+Benchmark of result ranking: the old per-dict loop with a full sort against
+rank_results as process_company calls it (once per company, a few dozen results)
+and rank_many, which re-ranks a whole old run in one batch. Every timing includes
+reading the features from the result dicts.
+
+    python benchmark_result_ranker.py --candidates 1000000 3000000
+    python benchmark_result_ranker.py --results ../results/first-run.jsonl --candidates 2000000
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+from result_ranker import RESULTS_USED, rank_results, rank_many
+from results_to_csv import load_results
+
+def legacy_rank_results(results):
+    """rank_results before the vectorized version: scores every dict, sorts them all"""
+    current_year = datetime.now().year
+    for result in results:
+        score = 0
+        if result.get('is_pdf', False):
+            score += 5
+        year_str = result.get('year')
+        if year_str and year_str.isdigit():
+            year = int(year_str)
+            if year == current_year:
+                score += 10
+            elif year == current_year - 1:
+                score += 8
+            elif year == current_year - 2:
+                score += 6
+            elif year >= current_year - 5:
+                score += 4
+            else:
+                score += 2
+        result['score'] = score
+    return sorted(results, key=lambda x: x.get('score', 0), reverse=True)
+
+def synthetic_run(rng, candidates, per_company, templates=None, search_hits=10):
+    """{company: results} with `candidates` results in total, optionally copied from a real run"""
+    kinds = ['annual-report', 'geschaeftsbericht', 'rapport-annuel', 'investors', 'press-release',
+             'presentation', 'half-year-report', 'sustainability-report', 'governance', 'careers']
+    run = {}
+    for i in range(0, candidates, per_company):
+        company = f"Company {i // per_company} Group"
+        results = []
+        for j in range(min(per_company, candidates - i)):
+            if templates:
+                results.append(dict(rng.choice(templates)))
+                continue
+            kind = rng.choice(kinds)
+            year = rng.choice([None, str(rng.randint(2008, datetime.now().year))])
+            is_pdf = rng.random() < 0.6
+            host = rng.choice([f"www.company{i // per_company}.com", "www.annualreports.com", "cdn.example.net"])
+            result = {
+                'url': f"https://{host}/investors/{kind}{'-' + year if year else ''}-{j}{'.pdf' if is_pdf else ''}",
+                'text': kind.replace('-', ' ').title(),
+                'is_pdf': is_pdf,
+                'year': year,
+            }
+            # Links extracted from pages carry their keyword count, search hits don't
+            if j >= search_hits:
+                result['keyword_hits'] = rng.randint(0, 3)
+            results.append(result)
+        run[company] = results
+    return run
+
+def timed(label, candidates, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:>22} {elapsed:>9.2f}s {candidates / elapsed:>14.0f}/s")
+
+def main():
+    parser = argparse.ArgumentParser(description='Candidates ranked per second, old loop vs the current ranker')
+    parser.add_argument('--candidates', type=int, nargs='+', default=[1000000], help='Total candidates per run')
+    parser.add_argument('--per-company', type=int, default=40, help='Candidates per company')
+    parser.add_argument('--search-hits', type=int, default=10,
+                        help='Candidates per company without a keyword count (matched while ranking)')
+    parser.add_argument('--top-k', type=int, default=RESULTS_USED, help='Results kept per company')
+    parser.add_argument('--results', help='JSON results or .jsonl journal whose results are used as templates')
+    parser.add_argument('--all-features', action='store_true',
+                        help='Also score keyword hits and domain match, which are off by default')
+    args = parser.parse_args()
+    weights = {'keyword_hits': 1, 'domain_match': 2} if args.all_features else None
+
+    templates = None
+    if args.results:
+        templates = [result for _, results in load_results(args.results) for result in results]
+        print(f"Using {len(templates)} results from {args.results} as templates")
+
+    for candidates in args.candidates:
+        run = synthetic_run(random.Random(42), candidates, args.per_company, templates, args.search_hits)
+        print(f"\n{candidates} candidates, {len(run)} companies, top {args.top_k}"
+              f"{', all features' if args.all_features else ''}")
+        print(f"{'':>22} {'time':>10} {'candidates':>14}")
+
+        timed('legacy full sort', candidates,
+              lambda: [legacy_rank_results(results)[:args.top_k] for results in run.values()])
+        timed('rank_results per co.', candidates,
+              lambda: [rank_results(results, args.top_k, weights, company) for company, results in run.items()])
+        timed('rank_many (one batch)', candidates, lambda: rank_many(run, args.top_k, weights))
+
+if __name__ == "__main__":
+    main()
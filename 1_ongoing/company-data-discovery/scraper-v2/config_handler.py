@@ -2,9 +2,17 @@
 import json
 import os
 import sys
+import threading
+import time
 
 CONFIG_FILE = 'config.json'
 
+# Parsed config shared by all modules, re-read only when the file's mtime changes
+_cached_config = None
+_cached_mtime = None
+_config_lock = threading.RLock()
+_watcher = None
+
 def create_default_config():
     """Create a default config.json template file"""
     default_config = {
@@ -15,7 +23,14 @@ def create_default_config():
         "settings": {
             "daily_api_limit": 1000,
             "max_results_per_query": 10,
-            "default_output_file": "results.json"
+            "default_output_file": "results.json",
+            "search_cache_days": 30,
+            "api_tracker_flush_every": 1,
+            "dead_url_days": 7,
+            "failing_host_hours": 24,
+            "sniff_pdfs": True,
+            "use_sitemaps": True,
+            "report_terms": "legacy"
         }
     }
     
@@ -30,7 +45,27 @@ def create_default_config():
         print(f"Error creating configuration file: {e}")
         return None
 
+def _config_mtime():
+    try:
+        return os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        return None
+
 def load_config():
+    """Return the cached configuration, re-reading config.json only if it changed"""
+    global _cached_config, _cached_mtime
+    with _config_lock:
+        # While the watcher runs it keeps the cache current, so skip the stat
+        if _cached_config is not None and _watcher is not None:
+            return _cached_config
+        
+        mtime = _config_mtime()
+        if _cached_config is None or mtime != _cached_mtime:
+            _cached_config = _read_config()
+            _cached_mtime = _config_mtime()
+        return _cached_config
+
+def _read_config():
     """Load configuration from config.json file"""
     if not os.path.exists(CONFIG_FILE):
         print(f"Configuration file {CONFIG_FILE} not found.")
@@ -90,4 +125,40 @@ def get_setting(setting_name, args_value=None, default=None):
         return args_value
     
     # Get from config or use default
-    return config.get('settings', {}).get(setting_name, default)
\ No newline at end of file
+    return config.get('settings', {}).get(setting_name, default)
+
+def _watch_config(interval):
+    global _cached_config, _cached_mtime
+    while True:
+        time.sleep(interval)
+        mtime = _config_mtime()
+        with _config_lock:
+            if mtime is None or mtime == _cached_mtime:
+                continue
+            _cached_mtime = mtime
+            
+            # Keep the previous settings if the file is mid-edit or invalid
+            try:
+                with open(CONFIG_FILE, 'r') as f:
+                    new_config = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Warning: could not reload {CONFIG_FILE} ({e}), keeping previous settings")
+                continue
+            
+            old_settings = (_cached_config or {}).get('settings', {})
+            _cached_config = new_config
+            new_settings = new_config.get('settings', {})
+        
+        for name in sorted(set(old_settings) | set(new_settings)):
+            if old_settings.get(name) != new_settings.get(name):
+                print(f"Config changed: {name} = {new_settings.get(name)} (was {old_settings.get(name)})")
+
+def watch_config(interval=5):
+    """Reload config.json in the background whenever it changes"""
+    global _watcher
+    with _config_lock:
+        if _watcher is not None:
+            return
+        load_config()
+        _watcher = threading.Thread(target=_watch_config, args=(interval,), daemon=True)
+        _watcher.start()
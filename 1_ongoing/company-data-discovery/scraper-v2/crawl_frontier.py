@@ -0,0 +1,149 @@
+# crawl_frontier.py
+import heapq
+import re
+from datetime import datetime
+from urllib.parse import urlsplit
+from report_keywords import match_report_keywords
+from url_canonical import canonicalize_url, dedup_key
+
+# Defaults for CrawlFrontier; pass other values to its constructor
+CRAWL_DEFAULTS = {
+    'max_pages': 10,           # pages fetched per company, over all sites
+    'max_depth': 3,            # clicks away from a search result
+    'max_pages_per_host': 8,   # on top of the host scheduler's rate limit
+    'min_score': 1,            # links scoring less are not worth a fetch
+}
+
+# Words in links that lead towards report listings, besides the report terms themselves
+CRAWL_TERMS = re.compile(
+    r'archiv|results|reports|publication|financial|investor|download|library|documents'
+    r'|berichte|publikation|finanzberichte|rapports|resultats|informes|documentos|relazioni'
+    r'|bilanci|verslagen|rapporter|rapportit|raporty',
+    re.I
+)
+
+# Links that never lead to a report
+SKIP_TERMS = re.compile(
+    r'career|jobs|karriere|emploi|contact|login|privacy|datenschutz|cookie|imprint|impressum'
+    r'|terms-of-use|newsletter|subscribe|mailto:|javascript:|tel:',
+    re.I
+)
+
+# Files and media that aren't pages
+SKIP_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.zip', '.xls', '.xlsx', '.doc',
+                   '.docx', '.ppt', '.pptx', '.mp3', '.mp4', '.ics', '.xml', '.css', '.js')
+
+_YEAR = re.compile(r'20\d{2}')
+
+def site_of(host):
+    """Registrable part of a host: ir.example.co.uk -> example.co.uk, www.example.com -> example.com"""
+    labels = host.lower().split(':')[0].split('.')
+    if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in ('co', 'com', 'org', 'net', 'ac', 'gov'):
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+def score_page_link(url, text, current_year=None):
+    """
+    How promising a link to another page is for finding reports, or None to skip it
+
+    Report terms ("annual report", "Geschäftsbericht", ...) count most, then words like
+    "archive" or "results". Links naming the latest fiscal years rank above older ones.
+    """
+    if SKIP_TERMS.search(url) or SKIP_TERMS.search(text or ''):
+        return None
+    path = urlsplit(url).path.lower()
+    if path.endswith(SKIP_EXTENSIONS):
+        return None
+
+    current_year = current_year or datetime.now().year
+    match = match_report_keywords(url, text)
+    score = 0
+    if match.is_report:
+        score += 3
+    if match.annual:
+        score += 2
+    if match.financial:
+        score += 1
+    score += min(2, len(CRAWL_TERMS.findall(f"{url} {text}")))
+
+    years = [int(year) for year in _YEAR.findall(f"{url} {text}")]
+    if years:
+        newest = max(years)
+        if newest >= current_year - 1:
+            score += 4   # the latest report, or the page it will appear on
+        elif newest == current_year - 2:
+            score += 2
+        else:
+            score -= 1   # archives of old years only matter if nothing newer turns up
+    return score
+
+class CrawlFrontier:
+    """
+    Priority queue of pages to fetch while looking for a company's reports
+
+    Pages come out best score first. Links are followed only within the site they
+    were found on. A visited set, a depth limit, a page budget and a per-host
+    page budget keep the number of fetches small.
+    """
+    def __init__(self, **settings):
+        unknown = set(settings) - set(CRAWL_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown crawl settings: {', '.join(sorted(unknown))}")
+        self.settings = {**CRAWL_DEFAULTS, **settings}
+        self.heap = []
+        self.queued = set()       # dedup keys of everything ever queued
+        self.host_pages = {}      # host -> pages handed out
+        self.sequence = 0         # keeps equal scores in the order they were found
+        self.fetched = 0
+        self.skipped = 0
+
+    def _push(self, url, score, depth):
+        key = dedup_key(canonicalize_url(url, resolve_redirects=False))
+        if key in self.queued:
+            return False
+        self.queued.add(key)
+        heapq.heappush(self.heap, (-score, self.sequence, depth, url))
+        self.sequence += 1
+        return True
+
+    def add_seed(self, url, score=0):
+        """Queue a page found by search, at depth 0; its site becomes crawlable"""
+        return self._push(url, score, 0)
+
+    def add_links(self, page_url, depth, links):
+        """
+        Queue the (url, text) links found on a page fetched at `depth`
+
+        Returns the number of links queued.
+        """
+        if depth + 1 > self.settings['max_depth']:
+            return 0
+        site = site_of(urlsplit(page_url).netloc)
+        added = 0
+        for url, text in links:
+            if not url.startswith(('http://', 'https://')) or site_of(urlsplit(url).netloc) != site:
+                continue
+            score = score_page_link(url, text)
+            if score is None or score < self.settings['min_score']:
+                continue
+            added += self._push(url, score, depth + 1)
+        return added
+
+    def pop(self):
+        """Next page to fetch as (url, depth, score), or None when done or out of budget"""
+        while self.heap and self.fetched < self.settings['max_pages']:
+            negative_score, _, depth, url = heapq.heappop(self.heap)
+            host = urlsplit(url).netloc.lower()
+            if self.host_pages.get(host, 0) >= self.settings['max_pages_per_host']:
+                self.skipped += 1
+                continue
+            self.host_pages[host] = self.host_pages.get(host, 0) + 1
+            self.fetched += 1
+            return url, depth, -negative_score
+        self.skipped += len(self.heap)
+        self.heap = []
+        return None
+
+    def summary(self):
+        return (f"crawled {self.fetched} pages on {len(self.host_pages)} hosts, "
+                f"{len(self.queued)} links queued, {self.skipped} left out")
@@ -0,0 +1,211 @@
+# download_manager.py
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from http_session import get_session
+from host_scheduler import get_scheduler
+from report_store import get_report_store
+
+# Defaults for DownloadManager; pass other values to its constructor
+DOWNLOAD_DEFAULTS = {
+    'workers': 4,                            # downloads running at once
+    'max_file_bytes': 200 * 1024 * 1024,     # skip anything bigger than an annual report can be
+    'max_total_bytes': None,                 # stop downloading after this much in one run
+    'retries': 2,                            # resumed attempts after a dropped connection
+    'chunk_size': 256 * 1024,
+    'timeout': 60,
+}
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# path is None when the download failed (see error). source says how the file was
+# obtained: 'store' (URL known), 'mirror' (same ETag and size as a stored file),
+# 'download' or 'resumed'.
+DownloadResult = namedtuple('DownloadResult', ['url', 'path', 'size', 'sha256', 'source', 'error'])
+
+_CONTENT_RANGE_TOTAL = re.compile(r'/\s*(\d+)\s*$')
+
+class BudgetExceeded(Exception):
+    """Raised when a file or the whole run would go over its byte budget"""
+
+class DownloadRefused(Exception):
+    """Raised for responses a retry won't change (404, 403, ...)"""
+
+class DownloadManager:
+    """
+    Downloads reports with a bounded worker pool into the report store
+
+    Bodies are streamed in chunks to a partial file in the store. If the connection
+    drops, or the run is interrupted, the next attempt resumes it with a Range
+    request (If-Range makes sure the file didn't change meanwhile). Each file and
+    the whole run have byte budgets, and throughput is tracked per host.
+    """
+    def __init__(self, store=None, **settings):
+        unknown = set(settings) - set(DOWNLOAD_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown download settings: {', '.join(sorted(unknown))}")
+        self.settings = {**DOWNLOAD_DEFAULTS, **settings}
+        self.store = store or get_report_store()
+        self.scheduler = get_scheduler()
+        self.executor = ThreadPoolExecutor(max_workers=self.settings['workers'])
+        self.lock = threading.Lock()
+        self.total_bytes = 0
+        self.host_stats = {}   # host -> [files, bytes, seconds]
+
+    def submit(self, url, destination=None, headers=None):
+        """Queue a download; the future's result is a DownloadResult"""
+        return self.executor.submit(self.download, url, destination, headers)
+
+    def download(self, url, destination=None, headers=None):
+        """
+        Download `url` (or find it in the store) and return a DownloadResult
+
+        With a destination, the stored file is also linked there.
+        """
+        try:
+            sha256 = self.store.lookup_url(url)
+            source = 'store'
+            if sha256 is None:
+                for attempt in range(self.settings['retries'] + 1):
+                    try:
+                        sha256, source = self._fetch(url, headers or {})
+                        break
+                    except (BudgetExceeded, DownloadRefused):
+                        raise
+                    except Exception as e:
+                        if attempt == self.settings['retries']:
+                            raise
+                        print(f"  Download of {url} interrupted ({e}), resuming...")
+
+            path = self.store.path_for(sha256)
+            if destination:
+                path = self.store.materialize(sha256, destination)
+            return DownloadResult(url, path, os.path.getsize(path), sha256, source, None)
+        except Exception as e:
+            return DownloadResult(url, None, 0, None, None, f"{type(e).__name__}: {e}")
+
+    def _take_budget(self, size):
+        with self.lock:
+            limit = self.settings['max_total_bytes']
+            if limit is not None and self.total_bytes + size > limit:
+                raise BudgetExceeded(f"total download budget of {limit // (1024 * 1024)} MB used up")
+            self.total_bytes += size
+
+    def _record(self, url, size, seconds, finished):
+        with self.lock:
+            stats = self.host_stats.setdefault(urlsplit(url).netloc.lower(), [0, 0, 0.0])
+            stats[0] += 1 if finished else 0
+            stats[1] += size
+            stats[2] += seconds
+
+    def _fetch(self, url, headers):
+        """Stream `url` into the store, resuming a partial file; returns (sha256, source)"""
+        temp_path = self.store.temp_path_for(url)
+        meta_path = temp_path + '.json'
+        offset = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+        meta = {}
+        if offset and os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+
+        request_headers = {'User-Agent': USER_AGENT, 'Accept': 'application/pdf,*/*', **headers}
+        validator = meta.get('etag') or meta.get('last_modified')
+        if offset and validator:
+            request_headers['Range'] = f'bytes={offset}-'
+            request_headers['If-Range'] = validator
+        else:
+            offset = 0
+
+        self.scheduler.wait(url)
+        with get_session().get(url, headers=request_headers, stream=True, timeout=self.settings['timeout']) as response:
+            if response.status_code == 416:
+                # The partial copy doesn't fit the file any more; the retry starts over
+                self._discard(temp_path)
+                raise RuntimeError("partial download no longer matches the file")
+            if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+                raise DownloadRefused(f"status {response.status_code}")
+            if response.status_code not in (200, 206):
+                raise RuntimeError(f"status {response.status_code}")
+            if response.status_code == 200:
+                # No range support, or If-Range found the file changed: the full body follows
+                offset = 0
+
+            etag = response.headers.get('ETag')
+            if response.status_code == 206:
+                match = _CONTENT_RANGE_TOTAL.search(response.headers.get('Content-Range', ''))
+                total = int(match.group(1)) if match else None
+            else:
+                content_length = response.headers.get('Content-Length', '')
+                total = int(content_length) if content_length.isdigit() else None
+
+            # Same bytes under another URL (CDN mirror): no need to read the body
+            if offset == 0:
+                sha256 = self.store.lookup_validators(etag, total)
+                if sha256 is not None:
+                    self.store.index_url(url, sha256, etag, total)
+                    return sha256, 'mirror'
+
+            max_file_bytes = self.settings['max_file_bytes']
+            if total and total > max_file_bytes:
+                self._discard(temp_path)
+                raise BudgetExceeded(f"{total / (1024 * 1024):.0f} MB is over the per-file limit")
+
+            if offset == 0:
+                with open(meta_path, 'w') as f:
+                    json.dump({'url': url, 'etag': etag, 'total': total,
+                               'last_modified': response.headers.get('Last-Modified')}, f)
+
+            hasher = hashlib.sha256()
+            if offset:
+                with open(temp_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        hasher.update(chunk)
+
+            size = offset
+            started = time.monotonic()
+            try:
+                with open(temp_path, 'ab' if offset else 'wb') as out_file:
+                    for chunk in response.iter_content(chunk_size=self.settings['chunk_size']):
+                        if size + len(chunk) > max_file_bytes:
+                            self._discard(temp_path)
+                            raise BudgetExceeded(f"over the per-file limit of {max_file_bytes // (1024 * 1024)} MB")
+                        self._take_budget(len(chunk))
+                        out_file.write(chunk)
+                        hasher.update(chunk)
+                        size += len(chunk)
+            finally:
+                self._record(url, size - offset, time.monotonic() - started, False)
+
+        if total is not None and size != total:
+            raise RuntimeError(f"got {size} of {total} bytes")
+
+        sha256 = hasher.hexdigest()
+        self.store.add(temp_path, sha256, url, etag, total or size, response.headers.get('Content-Type'))
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        self._record(url, 0, 0, True)
+        return sha256, 'resumed' if offset else 'download'
+
+    @staticmethod
+    def _discard(temp_path):
+        for path in (temp_path, temp_path + '.json'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def print_stats(self):
+        """Print files, volume and throughput per host for this run"""
+        if not self.host_stats:
+            return
+        print(f"Downloads: {self.total_bytes / (1024 * 1024):.1f} MB in total")
+        for host, (files, size, seconds) in sorted(self.host_stats.items(), key=lambda item: -item[1][1]):
+            rate = size / seconds / (1024 * 1024) if seconds else 0
+            print(f"  {host}: {files} files, {size / (1024 * 1024):.1f} MB, {rate:.2f} MB/s")
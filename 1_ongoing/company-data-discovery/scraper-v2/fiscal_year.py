@@ -0,0 +1,345 @@
+# fiscal_year.py
+"""
+Determine REFYEAR (the year the fiscal period ends) from the first pages of a report
+
+Only the bytes needed for the first pages are fetched, with Range requests: the
+trailer and cross-reference table, the page objects, their content streams and
+fonts. The text is searched for phrases like "financial year ended 31 December 2024",
+"exercice clos le 31 décembre 2023" or "FY 2023/24".
+
+Fix the REFYEAR column of a results CSV (SRC/REFYEAR columns, ',' or ';'):
+    python fiscal_year.py --input results/financial_reports.csv --workers 8
+
+With --store, reports already in the report store (see report_store.py) are read
+from disk, and a report parsed once is not parsed again.
+
+Needs pypdf (pip install pypdf); without it nothing is changed.
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from http_session import get_session
+from report_store import ReportStore
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+FIRST_PAGES = 3
+BLOCK_SIZE = 64 * 1024
+MAX_FETCH_BYTES = 4 * 1024 * 1024   # per report; a cover image can be bigger than the text
+DEFAULT_WORKERS = 4
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+_CONTENT_RANGE_TOTAL = re.compile(r'/\s*(\d+)\s*$')
+
+MONTHS = (
+    'january|february|march|april|may|june|july|august|september|october|november|december|'
+    'januar|jänner|februar|märz|mai|juni|juli|oktober|dezember|'
+    'janvier|février|mars|avril|juin|juillet|août|septembre|octobre|novembre|décembre|'
+    'gennaio|febbraio|marzo|aprile|maggio|giugno|luglio|agosto|settembre|ottobre|dicembre|'
+    'enero|febrero|abril|mayo|junio|julio|septiembre|setiembre|octubre|noviembre|diciembre|'
+    'januari|februari|maart|mei|augustus|oktober'
+)
+
+# A full date: "31 December 2024", "31st December 2024", "31. Dezember 2024",
+# "31 de diciembre de 2024", "December 31, 2024", "31.12.2024", "31/12/2024"
+_DATE = (rf'(?:\d{{1,2}}(?:st|nd|rd|th|er|\.)?\s+(?:de\s+)?(?:{MONTHS})\s+(?:de\s+)?'
+         rf'|(?:{MONTHS})\s+\d{{1,2}},?\s+|\d{{1,2}}[./]\d{{1,2}}[./])(20\d{{2}})')
+
+_FISCAL_YEAR = (r'(?:fiscal|financial|business)\s+year|FY|geschäftsjahr|exercice|esercizio|'
+                r'ejercicio|boekjaar|verslagjaar|räkenskapsåret|regnskabsåret|exercício')
+
+# Phrase patterns with their weight; group 1 is the year the period ends, or the
+# first year of a split year when group 2 holds the second one
+FISCAL_YEAR_PATTERNS = [
+    # "year ended 31 December 2024", "exercice clos le 31 décembre 2023", "chiuso al 31 dicembre 2023"
+    (re.compile(rf'\b(?:ended|ending|clos\s+le|clos\s+au|chiuso\s+al|cerrado\s+a[l]?|'
+                rf'terminado\s+el|encerrado\s+em)\s+(?:on\s+)?{_DATE}', re.I), 3),
+    # "as at 31 December 2024", "zum 31. Dezember 2023": any date, e.g. "prices as of 1 January 2025"
+    (re.compile(rf'\b(?:as\s+at|as\s+of|zum|per|al|au)\s+{_DATE}', re.I), 1),
+    # "FY 2023/24", "Geschäftsjahr 2023/2024", "financial year 2023-24"
+    (re.compile(rf'\b(?:{_FISCAL_YEAR})\s*:?\s*(20\d{{2}})\s*[/\-–]\s*((?:20)?\d{{2}})\b', re.I), 2),
+    # "FY2023", "fiscal year 2024", "Geschäftsjahr 2023"
+    (re.compile(rf'\b(?:{_FISCAL_YEAR})\s*:?\s*(20\d{{2}})\b(?!\s*[/\-–]\s*\d)', re.I), 1),
+    # "Annual Report 2024", "Rapport annuel 2023", "Jaarverslag 2023"
+    (re.compile(r'(?:annual\s+report|annual\s+financial\s+report|geschäftsbericht|jahresbericht|'
+                r'rapport\s+(?:financier\s+)?annuel|relazione\s+finanziaria(?:\s+annuale)?|'
+                r'informe\s+anual|jaarverslag|årsredovisning|årsrapport)\s+(20\d{2})\b', re.I), 1),
+]
+
+def _end_year(first, second):
+    if not second:
+        return int(first)
+    # "2023/24" and "2023/2024" end in 2024
+    return int(second) if len(second) == 4 else int(first[:2] + second)
+
+def fiscal_year_from_text(text):
+    """
+    Return (year, evidence) for the fiscal year end named most often in `text`
+
+    Period ends ("year ended 31 December 2024") count three times, split years like
+    2023/24 twice, labelled years ("FY2023", "Annual Report 2024") and dates after
+    "as at", "zum", ... once. Ties go to the year with the stronger phrase, then to
+    the later year. Returns (None, None) if nothing is found.
+    """
+    votes = Counter()
+    strongest = {}
+    evidence = {}
+    for pattern, weight in FISCAL_YEAR_PATTERNS:
+        for match in pattern.finditer(text):
+            groups = match.groups()
+            year = _end_year(groups[0], groups[1] if len(groups) > 1 else None)
+            votes[year] += weight
+            if weight > strongest.get(year, 0):
+                strongest[year] = weight
+                evidence[year] = ' '.join(match.group(0).split())
+
+    if not votes:
+        return None, None
+    # Then the later year: comparisons with the prior year are everywhere
+    year = max(votes, key=lambda candidate: (votes[candidate], strongest[candidate], candidate))
+    return str(year), evidence[year]
+
+class RangeFile(io.RawIOBase):
+    """
+    Read-only, seekable view of a remote file, fetched in blocks with Range requests
+
+    Blocks are kept in memory, so the backward scans of a PDF reader cost nothing
+    once a block is there. Raises OSError once max_bytes would be exceeded.
+    """
+    def __init__(self, url, get, block_size=BLOCK_SIZE, max_bytes=MAX_FETCH_BYTES):
+        self.url = url
+        self.get = get
+        self.block_size = block_size
+        self.max_bytes = max_bytes
+        self.blocks = {}
+        self.position = 0
+        self.fetched = 0
+        self.requests = 0
+        self.size = None
+        self._fetch(0, 0)   # the first block also tells the size
+        if self.size is None:
+            raise OSError("no file size in the response")
+
+    def _fetch(self, first, last):
+        """Fetch blocks first..last in one request"""
+        start = first * self.block_size
+        end = (last + 1) * self.block_size - 1
+        if self.size is not None:
+            end = min(end, self.size - 1)
+        if self.fetched + end - start + 1 > self.max_bytes:
+            raise OSError(f"more than {self.max_bytes // 1024} KB needed")
+
+        response = self.get(self.url, {'Range': f'bytes={start}-{end}'})
+        try:
+            if response.status_code == 200 and start == 0:
+                # No range support: fine if the whole file is within the budget
+                content_length = response.headers.get('Content-Length', '')
+                if not content_length.isdigit() or int(content_length) > self.max_bytes:
+                    raise OSError("server ignores Range requests and the file is too big")
+                data = response.content
+                self.size = len(data)
+                first, last = 0, max(0, (self.size - 1) // self.block_size)
+            elif response.status_code == 206:
+                match = _CONTENT_RANGE_TOTAL.search(response.headers.get('Content-Range', ''))
+                if match:
+                    self.size = int(match.group(1))
+                data = response.content
+            else:
+                raise OSError(f"status {response.status_code}")
+        finally:
+            response.close()
+
+        self.requests += 1
+        self.fetched += len(data)
+        for index in range(first, last + 1):
+            offset = (index - first) * self.block_size
+            self.blocks[index] = data[offset:offset + self.block_size]
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, buffer):
+        if self.position >= self.size:
+            return 0
+        end = min(self.position + len(buffer), self.size)
+        first, last = self.position // self.block_size, (end - 1) // self.block_size
+
+        # Missing blocks next to each other come in one request
+        index = first
+        while index <= last:
+            if index in self.blocks:
+                index += 1
+                continue
+            run_end = index
+            while run_end + 1 <= last and run_end + 1 not in self.blocks:
+                run_end += 1
+            self._fetch(index, run_end)
+            index = run_end + 1
+
+        data = b''.join(self.blocks[index] for index in range(first, last + 1))
+        offset = self.position - first * self.block_size
+        chunk = data[offset:offset + end - self.position]
+        buffer[:len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+def _default_get(url, headers):
+    return get_session().get(url, headers={'User-Agent': USER_AGENT, **headers}, timeout=20, stream=True)
+
+def first_pages_text(url, pages=FIRST_PAGES, max_bytes=MAX_FETCH_BYTES, get=None):
+    """Return (text of the first pages, KB fetched) without downloading the whole file"""
+    remote = RangeFile(url, get or _default_get, max_bytes=max_bytes)
+    texts = []
+    try:
+        reader = PdfReader(io.BufferedReader(remote, buffer_size=8192), strict=False)
+        for page in reader.pages[:pages]:
+            texts.append(page.extract_text() or '')
+    except OSError as e:
+        # Out of budget halfway: what was read so far still counts
+        if not texts:
+            raise
+        print(f"Stopped reading {url} after {len(texts)} pages: {e}")
+    return '\n'.join(texts), remote.fetched // 1024
+
+def local_pages_text(path, pages=FIRST_PAGES):
+    """Return (text of the first pages, 0 KB fetched) of a PDF on disk"""
+    with open(path, 'rb') as f:
+        reader = PdfReader(f, strict=False)
+        return '\n'.join(page.extract_text() or '' for page in reader.pages[:pages]), 0
+
+def fiscal_year_for_pdf(url, pages=FIRST_PAGES, max_bytes=MAX_FETCH_BYTES, path=None):
+    """Worker: return a dict with the url, year, evidence, KB fetched and any error"""
+    logging.getLogger('pypdf').setLevel(logging.ERROR)
+    result = {'url': url, 'year': None, 'evidence': None, 'kb': 0, 'error': None}
+    try:
+        if path:
+            text, result['kb'] = local_pages_text(path, pages)
+        else:
+            text, result['kb'] = first_pages_text(url, pages, max_bytes)
+        result['year'], result['evidence'] = fiscal_year_from_text(text)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+def fiscal_years_for_pdfs(urls, workers=DEFAULT_WORKERS, pages=FIRST_PAGES, max_bytes=MAX_FETCH_BYTES,
+                         store=None):
+    """
+    Determine the fiscal year of many reports in a process pool, each URL once
+
+    Text extraction is CPU-bound, so processes rather than threads. Returns a
+    dict mapping each URL to the result of fiscal_year_for_pdf. With a ReportStore,
+    stored reports are read from disk and their results are kept as annotations.
+    """
+    if PdfReader is None:
+        print("pypdf is not installed (pip install pypdf); skipping fiscal year extraction")
+        return {}
+
+    unique_urls = list(dict.fromkeys(url for url in urls if url))
+    results = {}
+    stored = {}   # url -> sha256 of the stored report
+    if store is not None:
+        for url in unique_urls:
+            sha256 = store.lookup_url(url)
+            if sha256 is None:
+                continue
+            annotation = store.get_annotation(sha256, 'fiscal_year')
+            if annotation is not None:
+                results[url] = {**json.loads(annotation), 'url': url, 'kb': 0}
+            else:
+                stored[url] = sha256
+        if results:
+            print(f"{len(results)} reports were parsed before, {len(stored)} more are read from the report store")
+
+    # spawn: children must not inherit the parent's open SQLite connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [executor.submit(fiscal_year_for_pdf, url, pages, max_bytes,
+                                   store.path_for(stored[url]) if url in stored else None)
+                   for url in unique_urls if url not in results]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results[result['url']] = result
+            if result['url'] in stored and not result['error']:
+                store.put_annotation(stored[result['url']], 'fiscal_year',
+                                     json.dumps({key: result[key] for key in ('year', 'evidence', 'error')}))
+            if result['error']:
+                print(f"[{done}/{len(futures)}] {result['url']}: {result['error']}")
+            else:
+                print(f"[{done}/{len(futures)}] {result['url']}: {result['year'] or 'no fiscal year found'}"
+                      f" ({result['kb']} KB){' - ' + result['evidence'] if result['evidence'] else ''}")
+    return results
+
+def update_refyear_csv(input_file, output_file=None, workers=DEFAULT_WORKERS, pages=FIRST_PAGES,
+                       max_bytes=MAX_FETCH_BYTES, store=None):
+    """
+    Replace REFYEAR in a CSV with SRC/REFYEAR columns by the year found in each report
+
+    Rows whose report yields no year keep their REFYEAR. Writes to output_file, or
+    replaces input_file. Returns the number of rows changed.
+    """
+    with open(input_file, 'r', encoding='utf-8', newline='') as f:
+        delimiter = ';' if ';' in f.readline() else ','
+        f.seek(0)
+        reader = csv.DictReader(f, delimiter=delimiter)
+        fieldnames = reader.fieldnames
+        rows = list(reader)
+
+    results = fiscal_years_for_pdfs([row['SRC'] for row in rows], workers, pages, max_bytes, store)
+
+    changed = 0
+    for row in rows:
+        year = results.get(row['SRC'], {}).get('year')
+        if year and year != row['REFYEAR']:
+            row['REFYEAR'] = year
+            changed += 1
+
+    output_file = output_file or input_file
+    temp_file = output_file + '.partial'
+    with open(temp_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=delimiter)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(temp_file, output_file)
+
+    print(f"REFYEAR changed in {changed} of {len(rows)} rows, saved to {output_file}")
+    return changed
+
+def main():
+    parser = argparse.ArgumentParser(description='Set REFYEAR from the fiscal year named in the first pages of each report')
+    parser.add_argument('--input', required=True, help='CSV with SRC and REFYEAR columns')
+    parser.add_argument('--output', help='Output CSV (default: overwrite the input)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Worker processes')
+    parser.add_argument('--pages', type=int, default=FIRST_PAGES, help='Pages to read per report')
+    parser.add_argument('--max-kb', type=int, default=MAX_FETCH_BYTES // 1024, help='Most KB to fetch per report')
+    parser.add_argument('--store', help='Report store folder to read downloaded reports from')
+    args = parser.parse_args()
+
+    store = ReportStore(args.store) if args.store else None
+    update_refyear_csv(args.input, args.output, args.workers, args.pages, args.max_kb * 1024, store)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,23 @@
 # google_search.py
-import requests
-import json
-import os
-from api_tracker import APITracker
+from http_session import get_session
+from api_tracker import get_tracker
 from config_handler import get_setting
+from search_cache import get_search_cache
+
+def _cache_params(search_engine_id, num_results):
+    """Parameters that identify a search in the cache"""
+    return {'cx': search_engine_id, 'num': min(num_results, 10)}
+
+def _cached_search(query, search_engine_id, num_results=10):
+    """
+    Results of a search from the shared cache, or None
+
+    Searches that found nothing aren't reused: they spent quota without an answer,
+    and another try may find something.
+    """
+    cached = get_search_cache().get(query, _cache_params(search_engine_id, num_results),
+                                    get_setting('search_cache_days', None, 30))
+    return cached or None
 
 class GoogleSearchAPI:
     def __init__(self, api_key, search_engine_id, daily_limit=None):
@@ -13,11 +27,23 @@ class GoogleSearchAPI:
         if not self.api_key or not self.search_engine_id:
             raise ValueError("Google API key and Search Engine ID are required.")
         
-        self.tracker = APITracker()
+        self.tracker = get_tracker()
         self.daily_limit = daily_limit or get_setting('daily_api_limit', None, 100)
+        self.cache = get_search_cache()
+    
+    def is_cached(self, query, num_results=10):
+        """Check if a search can be answered without spending quota"""
+        return _cached_search(query, self.search_engine_id, num_results) is not None
     
     def search(self, query, num_results=10):
         """Perform a Google search using the Custom Search JSON API"""
+        # Cached searches don't count against the daily quota
+        cached = _cached_search(query, self.search_engine_id, num_results)
+        if cached is not None:
+            self.cache.record_saved_request()
+            print(f"Using cached search results for: {query}")
+            return cached
+        
         if not self.tracker.can_make_request(self.daily_limit):
             print(f"Daily API limit reached ({self.daily_limit} requests). Try again tomorrow.")
             return []
@@ -32,7 +58,7 @@ class GoogleSearchAPI:
         }
         
         try:
-            response = requests.get(base_url, params=params)
+            response = get_session().get(base_url, params=params)
             self.tracker.log_request()
             
             if response.status_code != 200:
@@ -51,6 +77,9 @@ class GoogleSearchAPI:
                         'snippet': item.get('snippet', '')
                     })
             
+            if results:
+                self.cache.put(query, _cache_params(self.search_engine_id, num_results), results)
+            
             # Print remaining quota
             remaining = self.tracker.get_remaining_quota(self.daily_limit)
             print(f"Remaining API quota for today: {remaining}")
@@ -61,9 +90,19 @@ class GoogleSearchAPI:
             print(f"Search error: {e}")
             return []
 
+def build_query(company_name):
+    """Search query used to find a company's annual reports"""
+    return f"{company_name} annual report"
+
+def is_search_cached(company_name, num_results=10, api_key=None, search_engine_id=None):
+    """Check if the search for a company would be served from the cache"""
+    if not api_key or not search_engine_id:
+        return False
+    return _cached_search(build_query(company_name), search_engine_id, num_results) is not None
+
 def search_google(company_name, num_results=10, api_key=None, search_engine_id=None):
     """Search for company annual reports using Google API"""
-    query = f"{company_name} annual report"
+    query = build_query(company_name)
     print(f"Searching for: {query}")
     
     try:
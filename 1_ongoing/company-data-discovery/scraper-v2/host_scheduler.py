@@ -0,0 +1,95 @@
+# host_scheduler.py
+import threading
+import time
+from urllib.parse import urlparse
+
+# Requests per second and burst size for hosts that need extra care.
+# Sub-domains share the bucket of their parent (e.g. html.duckduckgo.com).
+DEFAULT_HOST_RATES = {
+    'duckduckgo.com': (0.4, 1),   # search engine, one query every ~2.5 seconds
+    'googleapis.com': (5.0, 5),   # paid API, limited by quota rather than politeness
+}
+
+class TokenBucket:
+    """Token bucket refilling at `rate` tokens per second up to `capacity`"""
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take one token and return how many seconds the caller has to wait for it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            # Tokens may go negative, which queues later callers behind earlier ones
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+class HostScheduler:
+    """Hands out request slots with one token bucket per host"""
+    def __init__(self, default_rate=1.0, default_burst=2, host_rates=None):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.host_rates = dict(DEFAULT_HOST_RATES if host_rates is None else host_rates)
+        self.buckets = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def _bucket_key(self, host):
+        for domain in self.host_rates:
+            if host == domain or host.endswith('.' + domain):
+                return domain
+        return host
+
+    def _bucket(self, key):
+        with self.lock:
+            if key not in self.buckets:
+                rate, burst = self.host_rates.get(key, (self.default_rate, self.default_burst))
+                self.buckets[key] = TokenBucket(rate, burst)
+                self.stats.setdefault(key, {'requests': 0, 'waited': 0.0})
+            return self.buckets[key]
+
+    def set_rate(self, host, rate, burst=1):
+        """Change the rate for a host (and its sub-domains)"""
+        with self.lock:
+            self.host_rates[host] = (rate, burst)
+            for key in list(self.buckets):
+                if key == host or key.endswith('.' + host):
+                    del self.buckets[key]
+
+    def wait(self, url):
+        """Block until a request to the host of `url` may be sent"""
+        key = self._bucket_key(urlparse(url).netloc.lower())
+        delay = self._bucket(key).reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+        with self.lock:
+            self.stats[key]['requests'] += 1
+            self.stats[key]['waited'] += delay
+        return delay
+
+    def print_stats(self):
+        """Print requests and time spent waiting per host"""
+        with self.lock:
+            stats = sorted(self.stats.items(), key=lambda item: item[1]['waited'], reverse=True)
+        for host, host_stats in stats:
+            print(f"  {host}: {host_stats['requests']} requests, waited {host_stats['waited']:.1f}s")
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Return the scheduler shared by all fetchers"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = HostScheduler()
+        return _scheduler
@@ -0,0 +1,350 @@
+# html_links.py
+import codecs
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Optional fast parsers, used when installed
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# An <a> or <button> element. For buttons, href is the href of the first nested <a>,
+# or else the data-url / data-href / data-download attribute.
+LinkElement = namedtuple('LinkElement', ['tag', 'href', 'text', 'css_class'])
+
+BUTTON_URL_ATTRIBUTES = ['data-url', 'data-href', 'data-download']
+
+# IR pages are far smaller; anything bigger is an archive or a file served as a page
+DEFAULT_MAX_PAGE_BYTES = 5 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.I)
+_HEADER_CHARSET = re.compile(r'charset=["\']?([\w.:-]+)', re.I)
+
+def _declared_encoding(content_type, head):
+    """Charset from the Content-Type header, else from a <meta> tag near the start of the page"""
+    header_match = _HEADER_CHARSET.search(content_type or '')
+    if header_match:
+        encoding = header_match.group(1)
+    else:
+        meta_match = _META_CHARSET.search(head[:2048])
+        encoding = meta_match.group(1).decode('ascii') if meta_match else 'utf-8'
+
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return 'utf-8'
+
+def decode_html(content, content_type=None):
+    """
+    Decode a page once, using the charset from Content-Type or the page's <meta> tag
+
+    Unlike response.text this never falls back to (slow) statistical charset detection;
+    pages without any declaration are read as UTF-8.
+    """
+    return content.decode(_declared_encoding(content_type, content), errors='replace')
+
+def _button_href(attributes, nested_href):
+    if nested_href is not None:
+        return nested_href
+    for attribute in BUTTON_URL_ATTRIBUTES:
+        if attributes.get(attribute):
+            return attributes[attribute]
+    return None
+
+def _parse_selectolax(html):
+    elements = []
+    for node in LexborHTMLParser(html).css('a, button'):
+        attributes = node.attributes
+        if node.tag == 'a':
+            href = attributes.get('href')
+        else:
+            nested = node.css_first('a')
+            href = _button_href(attributes, nested.attributes.get('href') if nested is not None else None)
+        elements.append(LinkElement(node.tag, href, node.text(deep=True), attributes.get('class') or ''))
+    return elements
+
+def _lxml_link(node):
+    if node.tag == 'a':
+        href = node.get('href')
+    else:
+        nested = next(node.iter('a'), None)
+        href = _button_href(node.attrib, nested.get('href') if nested is not None else None)
+    return LinkElement(node.tag, href, node.text_content(), node.get('class') or '')
+
+def _parse_lxml(html):
+    if not html.strip():
+        return []
+    return [_lxml_link(node) for node in lxml.html.document_fromstring(html).iter('a', 'button')]
+
+def _soup_elements(soup):
+    elements = []
+    for node in soup.find_all(['a', 'button']):
+        if node.name == 'a':
+            href = node.get('href')
+        else:
+            nested = node.find('a')
+            href = _button_href(node.attrs, nested.get('href') if nested is not None else None)
+        elements.append(LinkElement(node.name, href, node.get_text(), ' '.join(node.get('class', []))))
+    return elements
+
+def _parse_soupstrainer(html):
+    # Only <a> and <button> subtrees are built
+    return _soup_elements(BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer(['a', 'button'])))
+
+def _parse_soup(html):
+    # Full tree, as the scrapers used to do; kept as the benchmark baseline
+    return _soup_elements(BeautifulSoup(html, 'html.parser'))
+
+class LinkCollector(HTMLParser):
+    """Tokenizer that only keeps <a> and <button> elements, without building a tree"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.elements = []
+        self.open_elements = []  # [index, tag, attributes, text parts, nested href, nested seen]
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in ('a', 'button'):
+            return
+        # Links can't nest, so a new <a> closes an unclosed one (as browsers do)
+        if tag == 'a' and any(entry[1] == 'a' for entry in self.open_elements):
+            self.handle_endtag('a')
+
+        attributes = dict(attrs)
+        if tag == 'a':
+            for entry in self.open_elements:
+                if entry[1] == 'button' and not entry[5]:
+                    entry[4], entry[5] = attributes.get('href'), True
+
+        self.elements.append(None)
+        self.open_elements.append([len(self.elements) - 1, tag, attributes, [], None, False])
+
+    def handle_data(self, data):
+        for entry in self.open_elements:
+            entry[3].append(data)
+
+    def handle_endtag(self, tag):
+        if tag not in ('a', 'button'):
+            return
+        for position in range(len(self.open_elements) - 1, -1, -1):
+            if self.open_elements[position][1] == tag:
+                # Anything opened inside and not closed ends here too
+                for entry in self.open_elements[position:]:
+                    self._finish(entry)
+                del self.open_elements[position:]
+                return
+
+    def _finish(self, entry):
+        index, tag, attributes, text, nested_href, _ = entry
+        href = attributes.get('href') if tag == 'a' else _button_href(attributes, nested_href)
+        self.elements[index] = LinkElement(tag, href, ''.join(text), attributes.get('class') or '')
+
+    def close(self):
+        super().close()
+        for entry in self.open_elements:
+            self._finish(entry)
+        self.open_elements = []
+
+class LxmlLinkCollector:
+    """LinkCollector on lxml's pull parser: same feed()/close() and elements, far faster"""
+    def __init__(self):
+        self.parser = lxml.etree.HTMLPullParser(events=('start', 'end'), tag=('a', 'button'))
+        self.parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+        self.elements = []
+        self.open_elements = {}   # node -> index in elements
+
+    def feed(self, html):
+        self.parser.feed(html)
+        self._read_events()
+
+    def close(self):
+        try:
+            self.parser.close()
+        except lxml.etree.XMLSyntaxError:
+            pass   # nothing but whitespace was fed
+        self._read_events()
+
+    def _read_events(self):
+        for event, node in self.parser.read_events():
+            if event == 'start':
+                self.elements.append(None)
+                self.open_elements[node] = len(self.elements) - 1
+            else:
+                self.elements[self.open_elements.pop(node)] = _lxml_link(node)
+
+def _parse_stdlib(html):
+    collector = LinkCollector()
+    collector.feed(html)
+    collector.close()
+    return collector.elements
+
+BACKENDS = {
+    'selectolax': _parse_selectolax,
+    'lxml': _parse_lxml,
+    'stdlib': _parse_stdlib,
+    'soupstrainer': _parse_soupstrainer,
+    'soup': _parse_soup,
+}
+
+# Parsers that can be fed a page chunk by chunk, for iter_link_elements
+INCREMENTAL_BACKENDS = {
+    'lxml': LxmlLinkCollector,
+    'stdlib': LinkCollector,
+}
+
+def available_backends():
+    """Names of the backends that can be used in this environment"""
+    missing = set()
+    if LexborHTMLParser is None:
+        missing.add('selectolax')
+    if lxml is None:
+        missing.add('lxml')
+    return [name for name in BACKENDS if name not in missing]
+
+# Fastest available first; stdlib needs nothing beyond Python
+_backend = available_backends()[0]
+
+def _incremental_collector(backend=None):
+    """Feed parser for the chosen backend, else lxml's if installed, else the stdlib one"""
+    name = backend or _backend
+    if name not in INCREMENTAL_BACKENDS:
+        name = 'lxml' if lxml is not None else 'stdlib'
+    return INCREMENTAL_BACKENDS[name]()
+
+def set_backend(name):
+    """Choose the parser used by parse_link_elements"""
+    global _backend
+    if name not in available_backends():
+        raise ValueError(f"HTML parser backend '{name}' is not available (choose from {', '.join(available_backends())})")
+    _backend = name
+
+def get_backend():
+    return _backend
+
+def parse_link_elements(html, backend=None):
+    """Return the <a> and <button> elements of a page (as text) in document order"""
+    return BACKENDS[backend or _backend](html)
+
+def response_link_elements(response, backend=None):
+    """Decode a response once and return its <a> and <button> elements"""
+    html = decode_html(response.content, response.headers.get('Content-Type'))
+    return parse_link_elements(html, backend)
+
+def is_html_response(response):
+    """True if the response says it is an HTML page (or doesn't say at all)"""
+    content_type = response.headers.get('Content-Type', '').lower()
+    return not content_type or any(html_type in content_type for html_type in HTML_CONTENT_TYPES)
+
+def read_html_body(response, max_bytes=DEFAULT_MAX_PAGE_BYTES, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Read the body of a streamed page as bytes, for parsing elsewhere
+
+    Returns None for responses that aren't HTML or announce more than max_bytes,
+    without reading the body, and cuts bodies off at max_bytes. A complete body
+    becomes response.content and sets response.complete, so it can be cached.
+    """
+    response.complete = False
+    if getattr(response, 'from_cache', False):
+        response.complete = True
+        return response.content
+
+    try:
+        if not is_html_response(response):
+            print(f"Skipping {response.url}: not an HTML page ({response.headers.get('Content-Type')})")
+            return None
+
+        content_length = response.headers.get('Content-Length', '')
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            print(f"Skipping {response.url}: {int(content_length) / (1024 * 1024):.1f} MB is over the page size limit")
+            return None
+
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size):
+            body += chunk
+            if len(body) > max_bytes:
+                print(f"Page {response.url} is larger than {max_bytes // (1024 * 1024)} MB, only the start was parsed")
+                return bytes(body[:max_bytes])
+
+        response._content = bytes(body)
+        response._content_consumed = True
+        response.complete = True
+        return response._content
+    finally:
+        response.close()
+
+def iter_link_elements(response, max_bytes=DEFAULT_MAX_PAGE_BYTES, chunk_size=STREAM_CHUNK_SIZE, backend=None):
+    """
+    Yield the <a> and <button> elements of a response while its body downloads
+
+    Pass a response requested with stream=True. Same limits as read_html_body, but
+    each chunk is parsed as it arrives (with lxml's pull parser if installed), so
+    the first links are handled before the rest of the page is in. If the whole body
+    was read, it becomes response.content and response.complete is set, so the page
+    can be cached afterwards.
+    """
+    response.complete = False
+
+    # Cached pages are already in memory; parse them with the fastest backend
+    if getattr(response, 'from_cache', False):
+        response.complete = True
+        yield from response_link_elements(response, backend)
+        return
+
+    try:
+        if not is_html_response(response):
+            print(f"Skipping {response.url}: not an HTML page ({response.headers.get('Content-Type')})")
+            return
+
+        content_length = response.headers.get('Content-Length', '')
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            print(f"Skipping {response.url}: {int(content_length) / (1024 * 1024):.1f} MB is over the page size limit")
+            return
+
+        collector = _incremental_collector(backend)
+        decoder = None
+        body = bytearray()
+        emitted = 0
+        truncated = False
+
+        for chunk in response.iter_content(chunk_size):
+            if not chunk:
+                continue
+            if len(body) + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - len(body)]
+                truncated = True
+            body += chunk
+
+            if decoder is None:
+                encoding = _declared_encoding(response.headers.get('Content-Type'), chunk)
+                decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            collector.feed(decoder.decode(chunk))
+
+            # Hand out every element that is complete so far, in document order
+            while emitted < len(collector.elements) and collector.elements[emitted] is not None:
+                yield collector.elements[emitted]
+                emitted += 1
+
+            if truncated:
+                print(f"Page {response.url} is larger than {max_bytes // (1024 * 1024)} MB, only the start was parsed")
+                break
+
+        if decoder is not None:
+            collector.feed(decoder.decode(b'', final=True))
+        collector.close()
+        yield from collector.elements[emitted:]
+
+        if not truncated:
+            response._content = bytes(body)
+            response._content_consumed = True
+            response.complete = True
+    finally:
+        response.close()
@@ -0,0 +1,157 @@
+# http_session.py
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from negative_cache import get_negative_cache, HostSkipped
+
+# Defaults for the shared session; override them with configure_session()
+SESSION_DEFAULTS = {
+    'pool_connections': 100,   # number of hosts to keep connection pools for
+    'pool_maxsize': 10,        # keep-alive connections per host
+    'retries': 3,              # retries for 429/5xx answers
+    'connect_retries': 0,      # retries for timeouts and refused or dropped connections
+    'backoff_factor': 0.5,     # sleep 0.5s, 1s, 2s ... between retries
+    'retry_after_max': 30,     # longest Retry-After (seconds) honoured before a retry
+}
+
+# Worst case for one call with timeout T: a host that doesn't answer costs
+# (1 + connect_retries) * T. The callers already retry and the negative cache gives up
+# on hosts that keep failing, so by default that is a single T. A host answering
+# 429/5xx costs at most (1 + retries) * T plus retries * retry_after_max of waiting.
+
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+class CappedRetry(Retry):
+    """Retry that waits at most retry_after_max seconds for a Retry-After header"""
+    def __init__(self, retry_after_max=None, **kwargs):
+        super().__init__(**kwargs)
+        self.retry_after_max = retry_after_max
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.retry_after_max = self.retry_after_max
+        return retry
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None or self.retry_after_max is None:
+            return retry_after
+        return min(retry_after, self.retry_after_max)
+
+class NegativeCacheAdapter(HTTPAdapter):
+    """HTTPAdapter that skips known dead URLs and failing hosts, and records new ones"""
+    def send(self, request, **kwargs):
+        negative_cache = get_negative_cache()
+        
+        if negative_cache.is_failing_host(request.url):
+            raise HostSkipped(f"Skipping {request.url}: host keeps timing out or refusing connections",
+                              request=request)
+        
+        dead_status = negative_cache.dead_status(request.url)
+        if dead_status is not None:
+            response = requests.Response()
+            response.status_code = dead_status
+            response.reason = 'Not Found (negative cache)'
+            response.url = request.url
+            response.request = request
+            response._content = b''
+            response._content_consumed = True   # nothing to close for streamed requests
+            response.from_cache = True
+            return response
+        
+        try:
+            response = super().send(request, **kwargs)
+        except (requests.exceptions.ConnectTimeout, requests.exceptions.ReadTimeout,
+                requests.exceptions.ConnectionError) as e:
+            negative_cache.record_failure(request.url, e)
+            raise
+        
+        negative_cache.record_response(request.url, response.status_code, request.method)
+        return response
+
+_session = None
+_session_settings = dict(SESSION_DEFAULTS)
+_session_lock = threading.Lock()
+
+def _build_session(settings):
+    """Create a session with pooled, retrying adapters for http and https"""
+    retry = CappedRetry(
+        total=settings['retries'],
+        connect=settings['connect_retries'],
+        read=settings['connect_retries'],
+        status=settings['retries'],
+        backoff_factor=settings['backoff_factor'],
+        retry_after_max=settings['retry_after_max'],
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=['HEAD', 'GET'],
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = NegativeCacheAdapter(
+        pool_connections=settings['pool_connections'],
+        pool_maxsize=settings['pool_maxsize'],
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def configure_session(**settings):
+    """Change the pool/retry settings; the shared session is rebuilt on next use"""
+    global _session
+    unknown = set(settings) - set(SESSION_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown session settings: {', '.join(sorted(unknown))}")
+
+    with _session_lock:
+        _session_settings.update(settings)
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def get_session():
+    """Return the session shared by all fetchers"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session(_session_settings)
+        return _session
+
+def connection_stats():
+    """Count requests and new connections (handshakes) per host in the shared session"""
+    stats = {}
+    with _session_lock:
+        if _session is None:
+            return stats
+        adapters = set(_session.adapters.values())
+
+    for adapter in adapters:
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host_stats = stats.setdefault(pool.host, {'requests': 0, 'new_connections': 0})
+            host_stats['requests'] += pool.num_requests
+            host_stats['new_connections'] += pool.num_connections
+
+    for host_stats in stats.values():
+        host_stats['reused'] = max(host_stats['requests'] - host_stats['new_connections'], 0)
+    return stats
+
+def print_connection_stats():
+    """Print connection reuse vs. new handshakes for the shared session"""
+    stats = connection_stats()
+    if not stats:
+        return
+
+    total_requests = sum(s['requests'] for s in stats.values())
+    total_new = sum(s['new_connections'] for s in stats.values())
+    print(f"HTTP connections: {total_requests} requests, {total_new} new connections, "
+          f"{total_requests - total_new} reused")
+    for host, host_stats in sorted(stats.items(), key=lambda item: item[1]['requests'], reverse=True):
+        print(f"  {host}: {host_stats['requests']} requests, {host_stats['new_connections']} new, "
+              f"{host_stats['reused']} reused")
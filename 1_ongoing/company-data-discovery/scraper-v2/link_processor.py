@@ -1,8 +1,12 @@
 # link_processor.py
-import requests
-from bs4 import BeautifulSoup
 import re
 from urllib.parse import urljoin
+from http_session import get_session
+from host_scheduler import get_scheduler
+from response_cache import get_response_cache
+from html_links import read_html_body, iter_link_elements, parse_link_elements, decode_html, get_backend
+from parse_pool import get_parse_pool
+from report_keywords import match_report_keywords, get_vocabulary, set_vocabulary
 
 def is_pdf_link(url):
     """Check if URL is a direct link to a PDF"""
@@ -15,6 +19,61 @@ def extract_year(text):
         return year_match.group(0)
     return None
 
+def _report_link(link, base_url):
+    """(url, text, year, keyword hits) if the element links to a report PDF, else None"""
+    href = link.href
+    if link.tag != 'a' or not href:
+        return None
+        
+    if not href.startswith(('http://', 'https://')):
+        href = urljoin(base_url, href)
+        
+    if not is_pdf_link(href):
+        return None
+    link_text = link.text.strip()
+    
+    # Report keywords (in the chosen vocabulary) and the year in one pass
+    match = match_report_keywords(href, link_text)
+    
+    if not match.is_report:
+        return None
+    return href, link_text, match.year, len(match.keywords)
+
+def report_links_from_html(content, content_type, base_url, backend=None, vocabulary=None):
+    """
+    Parse a page and return its report PDF links as (url, text, year, keyword hits) tuples
+
+    Runs in the parse pool's worker processes: it only gets bytes and returns a short
+    list, so little has to be pickled either way. The workers don't share the caller's
+    settings, so the parser backend and report vocabulary are passed along.
+    """
+    if vocabulary is not None:
+        set_vocabulary(vocabulary)
+    pdf_links = []
+    for element in parse_link_elements(decode_html(content, content_type), backend):
+        link = _report_link(element, base_url)
+        if link is not None:
+            pdf_links.append(link)
+    return pdf_links
+
+def _get_page(url, headers):
+    # Requests to one host are spaced out, however many threads fetch from it
+    get_scheduler().wait(url)
+    return get_session().get(url, headers=headers, timeout=10, stream=True)
+
+def _parse_in_pool(url, response, cache):
+    """Read the whole page, then get its report links from a parser process"""
+    # Big or non-HTML bodies are never read
+    content = read_html_body(response)
+    if content is None:
+        return []
+    cache.store(url, response)
+    
+    # Parsing holds the GIL, so it runs in a worker process while this thread's
+    # siblings keep downloading
+    return get_parse_pool().parse(report_links_from_html, content,
+                                  response.headers.get('Content-Type'), url, get_backend(), get_vocabulary())
+
 def extract_pdf_links(url):
     """Extract PDF links from a webpage that might be annual reports"""
     headers = {
@@ -22,34 +81,24 @@ def extract_pdf_links(url):
     }
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        pdf_links = []
-        
-        for link in soup.find_all('a', href=True):
-            href = link.get('href', '')
-            if not href:
-                continue
-                
-            if not href.startswith(('http://', 'https://')):
-                href = urljoin(url, href)
-                
-            if is_pdf_link(href):
-                link_text = link.get_text().strip()
-                
-                # Keywords that might indicate an annual report
-                keywords = ['annual report', 'annual-report', 'financial report', 'annual results']
-                
-                if any(keyword in link_text.lower() or keyword in href.lower() for keyword in keywords):
-                    year = extract_year(href) or extract_year(link_text)
-                    pdf_links.append({
-                        'url': href,
-                        'text': link_text,
-                        'year': year
-                    })
-        
-        return pdf_links
+        cache = get_response_cache()
+        response = cache.fetch(
+            url, lambda extra: _get_page(url, {**headers, **extra}),
+            stream=True
+        )
+        # Without parser processes, links are matched while the page downloads
+        if get_parse_pool().inline:
+            links = []
+            for element in iter_link_elements(response):
+                link = _report_link(element, url)
+                if link is not None:
+                    links.append(link)
+            cache.store(url, response)
+        else:
+            links = _parse_in_pool(url, response, cache)
+        return [{'url': href, 'text': text, 'year': year, 'keyword_hits': keyword_hits}
+                for href, text, year, keyword_hits in links]
         
     except Exception as e:
         print(f"Error processing {url}: {e}")
-        return []
\ No newline at end of file
+        return []
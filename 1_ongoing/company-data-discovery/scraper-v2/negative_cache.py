@@ -0,0 +1,182 @@
+# negative_cache.py
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from response_cache import normalize_url
+
+DEFAULT_NEGATIVE_CACHE_FILE = 'negative_cache.sqlite'
+
+# Defaults for the shared negative cache; override them with configure_negative_cache()
+NEGATIVE_CACHE_DEFAULTS = {
+    'dead_url_ttl': 7 * 24 * 60 * 60,    # skip URLs that answered 404/410 for a week
+    'failing_host_ttl': 24 * 60 * 60,    # skip hosts that keep failing for a day
+    'host_failure_threshold': 3,         # consecutive timeouts/refusals before a host is skipped
+}
+
+DEAD_STATUS_CODES = (404, 410)
+
+class HostSkipped(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request to a host that keeps failing"""
+
+class NegativeCache:
+    """
+    Persistent record of URLs that are gone and hosts that keep timing out or refusing
+
+    Both expire, so a report that gets published later or a host that comes back
+    is tried again. Lookups are answered from memory; the database is only written
+    when a URL or host enters or leaves the cache.
+    """
+    def __init__(self, path=DEFAULT_NEGATIVE_CACHE_FILE, dead_url_ttl=None, failing_host_ttl=None,
+                 host_failure_threshold=None):
+        self.path = path
+        self.dead_url_ttl = (NEGATIVE_CACHE_DEFAULTS['dead_url_ttl'] if dead_url_ttl is None
+                             else dead_url_ttl)
+        self.failing_host_ttl = (NEGATIVE_CACHE_DEFAULTS['failing_host_ttl'] if failing_host_ttl is None
+                                 else failing_host_ttl)
+        self.host_failure_threshold = (NEGATIVE_CACHE_DEFAULTS['host_failure_threshold']
+                                       if host_failure_threshold is None else host_failure_threshold)
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.stats = {'skipped_urls': 0, 'skipped_hosts': 0, 'dead_urls': 0, 'host_failures': 0}
+
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS dead_urls (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                recorded_at REAL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS failing_hosts (
+                host TEXT PRIMARY KEY,
+                failures INTEGER,
+                last_error TEXT,
+                last_failure REAL
+            )
+        """)
+        self.conn.execute('DELETE FROM dead_urls WHERE recorded_at < ?', (time.time() - self.dead_url_ttl,))
+        self.conn.commit()
+
+        # key -> (status, recorded_at) and host -> [failures, last_failure]
+        self.dead_urls = {key: (status, recorded_at) for key, status, recorded_at
+                          in self.conn.execute('SELECT key, status, recorded_at FROM dead_urls')}
+        self.failing_hosts = {host: [failures, last_failure] for host, failures, last_failure
+                              in self.conn.execute('SELECT host, failures, last_failure FROM failing_hosts')}
+
+    @staticmethod
+    def _host(url):
+        # Keep the port: another service on the same machine may be fine
+        return urlsplit(url).netloc.lower()
+
+    def dead_status(self, url):
+        """Return the recorded 404/410 status of `url`, or None if it isn't known to be dead"""
+        if not self.enabled:
+            return None
+        entry = self.dead_urls.get(normalize_url(url))
+        if entry is None or time.time() - entry[1] > self.dead_url_ttl:
+            return None
+        with self.lock:
+            self.stats['skipped_urls'] += 1
+        return entry[0]
+
+    def is_failing_host(self, url):
+        """True if the host of `url` failed too often recently"""
+        if not self.enabled:
+            return False
+        entry = self.failing_hosts.get(self._host(url))
+        if entry is None or entry[0] < self.host_failure_threshold:
+            return False
+        if time.time() - entry[1] > self.failing_host_ttl:
+            return False
+        with self.lock:
+            self.stats['skipped_hosts'] += 1
+        return True
+
+    def record_response(self, url, status, method='GET'):
+        """Remember dead URLs; any answer at all means the host is reachable again"""
+        if not self.enabled:
+            return
+        host = self._host(url)
+        # Some servers reject HEAD but serve GET, so only a GET proves a URL is gone
+        dead = method == 'GET' and status in DEAD_STATUS_CODES
+        key = normalize_url(url) if dead or self.dead_urls else None
+        # Most answers change nothing: the host wasn't failing and the URL wasn't dead
+        if not dead and host not in self.failing_hosts and key not in self.dead_urls:
+            return
+
+        with self.lock:
+            if self.failing_hosts.pop(host, None) is not None:
+                self.conn.execute('DELETE FROM failing_hosts WHERE host = ?', (host,))
+            if dead:
+                recorded_at = time.time()
+                self.dead_urls[key] = (status, recorded_at)
+                self.conn.execute('INSERT OR REPLACE INTO dead_urls VALUES (?, ?, ?, ?)',
+                                  (key, url, status, recorded_at))
+                self.stats['dead_urls'] += 1
+            elif method == 'GET' and self.dead_urls.pop(key, None) is not None:
+                # Back after its entry expired
+                self.conn.execute('DELETE FROM dead_urls WHERE key = ?', (key,))
+            self.conn.commit()
+
+    def record_failure(self, url, error):
+        """Count a timeout or refused connection against the host of `url`"""
+        if not self.enabled:
+            return
+        host = self._host(url)
+        now = time.time()
+        with self.lock:
+            entry = self.failing_hosts.setdefault(host, [0, now])
+            entry[0] += 1
+            entry[1] = now
+            self.conn.execute(
+                'INSERT INTO failing_hosts VALUES (?, 1, ?, ?) ON CONFLICT(host) DO UPDATE SET '
+                'failures = failures + 1, last_error = excluded.last_error, last_failure = excluded.last_failure',
+                (host, type(error).__name__, now)
+            )
+            self.conn.commit()
+            self.stats['host_failures'] += 1
+
+    def clear(self):
+        """Forget all dead URLs and failing hosts"""
+        with self.lock:
+            self.dead_urls.clear()
+            self.failing_hosts.clear()
+            self.conn.execute('DELETE FROM dead_urls')
+            self.conn.execute('DELETE FROM failing_hosts')
+            self.conn.commit()
+
+    def print_stats(self):
+        """Print how many requests the negative cache saved in this run"""
+        if not any(self.stats.values()):
+            return
+        print(f"Negative cache: skipped {self.stats['skipped_urls']} dead URLs and "
+              f"{self.stats['skipped_hosts']} requests to failing hosts; "
+              f"recorded {self.stats['dead_urls']} dead URLs, {self.stats['host_failures']} host failures")
+
+_cache = None
+_cache_settings = dict(NEGATIVE_CACHE_DEFAULTS)
+_cache_lock = threading.Lock()
+
+def configure_negative_cache(**settings):
+    """Change the expiry settings; the shared cache is recreated on next use"""
+    global _cache
+    unknown = set(settings) - set(NEGATIVE_CACHE_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown negative cache settings: {', '.join(sorted(unknown))}")
+
+    with _cache_lock:
+        _cache_settings.update(settings)
+        _cache = None
+
+def get_negative_cache():
+    """Return the negative cache consulted by the shared session"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = NegativeCache(**_cache_settings)
+        return _cache
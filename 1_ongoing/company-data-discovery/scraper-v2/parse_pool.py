@@ -0,0 +1,209 @@
+# parse_pool.py
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+# CPU time limits per task need setrlimit, which Windows doesn't have
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Defaults for the shared parse pool; override them with configure_parse_pool()
+PARSE_DEFAULTS = {
+    'workers': max(1, (os.cpu_count() or 2) - 1),   # parser processes; 0 parses in the calling thread
+    'cpu_timeout': 10,     # CPU seconds a single page may take
+    'wall_timeout': 30,    # backstop for parsers stuck in C code, where the CPU limit can't interrupt them
+}
+
+class ParseTimeout(Exception):
+    """Raised when parsing a page took longer than its time limit"""
+
+def _on_cpu_limit(signum, frame):
+    raise ParseTimeout("CPU time limit reached")
+
+# Start times of the running tasks, by slot, shared with the workers of the pool
+_started = None
+
+def _init_worker(started):
+    global _started
+    _started = started
+    # Over the soft CPU limit the kernel sends SIGXCPU; make that an exception in the task
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+def _run_task(slot, cpu_timeout, func, args):
+    """Worker side: note when the task starts, so its wall-clock limit leaves out time in the queue"""
+    _started[slot] = time.time()
+    return _run_limited(cpu_timeout, func, args)
+
+def _run_limited(cpu_timeout, func, args):
+    """Worker side: run func(*args) with at most cpu_timeout more seconds of CPU time"""
+    if resource is None or not cpu_timeout:
+        return func(*args)
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    limit = int(usage.ru_utime + usage.ru_stime) + int(cpu_timeout) + 1
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+    try:
+        return func(*args)
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+class ParsePool:
+    """
+    Runs CPU-bound parsing in worker processes, away from the threads doing network I/O
+
+    parse() blocks the calling thread until the result is back, so fetch threads hand
+    over a page and wait while other threads keep downloading. No more pages are handed
+    over than there are workers. Each task gets a CPU time limit inside the worker and a
+    wall-clock limit, from when a worker picked it up, outside; a worker that overruns
+    the latter is killed and the pool restarted. Tasks that were running alongside it
+    are retried in the new pool, the run itself carries on.
+    """
+    def __init__(self, **settings):
+        unknown = set(settings) - set(PARSE_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown parse pool settings: {', '.join(sorted(unknown))}")
+        self.settings = {**PARSE_DEFAULTS, **settings}
+        self.lock = threading.Lock()
+        self.executor = None
+        self.generation = 0
+        self.stats = {'parsed': 0, 'timeouts': 0, 'errors': 0, 'restarts': 0, 'seconds': 0.0}
+
+        # One slot per worker: holding a slot is what lets a thread submit a task, and
+        # the worker notes the task's start time under it
+        workers = max(1, self.settings['workers'])
+        self.free_slots = queue.Queue()
+        for slot in range(workers):
+            self.free_slots.put(slot)
+        self.started = multiprocessing.get_context('spawn').RawArray('d', workers)
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                # spawn: workers must not inherit the parent's open SQLite connections and threads
+                self.executor = ProcessPoolExecutor(max_workers=self.settings['workers'],
+                                                    mp_context=multiprocessing.get_context('spawn'),
+                                                    initializer=_init_worker, initargs=(self.started,))
+            return self.executor, self.generation
+
+    def _restart(self, generation, kill=False):
+        """Throw away the pool (once per generation, however many threads notice it broke)"""
+        with self.lock:
+            if generation != self.generation or self.executor is None:
+                return
+            executor, self.executor = self.executor, None
+            self.generation += 1
+            self.stats['restarts'] += 1
+        if kill:
+            # The only way to stop a task that is running: end its process
+            for process in list((executor._processes or {}).values()):
+                process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _wait(self, future, slot):
+        """Result of a task, allowing it wall_timeout seconds from when a worker started it"""
+        while True:
+            started = self.started[slot]
+            # Until a worker has picked the task up (e.g. while the pool starts), look every second
+            remaining = started + self.settings['wall_timeout'] - time.time() if started else 1
+            try:
+                return future.result(timeout=max(remaining, 0))
+            except FutureTimeout:
+                if started:
+                    raise
+
+    def _run(self, slot, func, args):
+        for _ in range(3):
+            executor, generation = self._get_executor()
+            self.started[slot] = 0
+            try:
+                future = executor.submit(_run_task, slot, self.settings['cpu_timeout'], func, args)
+            except RuntimeError:
+                continue   # another thread has just shut this pool down
+            try:
+                return self._wait(future, slot)
+            except FutureTimeout:
+                self._restart(generation, kill=True)
+                raise ParseTimeout(f"no result after {self.settings['wall_timeout']} seconds")
+            except (BrokenProcessPool, CancelledError):
+                # Killed along with another task's worker (or by the OS); try again in a new pool
+                self._restart(generation)
+        raise RuntimeError("parse pool keeps breaking")
+
+    @property
+    def inline(self):
+        """True if tasks run in the calling thread (workers set to 0)"""
+        return self.settings['workers'] <= 0
+
+    def parse(self, func, *args):
+        """Run func(*args) in a worker process and return its result; raises ParseTimeout"""
+        try:
+            if self.inline:
+                started = time.monotonic()
+                result = _run_limited(None, func, args)
+            else:
+                slot = self.free_slots.get()
+                try:
+                    started = time.monotonic()
+                    result = self._run(slot, func, args)
+                finally:
+                    self.free_slots.put(slot)
+        except Exception as e:
+            with self.lock:
+                self.stats['timeouts' if isinstance(e, ParseTimeout) else 'errors'] += 1
+            raise
+
+        with self.lock:
+            self.stats['parsed'] += 1
+            self.stats['seconds'] += time.monotonic() - started
+        return result
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def print_stats(self):
+        """Print how many pages were parsed and how many failed or ran out of time"""
+        if not (self.stats['parsed'] or self.stats['timeouts'] or self.stats['errors']):
+            return
+        average = self.stats['seconds'] / max(self.stats['parsed'], 1) * 1000
+        print(f"Parse pool: {self.stats['parsed']} pages in {self.settings['workers']} processes, "
+              f"{average:.0f} ms on average, {self.stats['timeouts']} timed out, "
+              f"{self.stats['errors']} failed, {self.stats['restarts']} restarts")
+
+_pool = None
+_pool_settings = dict(PARSE_DEFAULTS)
+_pool_lock = threading.Lock()
+
+def configure_parse_pool(**settings):
+    """Change the pool settings; the shared pool is rebuilt on next use"""
+    global _pool
+    unknown = set(settings) - set(PARSE_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown parse pool settings: {', '.join(sorted(unknown))}")
+
+    with _pool_lock:
+        _pool_settings.update(settings)
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+def get_parse_pool():
+    """Return the parse pool shared by all fetch threads"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ParsePool(**_pool_settings)
+        return _pool
@@ -0,0 +1,183 @@
+# pdf_sniffer.py
+import html
+import re
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+from http_session import get_session
+from host_scheduler import get_scheduler
+from report_keywords import find_year
+
+# The header, the XMP packet of most reports and the first objects fit in here
+SNIFF_BYTES = 16 * 1024
+# Without a linearized header the info dictionary is usually just before the trailer
+TAIL_BYTES = 8 * 1024
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# status is the HTTP status of the range request. year is the best guess of the
+# fiscal year (REFYEAR), year_source says where it came from.
+PdfInfo = namedtuple('PdfInfo', ['status', 'is_pdf', 'title', 'created', 'last_modified',
+                                 'size', 'year', 'year_source'])
+
+_MAGIC = b'%PDF-'
+_INFO_TITLE = re.compile(rb'/Title\s*([(<])')
+_INFO_DATE = re.compile(rb'/CreationDate\s*\(\s*(?:D:)?(\d{4})(\d{2})?')
+_XMP_TITLE = re.compile(rb'<dc:title>.*?<rdf:li[^>]*>(.*?)</rdf:li>', re.S)
+_XMP_DATE = re.compile(rb'xmp:CreateDate(?:\s*=\s*["\']|>)\s*(\d{4})(?:-(\d{2}))?')
+_CONTENT_RANGE_TOTAL = re.compile(r'/\s*(\d+)\s*$')
+_PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+def _literal_string(data, start):
+    """Bytes of the PDF literal string whose '(' is at start (nested parentheses and escapes)"""
+    value = bytearray()
+    depth = 1
+    position = start + 1
+    while position < len(data):
+        char = data[position:position + 1]
+        if char == b'\\':
+            escaped = data[position + 1:position + 2]
+            octal = re.match(rb'[0-7]{1,3}', data[position + 1:position + 4])
+            if octal:
+                value.append(int(octal.group(), 8) & 0xFF)
+                position += 1 + len(octal.group())
+                continue
+            if escaped not in (b'\n', b'\r'):
+                value += _PDF_ESCAPES.get(escaped, escaped)
+            position += 2
+            continue
+        if char == b'(':
+            depth += 1
+        elif char == b')':
+            depth -= 1
+            if depth == 0:
+                return bytes(value)
+        value += char
+        position += 1
+    return None   # cut off by the end of the range
+
+def _decode_pdf_text(raw):
+    if raw.startswith(b'\xfe\xff'):
+        return raw[2:].decode('utf-16-be', errors='replace')
+    return raw.decode('latin-1')
+
+def _info_title(data):
+    for match in _INFO_TITLE.finditer(data):
+        if match.group(1) == b'(':
+            raw = _literal_string(data, match.start(1))
+        else:
+            end = data.find(b'>', match.end(1))
+            hex_digits = re.sub(rb'\s', b'', data[match.end(1):end]) if end != -1 else b''
+            raw = bytes.fromhex(hex_digits.decode('ascii') + '0' * (len(hex_digits) % 2)) if hex_digits else None
+        if raw:
+            title = _decode_pdf_text(raw).strip()
+            if title:
+                return title
+    return None
+
+def parse_pdf_metadata(data):
+    """
+    Return (is_pdf, title, creation date as (year, month)) from the bytes of a PDF
+
+    Works on partial files: only what is inside `data` is looked at. Metadata in
+    compressed object streams can't be read this way and comes back as None.
+    """
+    # The spec allows some junk before the header
+    if data.find(_MAGIC, 0, 1024) == -1:
+        return False, None, None
+
+    title = None
+    xmp_title = _XMP_TITLE.search(data)
+    if xmp_title:
+        title = html.unescape(xmp_title.group(1).decode('utf-8', errors='replace')).strip() or None
+    if title is None:
+        title = _info_title(data)
+
+    created = None
+    date_match = _XMP_DATE.search(data) or _INFO_DATE.search(data)
+    if date_match:
+        created = (int(date_match.group(1)), int(date_match.group(2) or 0))
+
+    return True, title, created
+
+def _read_at_most(response, limit):
+    data = bytearray()
+    try:
+        for chunk in response.iter_content(4096):
+            data += chunk
+            if len(data) >= limit:
+                break
+    finally:
+        response.close()
+    return bytes(data[:limit])
+
+def _total_size(response):
+    if response.status_code == 206:
+        match = _CONTENT_RANGE_TOTAL.search(response.headers.get('Content-Range', ''))
+        return int(match.group(1)) if match else None
+    content_length = response.headers.get('Content-Length', '')
+    return int(content_length) if content_length.isdigit() else None
+
+def _last_modified_year(response):
+    try:
+        return parsedate_to_datetime(response.headers['Last-Modified']).year
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def guess_year(title, created, last_modified):
+    """
+    Guess the fiscal year a report covers, returning (year, source)
+
+    A year in the title wins. Otherwise reports are assumed to be published in the
+    year after the one they cover, so the creation date, then Last-Modified, minus one.
+    """
+    title_year = find_year(title)
+    if title_year:
+        return title_year, 'title'
+    if created:
+        return str(created[0] - 1), 'created'
+    if last_modified:
+        return str(last_modified - 1), 'last_modified'
+    return None, None
+
+def _default_get(url, headers):
+    get_scheduler().wait(url)
+    return get_session().get(url, headers={'User-Agent': USER_AGENT, **headers}, timeout=10, stream=True)
+
+def sniff_pdf(url, get=None, head_bytes=SNIFF_BYTES, tail_bytes=TAIL_BYTES):
+    """
+    Check that `url` is a PDF and read its metadata from a few KB, not the whole file
+
+    Fetches the first head_bytes with a Range request; if that holds no title or
+    date and the server supports ranges, the last tail_bytes as well. `get(url, headers)`
+    must return a streamed response (defaults to the shared session).
+
+    Returns (PdfInfo, response of the first request). is_pdf is None when the server
+    didn't send any of the file (202, 403, 405, ...), so callers can fall back to
+    their usual checks.
+    """
+    get = get or _default_get
+    response = get(url, {'Range': f'bytes=0-{head_bytes - 1}'})
+    last_modified = _last_modified_year(response)
+
+    if response.status_code not in (200, 206):
+        response.close()
+        is_pdf = False if response.status_code in (404, 410, 416) else None
+        return PdfInfo(response.status_code, is_pdf, None, None, last_modified, None, None, None), response
+
+    size = _total_size(response)
+    is_pdf, title, created = parse_pdf_metadata(_read_at_most(response, head_bytes))
+
+    # A 200 means the server ignores ranges: asking for the tail would send everything
+    if is_pdf and not (title and created) and tail_bytes and response.status_code == 206 \
+            and size and size > head_bytes:
+        tail_response = get(url, {'Range': f'bytes=-{tail_bytes}'})
+        if tail_response.status_code == 206:
+            tail = _read_at_most(tail_response, tail_bytes)
+            _, tail_title, tail_created = parse_pdf_metadata(_MAGIC + b'\n' + tail)
+            title = title or tail_title
+            created = created or tail_created
+        else:
+            tail_response.close()
+
+    year, year_source = guess_year(title, created, last_modified) if is_pdf else (None, None)
+    return PdfInfo(response.status_code, is_pdf, title, created, last_modified, size, year, year_source), response
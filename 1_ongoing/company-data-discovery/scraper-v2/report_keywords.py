@@ -0,0 +1,279 @@
+# report_keywords.py
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+from urllib.parse import unquote
+
+# Optional Aho-Corasick automaton, used when installed (pip install pyahocorasick)
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# The terms the scrapers have always matched, as plain substrings of the lowercased
+# URL and link text, with their flags (R = names a report, D = download link); as
+# before, only the words 'annual' and 'financial' count as annual and financial
+LEGACY_TERMS = {
+    'annual report': 'R', 'annual-report': 'R', 'financial report': 'R', 'financial-report': 'R',
+    'annual financial': 'R', 'jahresbericht': 'R', 'yearly report': 'R', 'yearly-report': 'R',
+    'annual results': 'R',
+    'annual': 'A', 'financial': 'F', 'download': 'D', 'herunterladen': 'D', 'télécharger': 'D',
+}
+# Every legacy term contains one of these
+_LEGACY_ANCHORS = ('annual', 'financial', 'yearly', 'jahresbericht', 'download', 'herunterladen', 'télécharger')
+
+# Report terms per language for the multilingual vocabulary, with their flags:
+#   R = names a report, A = annual, F = financial statements
+REPORT_TERMS = {
+    'en': {
+        'annual report': 'RA', 'annual financial report': 'RAF', 'annual financial': 'RAF',
+        'financial report': 'RF', 'financial statements': 'RF', 'annual results': 'RA',
+        'yearly report': 'RA', 'integrated report': 'RA', 'annual review': 'RA',
+        'universal registration document': 'RAF',
+    },
+    'de': {
+        'geschäftsbericht': 'RA', 'jahresbericht': 'RA', 'jahresfinanzbericht': 'RAF',
+        'finanzbericht': 'RF', 'konzernabschluss': 'RF', 'jahresabschluss': 'RAF',
+    },
+    'fr': {
+        'rapport annuel': 'RA', 'rapport financier annuel': 'RAF', 'rapport financier': 'RF',
+        "document d'enregistrement universel": 'RAF', 'document de référence': 'RAF',
+        'états financiers': 'RF',
+    },
+    'it': {
+        'relazione finanziaria annuale': 'RAF', 'relazione finanziaria': 'RF', 'relazione annuale': 'RA',
+        'rapporto annuale': 'RA', 'bilancio consolidato': 'RF', 'bilancio annuale': 'RAF',
+    },
+    'es': {
+        'informe anual': 'RA', 'informe financiero anual': 'RAF', 'informe financiero': 'RF',
+        'memoria anual': 'RA', 'cuentas anuales': 'RAF', 'estados financieros': 'RF',
+        'informe integrado': 'RA',
+    },
+    'pt': {
+        'relatório anual': 'RA', 'relatório e contas': 'RAF', 'relatório financeiro': 'RF',
+        'demonstrações financeiras': 'RF',
+    },
+    'nl': {
+        'jaarverslag': 'RA', 'jaarrapport': 'RA', 'jaarrekening': 'RAF', 'financieel verslag': 'RF',
+    },
+    'sv': {'årsredovisning': 'RAF', 'årsrapport': 'RA', 'årsberättelse': 'RA'},
+    'da': {'årsrapport': 'RA', 'årsregnskab': 'RAF'},
+    'no': {'årsrapport': 'RA', 'årsberetning': 'RA', 'årsregnskap': 'RAF'},
+    'fi': {'vuosikertomus': 'RA', 'tilinpäätös': 'RF'},
+    'pl': {'raport roczny': 'RA', 'sprawozdanie finansowe': 'RF', 'sprawozdanie roczne': 'RA'},
+    'cs': {'výroční zpráva': 'RA', 'účetní závěrka': 'RF'},
+}
+
+# Single words that only add to the score (D = download link)
+SCORE_TERMS = {
+    'annual': 'A', 'financial': 'F',
+    'download': 'D', 'downloaden': 'D', 'herunterladen': 'D', 'télécharger': 'D',
+    'scarica': 'D', 'descargar': 'D', 'baixar': 'D', 'ladda ner': 'D', 'pobierz': 'D',
+}
+
+# Between the words of a term: nothing, spaces, '-', '_', '.', '+' or apostrophes
+_SEPARATOR = object()
+_SEPARATOR_PATTERN = r"[\s_\-.+'’]*"
+_SEPARATORS = re.compile(r"[\s_\-.+'’]+")
+# The same separators as bytes, for deleting them from ASCII text in one C call
+_ASCII_SEPARATORS = b" \t\n\r\f\v_-.+'"
+_YEAR = re.compile(r'20\d{2}')
+
+# year is the first year in the texts, looked for only in texts that hold a term
+ReportMatch = namedtuple('ReportMatch', ['keywords', 'is_report', 'annual', 'financial', 'download', 'year'])
+
+# 'legacy' matches LEGACY_TERMS with substring loops; 'multilingual' matches REPORT_TERMS
+# in every language and spelling with the compiled matcher below
+VOCABULARIES = ('legacy', 'multilingual')
+_vocabulary = 'legacy'
+
+def _spellings(term):
+    """The term plus the ASCII spellings used in URLs (geschaeftsbericht, arsredovisning, ...)"""
+    transliterated = term
+    for letter, replacement in (('ä', 'ae'), ('ö', 'oe'), ('ü', 'ue'), ('å', 'aa'), ('ø', 'oe'), ('æ', 'ae')):
+        transliterated = transliterated.replace(letter, replacement)
+    stripped = ''.join(c for c in unicodedata.normalize('NFKD', term) if not unicodedata.combining(c))
+    stripped = stripped.replace('ø', 'o').replace('æ', 'ae')
+    return {term, transliterated, stripped}
+
+def _key(text):
+    return _SEPARATORS.sub('', text)
+
+def _tokens(term):
+    tokens = []
+    for part in _SEPARATORS.split(term):
+        if tokens:
+            tokens.append(_SEPARATOR)
+        tokens.extend(part)
+    return tokens
+
+def _trie_pattern(node, top=False):
+    """
+    Regex for a trie of tokens; optional tails are greedy, so the longest term wins
+
+    The top level is a plain alternation of literals, which lets the regex engine
+    skip ahead to positions starting with one of those letters.
+    """
+    branches = []
+    for token, child in node.items():
+        if token is None:
+            continue
+        token_pattern = _SEPARATOR_PATTERN if token is _SEPARATOR else re.escape(token)
+        branches.append(token_pattern + _trie_pattern(child))
+    if top or not branches:
+        return '|'.join(branches)
+    if len(branches) == 1 and None not in node:
+        return branches[0]
+    pattern = '(?:' + '|'.join(branches) + ')'
+    return pattern + '?' if None in node else pattern
+
+def _anchors(spellings, size=4):
+    """
+    A few substrings, one of which is in every spelling: text without any of them holds no term
+
+    Greedy set cover over the `size`-letter pieces of the spellings' words (pieces never
+    span a separator, so they are found whatever separates the words).
+    """
+    uncovered = {}
+    for spelling in spellings:
+        pieces = set()
+        for word in _SEPARATORS.split(spelling):
+            pieces.update(word[i:i + size] for i in range(len(word) - size + 1))
+        uncovered[spelling] = pieces or {spelling}
+    anchors = []
+    while uncovered:
+        counts = {}
+        for pieces in uncovered.values():
+            for piece in pieces:
+                counts[piece] = counts.get(piece, 0) + 1
+        best = max(sorted(counts), key=counts.get)
+        anchors.append(best)
+        uncovered = {spelling: pieces for spelling, pieces in uncovered.items() if best not in pieces}
+    return tuple(anchors)
+
+def _longest_words(spellings):
+    """The longest word of every spelling: rarer anchors, for the automaton, where their number costs nothing"""
+    return {max(_SEPARATORS.split(spelling), key=len) for spelling in spellings}
+
+def _build():
+    """Compile every spelling of every term into one trie-shaped regex, plus the flags per term"""
+    flags = {}
+    trie = {}
+    for terms in list(REPORT_TERMS.values()) + [SCORE_TERMS]:
+        for term, term_flags in terms.items():
+            for spelling in _spellings(term):
+                flags.setdefault(_key(spelling), set()).update(term_flags)
+                node = trie
+                for token in _tokens(spelling):
+                    node = node.setdefault(token, {})
+                node[None] = {}
+
+    # Years are one more literal-led branch, so a single pass finds both
+    return re.compile(r'20\d{2}|' + _trie_pattern(trie, top=True)), flags
+
+_PATTERN, _TERM_FLAGS = _build()
+_SPELLINGS = {spelling for terms in list(REPORT_TERMS.values()) + [SCORE_TERMS]
+              for term in terms for spelling in _spellings(term)}
+_ANCHORS = _anchors(_SPELLINGS)
+
+def _build_automaton(words):
+    automaton = ahocorasick.Automaton()
+    for word in words:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
+# The terms without separators, for text with its separators deleted, and the anchors
+_AUTOMATON = _build_automaton(_TERM_FLAGS) if ahocorasick is not None else None
+_ANCHOR_AUTOMATON = _build_automaton(_longest_words(_SPELLINGS)) if ahocorasick is not None else None
+
+def _automaton_keys(haystack):
+    # Deleting the separators lets the automaton match every way of writing the gaps,
+    # as the regex does; iter_long() picks the longest term at the leftmost position, too
+    if haystack.isascii():
+        squeezed = haystack.encode().translate(None, _ASCII_SEPARATORS).decode()
+    else:
+        squeezed = _SEPARATORS.sub('', haystack)
+    return frozenset(key for _, key in _AUTOMATON.iter_long(squeezed))
+
+def _regex_keys(haystack):
+    keys = set()
+    for found in _PATTERN.findall(haystack):
+        if not found[0].isdigit():
+            keys.add(found if found.isalpha() else _key(found))
+    return frozenset(keys)
+
+def _legacy_keys(haystack):
+    # A plain loop: any(map(...)) costs more than the few checks themselves
+    for anchor in _LEGACY_ANCHORS:
+        if anchor in haystack:
+            return frozenset(filter(haystack.__contains__, LEGACY_TERMS))
+    return _NO_FLAGS
+
+def _multilingual_keys(haystack):
+    # Every term contains one of the anchors: text without any holds none
+    if _AUTOMATON is not None:
+        found = next(_ANCHOR_AUTOMATON.iter(haystack), None) is not None
+        return _automaton_keys(haystack) if found else _NO_FLAGS
+    if any(map(haystack.__contains__, _ANCHORS)):
+        return _regex_keys(haystack)
+    return _NO_FLAGS
+
+_NO_FLAGS = frozenset()
+# The result for links without any term
+_NO_MATCH = ReportMatch(_NO_FLAGS, False, False, False, False, None)
+
+def find_year(*texts):
+    """The first year in the given texts, for text that needn't hold a report term"""
+    for text in texts:
+        year = _YEAR.search(text) if text else None
+        if year:
+            return year.group(0)
+    return None
+
+def set_vocabulary(name):
+    """Choose the terms match_report_keywords looks for (see VOCABULARIES)"""
+    global _vocabulary
+    if name not in VOCABULARIES:
+        raise ValueError(f"Unknown report vocabulary '{name}' (choose from {', '.join(VOCABULARIES)})")
+    if name != _vocabulary:
+        _vocabulary = name
+        match_report_keywords.cache_clear()
+
+def get_vocabulary():
+    return _vocabulary
+
+@lru_cache(maxsize=65536)
+def match_report_keywords(*texts):
+    """
+    Find report keywords and the first year in the given texts
+
+    Pass the href before the link text: the first year wins, as before. With the
+    legacy vocabulary, a few substring checks rule out most links before the terms
+    are looked up, as the old keyword loops did, only on one lowercased string. With
+    the multilingual one, hrefs are percent-decoded, so 'Gesch%C3%A4ftsbericht'
+    matches too, and terms are found in one pass of an Aho-Corasick automaton if
+    pyahocorasick is installed, else with the regex. Results are cached, as menus and
+    footers repeat on every page.
+    """
+    try:
+        haystack = '\n'.join(texts)
+    except TypeError:
+        haystack = '\n'.join(filter(None, texts))   # a missing link text
+    if _vocabulary == 'legacy':
+        haystack = haystack.lower()
+        keywords = _legacy_keys(haystack)
+        term_flags = LEGACY_TERMS
+    else:
+        if '%' in haystack:
+            haystack = unquote(haystack)
+        haystack = haystack.lower()
+        keywords = _multilingual_keys(haystack)
+        term_flags = _TERM_FLAGS
+    if not keywords:
+        return _NO_MATCH
+    year = _YEAR.search(haystack)
+    year = year.group(0) if year else None
+    flags = _NO_FLAGS.union(*(term_flags[key] for key in keywords))
+    return ReportMatch(keywords, 'R' in flags, 'A' in flags, 'F' in flags, 'D' in flags, year)
@@ -0,0 +1,308 @@
+# report_store.py
+"""
+Content-addressed store for downloaded reports
+
+Every file is kept once under <root>/objects/<2 hex digits>/<sha256>, whatever
+URL it came from. An SQLite index maps URLs to hashes and remembers each URL's
+ETag and Content-Length, so mirrors of a known report (same strong ETag and size
+on another host) are recognised before their body is downloaded. Results parsed
+from a file are stored per hash as well.
+
+    python report_store.py stats
+    python report_store.py gc [--unused-days 180] [--stale-temp-days 7] [--dry-run]
+    python report_store.py verify
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from response_cache import normalize_url
+
+DEFAULT_STORE_DIR = 'report_store'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def sha256_of_file(path):
+    """SHA-256 hex digest of a file, read in chunks"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def is_strong_etag(etag):
+    # Weak ETags only promise equivalent content, not identical bytes
+    return bool(etag) and not etag.startswith('W/')
+
+class ReportStore:
+    """Deduplicated report files, indexed by URL, ETag and Content-Length"""
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.temp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.stats = {'url_hits': 0, 'mirror_hits': 0, 'stored': 0, 'duplicates': 0}
+
+        self.conn = sqlite3.connect(os.path.join(root, 'index.sqlite'), timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                size INTEGER,
+                content_type TEXT,
+                stored_at REAL,
+                last_used REAL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                sha256 TEXT,
+                etag TEXT,
+                content_length INTEGER,
+                fetched_at REAL
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS urls_by_sha256 ON urls (sha256)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS urls_by_validators ON urls (etag, content_length)')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS annotations (
+                sha256 TEXT,
+                name TEXT,
+                value TEXT,
+                PRIMARY KEY (sha256, name)
+            )
+        """)
+        self.conn.commit()
+
+    def path_for(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def temp_path_for(self, url):
+        """Stable partial-download path for `url`, so an interrupted download can resume"""
+        return os.path.join(self.temp_dir, hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest() + '.part')
+
+    def _touch(self, sha256):
+        self.conn.execute('UPDATE blobs SET last_used = ? WHERE sha256 = ?', (time.time(), sha256))
+        self.conn.commit()
+
+    def lookup_url(self, url):
+        """Hash of the file stored for `url`, or None"""
+        with self.lock:
+            row = self.conn.execute('SELECT sha256 FROM urls WHERE key = ?', (normalize_url(url),)).fetchone()
+            if row is None or not os.path.exists(self.path_for(row[0])):
+                return None
+            self._touch(row[0])
+            self.stats['url_hits'] += 1
+            return row[0]
+
+    def lookup_validators(self, etag, content_length):
+        """Hash of a stored file another URL served with the same strong ETag and size, or None"""
+        if not is_strong_etag(etag) or not content_length:
+            return None
+        with self.lock:
+            for (sha256,) in self.conn.execute('SELECT sha256 FROM urls WHERE etag = ? AND content_length = ?',
+                                               (etag, content_length)).fetchall():
+                if os.path.exists(self.path_for(sha256)):
+                    self._touch(sha256)
+                    self.stats['mirror_hits'] += 1
+                    return sha256
+        return None
+
+    def index_url(self, url, sha256, etag=None, content_length=None):
+        """Point `url` at a stored file"""
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?, ?)',
+                              (normalize_url(url), url, sha256, etag, content_length, time.time()))
+            self.conn.commit()
+
+    def add(self, temp_path, sha256, url, etag=None, content_length=None, content_type=None):
+        """
+        Move a finished download into the store and index its URL
+
+        If the same bytes are already stored (reached through another URL), the
+        new copy is dropped. Returns the path of the stored file.
+        """
+        path = self.path_for(sha256)
+        with self.lock:
+            if os.path.exists(path):
+                os.remove(temp_path)
+                self.stats['duplicates'] += 1
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+                self.stats['stored'] += 1
+            now = time.time()
+            self.conn.execute(
+                'INSERT INTO blobs VALUES (?, ?, ?, ?, ?) ON CONFLICT(sha256) DO UPDATE SET last_used = excluded.last_used',
+                (sha256, os.path.getsize(path), content_type, now, now)
+            )
+            self.conn.execute('INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?, ?)',
+                              (normalize_url(url), url, sha256, etag, content_length, now))
+            self.conn.commit()
+        return path
+
+    def materialize(self, sha256, destination):
+        """Make a stored file appear at `destination` (hard link, or a copy across file systems)"""
+        source = self.path_for(sha256)
+        if os.path.abspath(source) == os.path.abspath(destination):
+            return destination
+        os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+        if os.path.exists(destination):
+            os.remove(destination)
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination)
+        return destination
+
+    def get_annotation(self, sha256, name):
+        """Result of an earlier parse of a stored file (e.g. 'fiscal_year'), or None"""
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM annotations WHERE sha256 = ? AND name = ?',
+                                    (sha256, name)).fetchone()
+        return row[0] if row else None
+
+    def put_annotation(self, sha256, name, value):
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO annotations VALUES (?, ?, ?)', (sha256, name, value))
+            self.conn.commit()
+
+    def gc(self, unused_days=None, stale_temp_days=7, dry_run=False):
+        """
+        Remove what is no longer needed and compact the index
+
+        Drops index entries whose file is gone, files no URL points to, files nobody
+        used for unused_days (if given) and partial downloads older than
+        stale_temp_days. Returns the counts per kind and the bytes freed.
+        """
+        removed = {'dangling_urls': 0, 'unreferenced_files': 0, 'unused_files': 0,
+                   'stray_files': 0, 'stale_temp_files': 0, 'bytes_freed': 0}
+
+        def remove_file(path, kind):
+            removed[kind] += 1
+            removed['bytes_freed'] += os.path.getsize(path)
+            if not dry_run:
+                os.remove(path)
+
+        with self.lock:
+            known = {sha256 for (sha256,) in self.conn.execute('SELECT sha256 FROM blobs')}
+            present = {sha256 for sha256 in known if os.path.exists(self.path_for(sha256))}
+
+            # Index entries pointing at files that are gone
+            for key, sha256 in self.conn.execute('SELECT key, sha256 FROM urls').fetchall():
+                if sha256 not in present:
+                    removed['dangling_urls'] += 1
+                    if not dry_run:
+                        self.conn.execute('DELETE FROM urls WHERE key = ?', (key,))
+
+            referenced = {sha256 for (sha256,) in self.conn.execute('SELECT DISTINCT sha256 FROM urls')}
+            cutoff = time.time() - unused_days * 24 * 60 * 60 if unused_days is not None else None
+            for sha256, last_used in self.conn.execute('SELECT sha256, last_used FROM blobs').fetchall():
+                if sha256 not in present:
+                    kind = None   # the file is gone already, only the rows go
+                elif sha256 not in referenced:
+                    kind = 'unreferenced_files'
+                elif cutoff is not None and last_used < cutoff:
+                    kind = 'unused_files'
+                else:
+                    continue
+                if kind:
+                    remove_file(self.path_for(sha256), kind)
+                if not dry_run:
+                    self.conn.execute('DELETE FROM blobs WHERE sha256 = ?', (sha256,))
+                    self.conn.execute('DELETE FROM urls WHERE sha256 = ?', (sha256,))
+                    self.conn.execute('DELETE FROM annotations WHERE sha256 = ?', (sha256,))
+
+            # Files without an index entry, e.g. from a crash between move and commit
+            for folder, _, files in os.walk(self.objects_dir):
+                for name in files:
+                    if name not in known:
+                        remove_file(os.path.join(folder, name), 'stray_files')
+
+            temp_cutoff = time.time() - stale_temp_days * 24 * 60 * 60
+            for name in os.listdir(self.temp_dir):
+                path = os.path.join(self.temp_dir, name)
+                if os.path.getmtime(path) < temp_cutoff:
+                    remove_file(path, 'stale_temp_files')
+
+            if not dry_run:
+                self.conn.execute('DELETE FROM annotations WHERE sha256 NOT IN (SELECT sha256 FROM blobs)')
+                self.conn.commit()
+                self.conn.execute('VACUUM')
+        return removed
+
+    def verify(self):
+        """Re-hash every stored file; corrupt ones are removed from the store. Returns their hashes."""
+        corrupt = []
+        with self.lock:
+            blobs = [sha256 for (sha256,) in self.conn.execute('SELECT sha256 FROM blobs')]
+        for sha256 in blobs:
+            path = self.path_for(sha256)
+            if os.path.exists(path) and sha256_of_file(path) != sha256:
+                corrupt.append(sha256)
+                os.remove(path)
+        with self.lock:
+            for sha256 in corrupt:
+                self.conn.execute('DELETE FROM blobs WHERE sha256 = ?', (sha256,))
+                self.conn.execute('DELETE FROM urls WHERE sha256 = ?', (sha256,))
+                self.conn.execute('DELETE FROM annotations WHERE sha256 = ?', (sha256,))
+            self.conn.commit()
+        return corrupt
+
+    def summary(self):
+        """Files, their total size and the number of URLs pointing at them"""
+        with self.lock:
+            files, size = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+            urls = self.conn.execute('SELECT COUNT(*) FROM urls').fetchone()[0]
+        return {'files': files, 'bytes': size, 'urls': urls}
+
+    def print_stats(self):
+        """Print how many downloads the store saved in this run"""
+        if not any(self.stats.values()):
+            return
+        print(f"Report store: {self.stats['url_hits']} known URLs and {self.stats['mirror_hits']} mirrors served "
+              f"without downloading; {self.stats['stored']} new files, {self.stats['duplicates']} duplicate downloads dropped")
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_report_store():
+    """Return the report store shared by all downloaders"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ReportStore()
+        return _store
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the content-addressed report store')
+    parser.add_argument('command', choices=['stats', 'gc', 'verify'])
+    parser.add_argument('--root', default=DEFAULT_STORE_DIR, help='Store folder')
+    parser.add_argument('--unused-days', type=int, help='gc: also remove files not used for this many days')
+    parser.add_argument('--stale-temp-days', type=int, default=7, help='gc: remove partial downloads older than this')
+    parser.add_argument('--dry-run', action='store_true', help='gc: only report what would be removed')
+    args = parser.parse_args()
+
+    store = ReportStore(args.root)
+    if args.command == 'gc':
+        removed = store.gc(args.unused_days, args.stale_temp_days, args.dry_run)
+        prefix = "Would remove" if args.dry_run else "Removed"
+        print(f"{prefix}: " + ', '.join(f"{count} {kind.replace('_', ' ')}" for kind, count in removed.items()
+                                        if kind != 'bytes_freed'))
+        print(f"{removed['bytes_freed'] / (1024 * 1024):.1f} MB {'would be ' if args.dry_run else ''}freed")
+    elif args.command == 'verify':
+        corrupt = store.verify()
+        print(f"{len(corrupt)} corrupt files removed" if corrupt else "All files match their hashes")
+
+    summary = store.summary()
+    print(f"{summary['files']} files, {summary['bytes'] / (1024 * 1024):.1f} MB, {summary['urls']} URLs")
+
+if __name__ == "__main__":
+    main()
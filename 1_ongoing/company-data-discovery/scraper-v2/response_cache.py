@@ -0,0 +1,216 @@
+# response_cache.py
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_CACHE_FILE = 'http_cache.sqlite'
+DEFAULT_TTL = 7 * 24 * 60 * 60          # IR pages rarely change within a week
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024   # evict least recently used entries above 500 MB
+
+def normalize_url(url):
+    """Normalize a URL so trivially different spellings share one cache entry"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+
+    # Drop default ports
+    port = parts.port
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f"{host}:{port}"
+
+    path = parts.path or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+
+    # The fragment never reaches the server
+    return urlunsplit((scheme, host, path, query, ''))
+
+class ResponseCache:
+    """On-disk HTTP response cache with TTLs, conditional revalidation and LRU eviction"""
+    def __init__(self, path=DEFAULT_CACHE_FILE, max_bytes=DEFAULT_MAX_BYTES, default_ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                headers TEXT,
+                encoding TEXT,
+                body BLOB,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL,
+                last_access REAL,
+                size INTEGER
+            )
+        """)
+        self.conn.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        self.conn.commit()
+
+    def _load(self, key):
+        with self.lock:
+            return self.conn.execute(
+                'SELECT url, status, headers, encoding, body, etag, last_modified, fetched_at '
+                'FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+
+    def _touch(self, key, refreshed=False):
+        now = time.time()
+        with self.lock:
+            if refreshed:
+                self.conn.execute('UPDATE responses SET last_access = ?, fetched_at = ? WHERE key = ?', (now, now, key))
+            else:
+                self.conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+            self.conn.commit()
+
+    def _store(self, key, response):
+        # Respect servers that explicitly forbid caching
+        if 'no-store' in response.headers.get('Cache-Control', '').lower():
+            return
+
+        body = response.content
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, response.url, response.status_code, json.dumps(dict(response.headers)),
+                 response.encoding, body, response.headers.get('ETag'),
+                 response.headers.get('Last-Modified'), now, now, len(body))
+            )
+            self.conn.commit()
+            self.stats['stored'] += 1
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits the byte budget"""
+        with self.lock:
+            total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            doomed = []
+            for key, size in self.conn.execute('SELECT key, size FROM responses ORDER BY last_access'):
+                if total <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                total -= size
+
+            self.conn.executemany('DELETE FROM responses WHERE key = ?', doomed)
+            self.conn.commit()
+            self.stats['evicted'] += len(doomed)
+
+    @staticmethod
+    def _to_response(row):
+        url, status, headers, encoding, body, _, _, _ = row
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = encoding
+        response.url = url
+        response._content = body
+        response.from_cache = True
+        return response
+
+    def fetch(self, url, fetch_func, ttl=None, stream=False):
+        """
+        Return the response for `url`, calling fetch_func(extra_headers) only when needed
+
+        Fresh entries are served from disk. Stale entries with an ETag or Last-Modified
+        are revalidated with a conditional request. Only 200 responses are stored.
+        With stream=True a fetched body is left unread; call store() once it was read.
+        """
+        if not self.enabled:
+            return fetch_func({})
+
+        key = normalize_url(url)
+        ttl = self.default_ttl if ttl is None else ttl
+        row = self._load(key)
+
+        extra_headers = {}
+        if row is not None:
+            etag, last_modified, fetched_at = row[5], row[6], row[7]
+            if time.time() - fetched_at < ttl:
+                self._touch(key)
+                self.stats['hits'] += 1
+                return self._to_response(row)
+
+            if etag:
+                extra_headers['If-None-Match'] = etag
+            if last_modified:
+                extra_headers['If-Modified-Since'] = last_modified
+
+        response = fetch_func(extra_headers)
+
+        if row is not None and response.status_code == 304:
+            response.close()
+            self._touch(key, refreshed=True)
+            self.stats['revalidated'] += 1
+            return self._to_response(row)
+
+        self.stats['misses'] += 1
+        if response.status_code == 200 and not stream:
+            self._store(key, response)
+        response.from_cache = False
+        return response
+
+    def redirect_target(self, url):
+        """Final URL of a cached response for `url` if the server redirected it, else None"""
+        if not self.enabled:
+            return None
+        with self.lock:
+            row = self.conn.execute('SELECT url FROM responses WHERE key = ?', (normalize_url(url),)).fetchone()
+        if row is None or not row[0] or normalize_url(row[0]) == normalize_url(url):
+            return None
+        return row[0]
+
+    def store(self, url, response):
+        """Store a streamed response after its whole body was read"""
+        if not self.enabled or getattr(response, 'from_cache', False) or not getattr(response, 'complete', True):
+            return
+        if response.status_code == 200:
+            self._store(normalize_url(url), response)
+
+    def clear(self):
+        """Remove all cached responses"""
+        with self.lock:
+            self.conn.execute('DELETE FROM responses')
+            self.conn.commit()
+
+    def size(self):
+        """Return (entries, bytes) currently in the cache"""
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+
+    def print_stats(self):
+        """Print hit/miss statistics for this run"""
+        lookups = self.stats['hits'] + self.stats['revalidated'] + self.stats['misses']
+        if not lookups:
+            return
+        served = self.stats['hits'] + self.stats['revalidated']
+        entries, size = self.size()
+        print(f"Response cache: {served}/{lookups} served locally "
+              f"({self.stats['hits']} fresh, {self.stats['revalidated']} revalidated), "
+              f"{self.stats['misses']} fetched, {self.stats['evicted']} evicted")
+        print(f"  {entries} entries, {size / (1024 * 1024):.1f} MB on disk")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Return the response cache shared by all fetchers"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
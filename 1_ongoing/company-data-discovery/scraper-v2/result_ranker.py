@@ -1,33 +1,225 @@
 # result_ranker.py
+import re
 from datetime import datetime
+import numpy as np
+from report_keywords import match_report_keywords
 
-def rank_results(results):
-    """Rank results based on year and link type"""
-    current_year = datetime.now().year
-    
+# The CSV takes the best result as FIN_REP and the next five as OTHER
+RESULTS_USED = 6
+
+# Points per feature; set "ranking_weights" in config.json to change any of them.
+# keyword_hits and domain_match are off by default, which ranks as before they existed;
+# features weighted 0 aren't extracted at all
+DEFAULT_WEIGHTS = {
+    'is_pdf': 5,
+    # Report year is the current year, 1 or 2 years back, 3-5 back (or ahead), older
+    'year': [10, 8, 6, 4, 2],
+    'keyword_hits': 0,      # per report keyword in URL or link text, e.g. 1
+    'domain_match': 0,      # the company's name is part of the host, e.g. 2
+}
+
+# Fewer results than this are ranked in plain Python: for one company's few dozen
+# links, building the arrays costs more than the vectorized scoring saves
+VECTORIZE_MIN = 500
+
+# Words in company names that say nothing about the domain
+_NAME_NOISE = {'the', 'and', 'group', 'holding', 'holdings', 'company', 'international', 'ag', 'se',
+               'sa', 'nv', 'plc', 'spa', 'gmbh', 'ltd', 'limited', 'inc', 'corp', 'corporation', 'asa', 'oyj', 'ab'}
+
+def _name_tokens(company_name):
+    tokens = re.findall(r'[a-z0-9]+', (company_name or '').lower())
+    return [token for token in tokens if len(token) >= 3 and token not in _NAME_NOISE]
+
+def _host(url):
+    # 'https://host/path'.split('/', 3) is ['https:', '', 'host', 'path']; much cheaper than urlsplit
+    parts = url.split('/', 3)
+    if len(parts) < 3 or not parts[0].endswith(':'):
+        return ''
+    return parts[2].split('?', 1)[0].split('#', 1)[0].lower()
+
+def _on_host(url, name_tokens):
+    host = _host(url)
+    for token in name_tokens:
+        if token in host:
+            return True
+    return False
+
+def is_company_host(url, company_name):
+    """Whether the host of `url` contains the company's name, as the domain_match feature counts it"""
+    return _on_host(url, _name_tokens(company_name))
+
+def _matched_keywords(url, text):
+    # Cached by match_report_keywords, which also drops its cache when the vocabulary changes
+    return len(match_report_keywords(url, text).keywords)
+
+def _keyword_hits(result):
+    hits = result.get('keyword_hits')
+    if hits is None:
+        # Search hits and results of older runs weren't matched when they were found
+        hits = _matched_keywords(result.get('url', ''), result.get('text') or '')
+    return hits
+
+def _year(result):
+    year_str = result.get('year')
+    return int(year_str) if year_str and year_str.isdigit() else 0
+
+def extract_features(results, company_name=None, weights=None):
+    """
+    Return the feature arrays (is_pdf, year, keyword_hits, domain_match) of `results`
+
+    year is 0 where unknown, and features weighted 0 in `weights` are all 0. Reading
+    the dicts is the only per-result Python work; scoring happens on the arrays.
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    name_tokens = _name_tokens(company_name) if weights['domain_match'] else None
+    if name_tokens:
+        domain_match = np.array([_on_host(result.get('url', ''), name_tokens) for result in results], dtype=bool)
+    else:
+        domain_match = np.zeros(len(results), dtype=bool)
+    if weights['keyword_hits']:
+        keyword_hits = np.array([_keyword_hits(result) for result in results], dtype=np.int32)
+    else:
+        keyword_hits = np.zeros(len(results), dtype=np.int32)
+
+    return {
+        'is_pdf': np.array([bool(result.get('is_pdf', False)) for result in results], dtype=bool),
+        'year': np.array([_year(result) for result in results], dtype=np.int32),
+        'keyword_hits': keyword_hits,
+        'domain_match': domain_match,
+    }
+
+def score_features(features, weights=None, current_year=None):
+    """Score feature arrays from extract_features in one vectorized pass"""
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    current_year = current_year or datetime.now().year
+    year = features['year']
+    age = current_year - year
+    current, one_back, two_back, recent, older = weights['year']
+
+    year_score = np.select([age == 0, age == 1, age == 2, age <= 5], [current, one_back, two_back, recent], older)
+    scores = np.where(year > 0, year_score, 0).astype(np.float64)
+    scores += weights['is_pdf'] * features['is_pdf']
+    scores += weights['keyword_hits'] * features['keyword_hits']
+    scores += weights['domain_match'] * features['domain_match']
+    return scores
+
+def top_k_indices(scores, k=None):
+    """
+    Indices of the k best scores, best first, ties in their original order
+
+    Uses a partition to find the k-th best score, so only the results that make
+    the cut are sorted. Without k everything is sorted.
+    """
+    count = len(scores)
+    if k is None or k >= count:
+        return np.lexsort((np.arange(count), -scores))
+    if k <= 0:
+        return np.arange(0)
+
+    threshold = np.partition(scores, count - k)[count - k]
+    above = np.flatnonzero(scores > threshold)
+    # Ties at the cut go to the earliest results, as with a stable sort
+    at_threshold = np.flatnonzero(scores == threshold)[:k - len(above)]
+    chosen = np.concatenate([above, at_threshold])
+    return chosen[np.lexsort((chosen, -scores[chosen]))]
+
+def _plain(score):
+    return int(score) if score.is_integer() else score
+
+def _scalar_scores(results, weights, company_name, current_year):
+    """score_features(extract_features(...)) for a few results, without building arrays"""
+    current, one_back, two_back, recent, older = weights['year']
+    # Points by year as written in the results, filled in as other years turn up
+    year_points = {None: 0, '': 0, str(current_year): current,
+                   str(current_year - 1): one_back, str(current_year - 2): two_back}
+    pdf_points = weights['is_pdf']
+    keyword_weight = weights['keyword_hits']
+    domain_points = weights['domain_match']
+    name_tokens = _name_tokens(company_name) if domain_points else None
+
+    scores = []
     for result in results:
-        score = 0
-        
-        # Prefer PDFs
-        if result.get('is_pdf', False):
-            score += 5
-        
-        # Score based on year
         year_str = result.get('year')
-        if year_str and year_str.isdigit():
-            year = int(year_str)
-            if year == current_year:
-                score += 10
-            elif year == current_year - 1:
-                score += 8
-            elif year == current_year - 2:
-                score += 6
-            elif year >= current_year - 5:
-                score += 4
-            else:
-                score += 2
-        
-        result['score'] = score
-    
-    # Sort by score (descending)
-    return sorted(results, key=lambda x: x.get('score', 0), reverse=True)
\ No newline at end of file
+        score = year_points.get(year_str)
+        if score is None:
+            year = int(year_str) if year_str.isdigit() else 0
+            score = year_points[year_str] = (recent if current_year - year <= 5 else older) if year else 0
+        if result.get('is_pdf', False):
+            score += pdf_points
+        if keyword_weight:
+            score += keyword_weight * _keyword_hits(result)
+        if name_tokens and _on_host(result.get('url', ''), name_tokens):
+            score += domain_points
+        scores.append(score)
+    return scores
+
+def rank_results(results, top_k=None, weights=None, company_name=None):
+    """
+    Rank results based on year, link type, report keywords and domain
+
+    Returns the top_k best (all without top_k), each with its 'score'.
+    """
+    if not results:
+        return []
+    if len(results) < VECTORIZE_MIN:
+        scores = _scalar_scores(results, {**DEFAULT_WEIGHTS, **(weights or {})}, company_name, datetime.now().year)
+        # sorted() is stable, so ties keep their original order as in top_k_indices
+        order = sorted(range(len(results)), key=scores.__getitem__, reverse=True)
+        ranked = []
+        for index in order[:top_k] if top_k is not None else order:
+            results[index]['score'] = scores[index]
+            ranked.append(results[index])
+        return ranked
+
+    scores = score_features(extract_features(results, company_name, weights), weights)
+    ranked = []
+    for index in top_k_indices(scores, top_k).tolist():
+        result = results[index]
+        result['score'] = _plain(float(scores[index]))
+        ranked.append(result)
+    return ranked
+
+def top_k_per_group(scores, group_sizes, k):
+    """
+    For consecutive groups of scores, the indices of each group's k best, best first
+
+    One lexsort over all scores instead of a selection per group. Returns a list of
+    index arrays (into `scores`), one per group.
+    """
+    group_sizes = np.asarray(group_sizes)
+    starts = np.concatenate([[0], np.cumsum(group_sizes)[:-1]])
+    groups = np.repeat(np.arange(len(group_sizes)), group_sizes)
+    order = np.lexsort((np.arange(len(scores)), -scores, groups))
+    # order keeps the groups in place, so rank within a group is position - group start
+    rank = np.arange(len(scores)) - np.repeat(starts, group_sizes)
+    chosen = order[rank < k]
+    return np.split(chosen, np.cumsum(np.minimum(group_sizes, k))[:-1])
+
+def rank_many(results_by_company, top_k=RESULTS_USED, weights=None):
+    """
+    Re-rank a whole run at once: {company: results} to {company: top_k results}
+
+    Features of all companies are scored in one batch and the top_k of every company
+    picked in one pass, for re-ranking old runs with millions of results.
+    """
+    ranked = {company: [] for company in results_by_company}
+    companies = [company for company, results in results_by_company.items() if results]
+    if not companies:
+        return ranked
+
+    # Features of all companies in one extraction; only domain_match depends on the company
+    flat = [result for company in companies for result in results_by_company[company]]
+    sizes = [len(results_by_company[company]) for company in companies]
+    features = extract_features(flat, None, weights)
+    if {**DEFAULT_WEIGHTS, **(weights or {})}['domain_match']:
+        domain_match = []
+        for company in companies:
+            name_tokens = _name_tokens(company)
+            domain_match.extend(_on_host(result.get('url', ''), name_tokens) for result in results_by_company[company])
+        features['domain_match'] = np.array(domain_match, dtype=bool)
+    scores = score_features(features, weights)
+    for company, indices in zip(companies, top_k_per_group(scores, sizes, top_k)):
+        for index in indices.tolist():
+            flat[index]['score'] = _plain(float(scores[index]))
+            ranked[company].append(flat[index])
+    return ranked
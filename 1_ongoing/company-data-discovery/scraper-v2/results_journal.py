@@ -0,0 +1,113 @@
+# results_journal.py
+import json
+import os
+import threading
+
+def journal_path_for(output_file):
+    """Journal file that goes with a JSON output file"""
+    return os.path.splitext(output_file)[0] + '.jsonl'
+
+def _journal_offsets(journal_file):
+    """
+    Byte offset of each company's line in a journal, {company: offset}
+
+    A company written twice (e.g. listed twice in the input) keeps its last line and
+    takes that line's place in the order. Lines that are not a company's results are
+    skipped with a warning.
+    """
+    offsets = {}
+    with open(journal_file, 'rb') as f:
+        offset = f.tell()
+        for line_number, line in enumerate(iter(f.readline, b''), 1):
+            if line.strip():
+                try:
+                    entry = json.loads(line)
+                    company = entry['company']
+                    entry['results']
+                except (ValueError, KeyError, TypeError):
+                    # A crash can leave a half-written last line behind
+                    print(f"Warning: skipping unreadable line {line_number} in {journal_file}")
+                else:
+                    offsets.pop(company, None)
+                    offsets[company] = offset
+            offset = f.tell()
+    return offsets
+
+def iter_journal(journal_file):
+    """Yield (company, results) pairs from a journal, one line at a time, the last per company"""
+    offsets = _journal_offsets(journal_file)
+    with open(journal_file, 'rb') as f:
+        for company, offset in offsets.items():
+            f.seek(offset)
+            try:
+                results = json.loads(f.readline())['results']
+            except (ValueError, KeyError, TypeError):
+                print(f"Warning: skipping unreadable entry for {company} in {journal_file}")
+                continue
+            yield company, results
+
+class ResultsJournal:
+    """Append-only JSONL file with one line per finished company"""
+    def __init__(self, journal_file, resume=False):
+        self.journal_file = journal_file
+        self.lock = threading.Lock()
+        self.done = set()
+
+        if resume and os.path.exists(journal_file):
+            self.done = set(_journal_offsets(journal_file))
+            mode = 'a'
+        else:
+            mode = 'w'
+
+        self.file = open(journal_file, mode, encoding='utf-8')
+
+        # Start on a fresh line if a crash cut the last one short
+        if mode == 'a' and self.file.tell() > 0:
+            with open(journal_file, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self.file.write('\n')
+
+    def append(self, company, results):
+        """Write a company's results and make sure they reach the disk"""
+        line = json.dumps({'company': company, 'results': results})
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.done.add(company)
+
+    def close(self):
+        self.file.close()
+
+def journal_to_json(journal_file, output_file, order=None):
+    """
+    Write a journal as the usual {company: results} JSON file
+
+    Only byte offsets are kept in memory, so this works for journals of any size.
+    Companies are written in `order` if given, otherwise in journal order.
+    """
+    offsets = _journal_offsets(journal_file)
+
+    if order is not None:
+        companies = [company for company in order if company in offsets]
+    else:
+        companies = list(offsets)
+
+    with open(journal_file, 'rb') as journal, open(output_file, 'w') as out:
+        if not companies:
+            out.write('{}')
+            return 0
+
+        out.write('{\n')
+        for i, company in enumerate(companies):
+            journal.seek(offsets[company])
+            results = json.loads(journal.readline())['results']
+
+            # Same layout as json.dump(all_results, f, indent=2)
+            value = json.dumps(results, indent=2).replace('\n', '\n  ')
+            separator = ',\n' if i < len(companies) - 1 else '\n'
+            out.write(f"  {json.dumps(company)}: {value}{separator}")
+        out.write('}')
+
+    return len(companies)
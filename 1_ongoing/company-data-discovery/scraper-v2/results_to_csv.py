@@ -3,9 +3,22 @@ import json
 import csv
 import argparse
 import os
+from results_journal import iter_journal
+from url_canonical import canonicalize_url, dedup_key
+from result_ranker import RESULTS_USED
+
+def load_results(json_file):
+    """Yield (company, results) pairs from a JSON results file or a .jsonl journal"""
+    if json_file.endswith('.jsonl'):
+        yield from iter_journal(json_file)
+        return
+    
+    with open(json_file, 'r') as f:
+        data = json.load(f)
+    yield from data.items()
 
 def convert_to_csv(json_file, csv_file=None):
-    """Convert JSON results to CSV format"""
+    """Convert JSON (or JSONL journal) results to CSV format"""
     if not os.path.exists(json_file):
         print(f"Error: JSON file {json_file} not found.")
         return False
@@ -15,14 +28,20 @@ def convert_to_csv(json_file, csv_file=None):
         csv_file = os.path.splitext(json_file)[0] + '.csv'
     
     try:
-        # Load JSON data
-        with open(json_file, 'r') as f:
-            data = json.load(f)
-        
         # Prepare CSV data
         csv_rows = []
         
-        for company, results in data.items():
+        for company, results in load_results(json_file):
+            # Results from before deduplication can list one document several times
+            seen = set()
+            unique_results = []
+            for result in results:
+                key = dedup_key(canonicalize_url(result['url'], resolve_redirects=False))
+                if key not in seen:
+                    seen.add(key)
+                    unique_results.append(result)
+            results = unique_results
+            
             # Add first result as FIN_REP
             if results:
                 first_result = results[0]
@@ -34,7 +53,8 @@ def convert_to_csv(json_file, csv_file=None):
                 })
                 
                 # Add remaining results as OTHER
-                for i, result in enumerate(results[1:6], 1):  # Limit to 5 additional links
+                # Runs keep every candidate, best first; the CSV takes the best RESULTS_USED
+                for i, result in enumerate(results[1:RESULTS_USED], 1):
                     csv_rows.append({
                         'NAME': company,
                         'TYPE': 'OTHER',
@@ -65,7 +85,7 @@ def convert_to_csv(json_file, csv_file=None):
 
 def main():
     parser = argparse.ArgumentParser(description='Convert JSON results to CSV format')
-    parser.add_argument('--json_file', help='Input JSON results file')
+    parser.add_argument('--json_file', help='Input JSON results file or .jsonl journal')
     parser.add_argument('--output', help='Output CSV file')
     
     args = parser.parse_args()
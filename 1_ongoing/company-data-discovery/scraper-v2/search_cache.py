@@ -0,0 +1,88 @@
+# search_cache.py
+import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_SEARCH_CACHE_FILE = 'search_cache.sqlite'
+
+class SearchCache:
+    """Persistent cache of Google Custom Search results, so reruns don't spend quota"""
+    def __init__(self, path=DEFAULT_SEARCH_CACHE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS searches (
+                key TEXT PRIMARY KEY,
+                query TEXT,
+                params TEXT,
+                results TEXT,
+                fetched_at REAL
+            )
+        """)
+        # Number of API requests avoided per day
+        self.conn.execute('CREATE TABLE IF NOT EXISTS saved (date TEXT PRIMARY KEY, count INTEGER)')
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(query, params):
+        """Key a search by its query and parameters (never the API key)"""
+        payload = json.dumps({'q': query, **params}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, query, params, max_age_days):
+        """Return cached results if they are younger than max_age_days, else None"""
+        key = self.make_key(query, params)
+        with self.lock:
+            row = self.conn.execute('SELECT results, fetched_at FROM searches WHERE key = ?', (key,)).fetchone()
+        if row is None or time.time() - row[1] > max_age_days * 24 * 60 * 60:
+            return None
+        return json.loads(row[0])
+
+    def put(self, query, params, results):
+        """Store the results of a search"""
+        key = self.make_key(query, params)
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?, ?)',
+                (key, query, json.dumps(params, sort_keys=True), json.dumps(results), time.time())
+            )
+            self.conn.commit()
+
+    def record_saved_request(self):
+        """Count a cache hit as one API request saved today"""
+        today = datetime.datetime.now().strftime('%Y-%m-%d')
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO saved VALUES (?, 1) ON CONFLICT(date) DO UPDATE SET count = count + 1',
+                (today,)
+            )
+            self.conn.commit()
+
+    def saved_requests(self):
+        """Return (saved today, saved in total)"""
+        today = datetime.datetime.now().strftime('%Y-%m-%d')
+        with self.lock:
+            today_row = self.conn.execute('SELECT count FROM saved WHERE date = ?', (today,)).fetchone()
+            total = self.conn.execute('SELECT COALESCE(SUM(count), 0) FROM saved').fetchone()[0]
+        return (today_row[0] if today_row else 0), total
+
+    def cached_queries(self):
+        """Return the number of cached searches"""
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM searches').fetchone()[0]
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_search_cache():
+    """Return the search cache shared by all modules"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchCache()
+        return _cache
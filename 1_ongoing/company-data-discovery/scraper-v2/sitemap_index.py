@@ -0,0 +1,286 @@
+# sitemap_index.py
+"""
+Find report PDFs through a site's sitemaps instead of crawling its pages
+
+The sitemaps of a host (from robots.txt, else /sitemap.xml and /sitemap_index.xml)
+are stream-parsed once, following nested sitemap indexes and gzip files, and the
+PDF URLs in them are kept with their lastmod date in sitemap_index.sqlite. Finding
+the recent annual reports of a host is then a local lookup:
+
+    python sitemap_index.py https://www.example.com --years 2
+"""
+import argparse
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+from urllib.parse import urljoin, urlsplit
+from xml.etree.ElementTree import iterparse, ParseError
+from http_session import get_session
+from host_scheduler import get_scheduler
+from report_keywords import match_report_keywords
+
+DEFAULT_SITEMAP_FILE = 'sitemap_index.sqlite'
+
+# Defaults for SitemapIndex; pass other values to its constructor
+SITEMAP_DEFAULTS = {
+    'ttl': 7 * 24 * 60 * 60,              # re-read a host's sitemaps after a week
+    'max_sitemaps': 5,                    # sitemap files read per host (indexes included)
+    'max_sitemap_bytes': 5 * 1024 * 1024,   # per file, uncompressed; the protocol allows 50 MB
+    'timeout': 20,
+}
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+DEFAULT_SITEMAP_PATHS = ['/sitemap.xml', '/sitemap_index.xml']
+
+# More recent reports than this in one site's sitemaps means a site hosting many companies' reports
+MAX_SITEMAP_REPORTS = 20
+
+# Child sitemaps likely to list documents are read first, in case max_sitemaps cuts the rest
+_PROMISING_SITEMAP = re.compile(r'invest|document|report|pdf|file|media|download|asset|financ', re.I)
+_ROBOTS_SITEMAP = re.compile(r'^\s*sitemap\s*:\s*(\S+)', re.I | re.M)
+
+def is_pdf_url(url):
+    lowered = url.lower().split('?', 1)[0]
+    return lowered.endswith('.pdf') or '/pdf/' in lowered
+
+def origin_of(url):
+    """scheme://host of a URL, the unit sitemaps are published for"""
+    parts = urlsplit(url)
+    return f"{parts.scheme.lower() or 'https'}://{parts.netloc.lower()}"
+
+class _LimitedReader:
+    """File-like view of a streamed body that stops at max_bytes and inflates gzip"""
+    def __init__(self, response, max_bytes):
+        self.chunks = response.iter_content(64 * 1024)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.inflater = None
+        self.pending = b''
+        self.first = True
+
+    def read(self, size=-1):
+        while not self.pending:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return b''
+            if self.first:
+                self.first = False
+                # .xml.gz files are served as application/octet-stream, not Content-Encoding
+                if chunk[:2] == b'\x1f\x8b':
+                    self.inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if self.inflater is not None:
+                chunk = self.inflater.decompress(chunk)
+            self.size += len(chunk)
+            if self.size > self.max_bytes:
+                raise ValueError(f"sitemap larger than {self.max_bytes // (1024 * 1024)} MB")
+            self.pending = chunk
+        if size is None or size < 0:
+            size = len(self.pending)
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def parse_sitemap(stream):
+    """
+    Yield ('sitemap' or 'url', loc, lastmod) for the entries of a sitemap or sitemap index
+
+    Elements are dropped as soon as they were read, so memory stays flat on
+    sitemaps with tens of thousands of entries.
+    """
+    loc = lastmod = None
+    for _, element in iterparse(stream, events=('end',)):
+        name = _local_name(element.tag)
+        if name == 'loc':
+            loc = (element.text or '').strip()
+        elif name == 'lastmod':
+            lastmod = (element.text or '').strip()[:10] or None
+        elif name in ('url', 'sitemap'):
+            if loc:
+                yield name, loc, lastmod
+            loc = lastmod = None
+            element.clear()
+
+class SitemapIndex:
+    """Per-host index of the PDF URLs listed in sitemaps, kept in SQLite"""
+    def __init__(self, path=DEFAULT_SITEMAP_FILE, **settings):
+        unknown = set(settings) - set(SITEMAP_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown sitemap settings: {', '.join(sorted(unknown))}")
+        self.settings = {**SITEMAP_DEFAULTS, **settings}
+        self.path = path
+        self.lock = threading.Lock()
+        self.host_locks = {}
+        self.scheduler = get_scheduler()
+        self.stats = {'lookups': 0, 'indexed_hosts': 0, 'sitemaps_read': 0, 'pdfs_found': 0}
+
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS hosts (
+                origin TEXT PRIMARY KEY,
+                indexed_at REAL,
+                sitemaps INTEGER,
+                pdfs INTEGER
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pdfs (
+                origin TEXT,
+                url TEXT,
+                lastmod TEXT,
+                year TEXT,
+                is_report INTEGER,
+                PRIMARY KEY (origin, url)
+            )
+        """)
+        self.conn.commit()
+
+    def _fetch(self, url):
+        self.scheduler.wait(url)
+        return get_session().get(url, headers={'User-Agent': USER_AGENT}, timeout=self.settings['timeout'], stream=True)
+
+    def sitemap_urls(self, origin):
+        """Sitemaps announced in robots.txt, else the usual locations"""
+        try:
+            response = self._fetch(origin + '/robots.txt')
+            with response:
+                if response.status_code == 200:
+                    found = _ROBOTS_SITEMAP.findall(response.text[:500000])
+                    if found:
+                        return list(dict.fromkeys(urljoin(origin, url) for url in found))
+        except Exception as e:
+            print(f"  Could not read {origin}/robots.txt: {e}")
+        return [origin + path for path in DEFAULT_SITEMAP_PATHS]
+
+    def _read_sitemaps(self, origin):
+        """Walk the sitemap tree of `origin`; returns (sitemaps read, {pdf url: lastmod})"""
+        queue = self.sitemap_urls(origin)
+        seen = set(queue)
+        pdfs = {}
+        read = fetched = 0
+        # Missing sitemaps count against the budget too, so a long robots.txt list stays cheap
+        while queue and fetched < self.settings['max_sitemaps']:
+            sitemap_url = queue.pop(0)
+            fetched += 1
+            children = []
+            try:
+                response = self._fetch(sitemap_url)
+                with response:
+                    if response.status_code != 200:
+                        continue
+                    read += 1
+                    for kind, loc, lastmod in parse_sitemap(_LimitedReader(response, self.settings['max_sitemap_bytes'])):
+                        if kind == 'sitemap':
+                            if loc not in seen:
+                                seen.add(loc)
+                                children.append(loc)
+                        elif is_pdf_url(loc):
+                            pdfs[loc] = lastmod
+            except (ParseError, ValueError, zlib.error) as e:
+                # A broken or oversized sitemap still leaves what was read before the problem
+                print(f"  Sitemap {sitemap_url} was cut short: {e}")
+            except Exception as e:
+                print(f"  Could not fetch sitemap {sitemap_url}: {e}")
+                continue
+            children.sort(key=lambda url: not _PROMISING_SITEMAP.search(url))
+            queue.extend(children)
+        return read, pdfs
+
+    def _host_lock(self, origin):
+        with self.lock:
+            return self.host_locks.setdefault(origin, threading.Lock())
+
+    def ensure(self, url):
+        """Index the sitemaps of the host of `url` unless that was done within the TTL"""
+        origin = origin_of(url)
+        with self._host_lock(origin):
+            with self.lock:
+                row = self.conn.execute('SELECT indexed_at FROM hosts WHERE origin = ?', (origin,)).fetchone()
+            if row is not None and time.time() - row[0] < self.settings['ttl']:
+                return origin
+
+            print(f"  Reading sitemaps of {origin}")
+            read, pdfs = self._read_sitemaps(origin)
+            rows = []
+            for pdf_url, lastmod in pdfs.items():
+                match = match_report_keywords(pdf_url)
+                rows.append((origin, pdf_url, lastmod, match.year, int(match.is_report)))
+
+            with self.lock:
+                self.conn.execute('DELETE FROM pdfs WHERE origin = ?', (origin,))
+                self.conn.executemany('INSERT OR REPLACE INTO pdfs VALUES (?, ?, ?, ?, ?)', rows)
+                self.conn.execute('INSERT OR REPLACE INTO hosts VALUES (?, ?, ?, ?)',
+                                  (origin, time.time(), read, len(rows)))
+                self.conn.commit()
+                self.stats['indexed_hosts'] += 1
+                self.stats['sitemaps_read'] += read
+                self.stats['pdfs_found'] += len(rows)
+            print(f"  {read} sitemaps of {origin} list {len(rows)} PDFs")
+            return origin
+
+    def report_pdfs(self, url, years=2, current_year=None):
+        """
+        Annual report PDFs of the host of `url` from the last `years` fiscal years
+
+        Reads the host's sitemaps on first use. The year comes from the URL, else from
+        lastmod minus one (reports come out the year after the one they cover).
+        Returns result dicts (url, text, is_pdf, year, lastmod), newest first.
+        """
+        origin = self.ensure(url)
+        current_year = current_year or datetime.now().year
+        with self.lock:
+            self.stats['lookups'] += 1
+            rows = self.conn.execute(
+                'SELECT url, lastmod, year FROM pdfs WHERE origin = ? AND is_report = 1', (origin,)
+            ).fetchall()
+
+        reports = []
+        for pdf_url, lastmod, year in rows:
+            if not year and lastmod and lastmod[:4].isdigit():
+                year = str(int(lastmod[:4]) - 1)
+            if year and int(year) >= current_year - years:
+                reports.append({'url': pdf_url, 'text': '', 'is_pdf': True, 'year': year, 'lastmod': lastmod})
+        reports.sort(key=lambda report: (report['year'], report['lastmod'] or ''), reverse=True)
+        return reports
+
+    def print_stats(self):
+        """Print what was read from sitemaps in this run"""
+        if not self.stats['lookups']:
+            return
+        with self.lock:
+            hosts, pdfs = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(pdfs), 0) FROM hosts').fetchone()
+        print(f"Sitemap index: {self.stats['lookups']} lookups, {self.stats['indexed_hosts']} hosts indexed "
+              f"({self.stats['sitemaps_read']} sitemaps, {self.stats['pdfs_found']} PDFs); "
+              f"{hosts} hosts and {pdfs} PDFs on disk")
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_sitemap_index():
+    """Return the sitemap index shared by all fetchers"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SitemapIndex()
+        return _index
+
+def main():
+    parser = argparse.ArgumentParser(description='List the recent annual report PDFs in the sitemaps of a site')
+    parser.add_argument('url', help='Any URL on the site')
+    parser.add_argument('--years', type=int, default=2, help='Fiscal years to go back')
+    parser.add_argument('--refresh', action='store_true', help='Read the sitemaps again even if indexed recently')
+    args = parser.parse_args()
+
+    index = SitemapIndex(ttl=0) if args.refresh else get_sitemap_index()
+    for report in index.report_pdfs(args.url, args.years):
+        print(f"{report['year']}  {report['lastmod'] or '':10}  {report['url']}")
+    index.print_stats()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# url_canonical.py
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from response_cache import get_response_cache
+
+# Query parameters that only track the visitor and never change the document
+TRACKING_PARAMS = frozenset([
+    'gclid', 'gclsrc', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid', 'twclid', 'li_fat_id',
+    'mc_cid', 'mc_eid', '_ga', '_gl', '_hsenc', '_hsmi', 'hsctatracking', 'mkt_tok',
+    'ref_src', 'ref_url', 'srsltid', 'trk', 'sc_cid', 'cmpid', 'wt.mc_id',
+])
+TRACKING_PREFIXES = ('utm_', 'pk_', 'piwik_', 'matomo_', 'hsa_', 'oly_')
+
+# Session ids some CMSs put into the path, e.g. /report.pdf;jsessionid=0A1B
+SESSION_PATH_PARAMS = ('jsessionid', 'phpsessid', 'sid')
+
+def _is_tracking(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+def canonicalize_url(url, resolve_redirects=True):
+    """
+    Return the canonical spelling of `url`, still usable for requests
+
+    Follows redirects the response cache already saw (no request is made), then
+    lowercases scheme and host, drops default ports, the fragment, tracking
+    parameters, session ids in the path and a trailing slash.
+    """
+    url = url.strip()
+    canonical = _normalize(url)
+    if resolve_redirects:
+        cache = get_response_cache()
+        target = cache.redirect_target(url) or cache.redirect_target(canonical)
+        if target:
+            canonical = _normalize(target)
+    return canonical
+
+def _normalize(url):
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    port = parts.port
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f"{host}:{port}"
+
+    path = parts.path
+    if ';' in path:
+        segment, _, parameter = path.rpartition(';')
+        if parameter.split('=', 1)[0].lower() in SESSION_PATH_PARAMS:
+            path = segment
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/') or '/'
+
+    query = parts.query
+    if query:
+        params = parse_qsl(query, keep_blank_values=True)
+        kept = [(name, value) for name, value in params if not _is_tracking(name)]
+        # Re-encoding can change how the rest is spelled, so only when something goes
+        if len(kept) < len(params):
+            query = urlencode(kept)
+
+    return urlunsplit((scheme, host, path or '/', query, ''))
+
+def dedup_key(canonical_url):
+    """Key under which spellings of one document collide: no scheme, sorted query"""
+    parts = urlsplit(canonical_url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{parts.netloc}{parts.path}?{query}"
+
+def dedupe_urls(urls):
+    """Canonicalize `urls` and drop repeats, keeping the first occurrence's position"""
+    seen = {}
+    for url in urls:
+        canonical = canonicalize_url(url)
+        key = dedup_key(canonical)
+        if key not in seen or (seen[key].startswith('http:') and canonical.startswith('https:')):
+            seen[key] = canonical
+    return list(seen.values())
+
+def dedupe_results(results):
+    """
+    Canonicalize result URLs and merge entries for the same document, in one pass
+
+    The first entry for a document keeps its position; later duplicates only fill
+    in what it lacks (year, link text, PDF flag, https). Returns a new list.
+    """
+    merged = {}
+    for result in results:
+        canonical = canonicalize_url(result['url'])
+        key = dedup_key(canonical)
+        kept = merged.get(key)
+        if kept is None:
+            merged[key] = {**result, 'url': canonical}
+            continue
+
+        if canonical.startswith('https:') and kept['url'].startswith('http:'):
+            kept['url'] = canonical
+        for field in ('year', 'text'):
+            if not kept.get(field) and result.get(field):
+                kept[field] = result[field]
+        kept['is_pdf'] = kept.get('is_pdf') or result.get('is_pdf', False)
+
+    if len(merged) < len(results):
+        print(f"  {len(results) - len(merged)} duplicate links dropped, {len(merged)} left")
+    return list(merged.values())
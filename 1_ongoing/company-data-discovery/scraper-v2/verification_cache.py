@@ -0,0 +1,130 @@
+# verification_cache.py
+import sqlite3
+import threading
+import time
+import requests
+from requests.structures import CaseInsensitiveDict
+from response_cache import normalize_url
+
+DEFAULT_VERIFICATION_FILE = 'url_verification.sqlite'
+DEFAULT_VERIFICATION_TTL = 7 * 24 * 60 * 60   # published reports don't move often
+
+class VerificationCache:
+    """
+    Persistent record of URLs that were recently verified as accessible
+
+    Stores the status code, Content-Type, Content-Length, ETag and the final URL
+    after redirects, so later runs can skip the HEAD/GET round trips. PDFs checked
+    by pdf_sniffer also keep their title and year hint.
+    """
+    def __init__(self, path=DEFAULT_VERIFICATION_FILE, ttl=DEFAULT_VERIFICATION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0}
+
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS verified (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                content_type TEXT,
+                content_length INTEGER,
+                etag TEXT,
+                final_url TEXT,
+                checked_at REAL,
+                title TEXT,
+                year_hint TEXT
+            )
+        """)
+        # Caches created before PDF sniffing lack the metadata columns
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(verified)')}
+        for column in ('title', 'year_hint'):
+            if column not in columns:
+                self.conn.execute(f'ALTER TABLE verified ADD COLUMN {column} TEXT')
+        self.conn.commit()
+
+    def get(self, url):
+        """Return the stored verification of `url` as a dict, or None if unknown or expired"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT status, content_type, content_length, etag, final_url, checked_at, title, year_hint '
+                'FROM verified WHERE key = ?', (normalize_url(url),)
+            ).fetchone()
+
+            if row is None or time.time() - row[5] > self.ttl:
+                self.stats['misses'] += 1
+                return None
+
+            self.stats['hits'] += 1
+        return dict(zip(['status', 'content_type', 'content_length', 'etag', 'final_url', 'checked_at',
+                         'title', 'year_hint'], row))
+
+    def put(self, url, response, pdf_info=None):
+        """
+        Record a successful verification of `url` from a HEAD or GET response
+
+        For a Range request pass the PdfInfo from pdf_sniffer: the 206 is stored as
+        200 with the full file size, together with the title and year hint.
+        """
+        content_length = response.headers.get('Content-Length')
+        content_length = int(content_length) if content_length and content_length.isdigit() else None
+        status = response.status_code
+        title = year_hint = None
+        if pdf_info is not None:
+            status = 200 if status == 206 else status
+            content_length = pdf_info.size
+            title, year_hint = pdf_info.title, pdf_info.year
+
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO verified VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (normalize_url(url), url, status, response.headers.get('Content-Type'), content_length,
+                 response.headers.get('ETag'), response.url or url, time.time(), title, year_hint)
+            )
+            self.conn.commit()
+            self.stats['stored'] += 1
+
+    @staticmethod
+    def to_response(entry):
+        """Build a body-less response from a stored verification"""
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.url = entry['final_url']
+        response.headers = CaseInsensitiveDict({
+            name: str(value) for name, value in (
+                ('Content-Type', entry['content_type']),
+                ('Content-Length', entry['content_length']),
+                ('ETag', entry['etag']),
+            ) if value is not None
+        })
+        response._content = b''
+        response.from_cache = True
+        return response
+
+    def clear(self):
+        """Forget all verifications"""
+        with self.lock:
+            self.conn.execute('DELETE FROM verified')
+            self.conn.commit()
+
+    def print_stats(self):
+        """Print how many URL checks were answered from the cache in this run"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        if not lookups:
+            return
+        print(f"Verification cache: {self.stats['hits']}/{lookups} URL checks skipped, "
+              f"{self.stats['stored']} new verifications stored")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_verification_cache():
+    """Return the verification cache shared by all fetchers"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = VerificationCache()
+        return _cache
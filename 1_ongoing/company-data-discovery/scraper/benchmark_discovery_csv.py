@@ -0,0 +1,161 @@
+"""
+Benchmark for building discovery.csv from large synthetic inputs
+
+Usage:
+    python benchmark_discovery_csv.py --companies 100000 --reports 8
+    python benchmark_discovery_csv.py --target generator --companies 100000 --reports 40
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+import pandas as pd
+
+from company_report_finder_fixed import FinancialReportFinder
+from discovery_csv_generator import format_discovery_csv, format_discovery_csv_streaming
+
+def make_inputs(folder, companies, reports_per_company, seed=42):
+    """Write a synthetic template and results file, return their paths"""
+    rng = random.Random(seed)
+    template_file = os.path.join(folder, 'template.csv')
+    input_file = os.path.join(folder, 'financial_reports.csv')
+
+    names = [f"COMPANY {i} AG" for i in range(companies)]
+    with open(template_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['ID', 'NAME'])
+        for i, name in enumerate(names):
+            writer.writerow([18000000 + i, name])
+
+    # One pass per report, so rows of different companies are interleaved like
+    # results appended over several runs. Nothing is held in memory but the counts.
+    counts = [rng.randint(0, reports_per_company) for _ in names]
+    report_rows = 0
+    with open(input_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['COMPANY', 'TYPE', 'SRC', 'REFYEAR'])
+        for j in range(reports_per_company):
+            report_type = 'FIN_REP' if j == 0 else 'OTHER'
+            year = 2024 - j
+            for name, count in zip(names, counts):
+                if j < count:
+                    writer.writerow([name, report_type, f"https://example.com/{name.replace(' ', '-')}/{year}.pdf", year])
+                    report_rows += 1
+
+    return input_file, template_file, report_rows
+
+def legacy_format(input_file, template_file, output_file):
+    """The previous iterrows implementation, kept for comparison"""
+    df_input = pd.read_csv(input_file)
+    df_template = pd.read_csv(template_file)
+    results = []
+    for _, row in df_template.iterrows():
+        company_name = row['NAME']
+        company_id = row.get('ID', '')
+        company_reports = df_input[df_input['COMPANY'] == company_name]
+        fin_reps = company_reports[company_reports['TYPE'] == 'FIN_REP']
+        fin_rep = fin_reps.iloc[0] if not fin_reps.empty else None
+        results.append({
+            'ID': company_id, 'NAME': company_name, 'TYPE': 'FIN_REP',
+            'SRC': fin_rep['SRC'] if fin_rep is not None else '',
+            'REFYEAR': fin_rep['REFYEAR'] if fin_rep is not None else ''
+        })
+        other_reports = company_reports[company_reports['TYPE'] == 'OTHER']
+        for i in range(5):
+            has_report = i < len(other_reports)
+            results.append({
+                'ID': company_id, 'NAME': company_name, 'TYPE': 'OTHER',
+                'SRC': other_reports.iloc[i]['SRC'] if has_report else '',
+                'REFYEAR': other_reports.iloc[i]['REFYEAR'] if has_report else ''
+            })
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['ID', 'NAME', 'TYPE', 'SRC', 'REFYEAR'])
+        writer.writeheader()
+        writer.writerows(results)
+
+def vectorized_format(input_file, template_file, output_file):
+    """Same steps as FinancialReportFinder.format_to_discovery_csv"""
+    df_input = pd.read_csv(input_file)
+    df_template = pd.read_csv(template_file)
+    FinancialReportFinder.build_discovery_rows(df_input, df_template).to_csv(output_file, index=False, encoding='utf-8')
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def _measure(func, args):
+    # Runs in a fresh process so ru_maxrss is the peak of this call alone
+    elapsed = timed(func, *args)
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measured(func, *args):
+    """Return (seconds, peak RSS in MB) of func(*args) run in a child process"""
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(_measure, (func, args))
+
+def same_file(a, b):
+    with open(a, encoding='utf-8') as first, open(b, encoding='utf-8') as second:
+        return 'identical' if first.read() == second.read() else 'DIFFERENT'
+
+def benchmark_finder(args):
+    print(f"{'companies':>10} {'report rows':>12} {'legacy (s)':>11} {'vectorized (s)':>15}  output")
+    for companies in args.companies:
+        with tempfile.TemporaryDirectory() as folder:
+            input_file, template_file, report_rows = make_inputs(folder, companies, args.reports)
+            new_output = os.path.join(folder, 'discovery_new.csv')
+            new_time = timed(vectorized_format, input_file, template_file, new_output)
+
+            legacy_time = '-'
+            check = 'not compared'
+            if companies <= args.legacy_limit:
+                legacy_output = os.path.join(folder, 'discovery_legacy.csv')
+                legacy_time = f"{timed(legacy_format, input_file, template_file, legacy_output):.2f}"
+                check = same_file(legacy_output, new_output)
+
+            print(f"{companies:>10} {report_rows:>12} {legacy_time:>11} {new_time:>15.2f}  {check}")
+
+def benchmark_generator(args):
+    print(f"{'companies':>10} {'report rows':>12} {'in-memory (s)':>14} {'MB':>6} "
+          f"{'streaming (s)':>14} {'MB':>6}  output")
+    for companies in args.companies:
+        with tempfile.TemporaryDirectory() as folder:
+            input_file, template_file, report_rows = make_inputs(folder, companies, args.reports)
+            stream_output = os.path.join(folder, 'discovery_stream.csv')
+            stream_time, stream_mb = measured(format_discovery_csv_streaming, input_file, template_file,
+                                              stream_output, args.chunksize)
+
+            memory_time = memory_mb = '-'
+            check = 'not compared'
+            if companies <= args.legacy_limit:
+                memory_output = os.path.join(folder, 'discovery_memory.csv')
+                elapsed, peak = measured(format_discovery_csv, input_file, template_file, memory_output)
+                memory_time, memory_mb = f"{elapsed:.2f}", f"{peak:.0f}"
+                check = same_file(memory_output, stream_output)
+
+            print(f"{companies:>10} {report_rows:>12} {memory_time:>14} {memory_mb:>6} "
+                  f"{stream_time:>14.2f} {stream_mb:>6.0f}  {check}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark discovery.csv formatting')
+    parser.add_argument('--target', choices=['finder', 'generator'], default='finder',
+                        help='FinancialReportFinder.format_to_discovery_csv or discovery_csv_generator')
+    parser.add_argument('--companies', type=int, nargs='+', default=[1200, 10000, 100000],
+                        help='Template sizes to benchmark')
+    parser.add_argument('--reports', type=int, default=8, help='Maximum reports per company')
+    parser.add_argument('--legacy-limit', type=int, default=5000,
+                        help='Skip the old/in-memory implementation above this many companies')
+    parser.add_argument('--chunksize', type=int, default=100000, help='Chunk size for the streaming generator')
+    args = parser.parse_args()
+
+    if args.target == 'generator':
+        benchmark_generator(args)
+    else:
+        benchmark_finder(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,28 @@
 from bs4 import BeautifulSoup
 import re
-import requests
 import pandas as pd
 import urllib.parse
 import time
-import random
 import csv
 from urllib.parse import urljoin, urlparse
 from datetime import datetime
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared fetch helpers live next to the v2 scraper
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scraper-v2'))
+from host_scheduler import get_scheduler
+from http_session import get_session
+from response_cache import get_response_cache
+from verification_cache import get_verification_cache
+from html_links import iter_link_elements
+from report_keywords import match_report_keywords, find_year
+from pdf_sniffer import sniff_pdf
+from crawl_frontier import CrawlFrontier, score_page_link
+from sitemap_index import get_sitemap_index, origin_of, MAX_SITEMAP_REPORTS
+from result_ranker import is_company_host
+from incremental_csv import IncrementalCSVWriter
 
 class FinancialReportFinder:
     def __init__(self):
@@ -26,12 +40,92 @@ class FinancialReportFinder:
         
         # Define non-European domains to avoid
         self.non_european_domains = ['.gov', '.us', '.ca', '.au', '.nz', '.jp', '.cn', '.kr', '.in', '.br']
+        
+        # Per-host token buckets take care of politeness for every request
+        self.scheduler = get_scheduler()
+        
+        # Pages and search results are kept on disk between runs
+        self.response_cache = get_response_cache()
+        
+        # URLs verified recently are not checked again
+        self.verification_cache = get_verification_cache()
+        
+        # Candidate URLs are probed in parallel, the host scheduler still spaces them out
+        self.verify_workers = 8
+        
+        # One FIN_REP and five OTHER rows are kept per company
+        self.max_reports = 6
+        
+        # Fiscal years read from PDF metadata, by URL, for candidates without a year
+        self.pdf_year_hints = {}
+        
+        # Overrides for the crawl budgets in CRAWL_DEFAULTS (max_pages, max_depth, ...)
+        self.crawl_settings = {}
+        
+        # Look up reports in the IR sites' sitemaps before crawling them
+        self.use_sitemaps = True
+    
+    def _get(self, url, headers=None, **kwargs):
+        """GET request that waits for a slot from the host scheduler"""
+        self.scheduler.wait(url)
+        return get_session().get(url, headers={**self.headers, **(headers or {})}, timeout=self.request_timeout, **kwargs)
+    
+    def _get_cached(self, url, ttl=None, stream=False):
+        """GET request served from the response cache when possible"""
+        return self.response_cache.fetch(url, lambda extra: self._get(url, headers=extra, stream=stream), ttl=ttl, stream=stream)
+    
+    def _head(self, url, **kwargs):
+        """HEAD request that waits for a slot from the host scheduler"""
+        self.scheduler.wait(url)
+        return get_session().head(url, headers=self.headers, timeout=self.request_timeout, **kwargs)
+    
+    def sniff_candidate(self, url):
+        """
+        Check a candidate with a Range request for its first few KB instead of HEAD + GET
+        
+        Confirms the %PDF header and keeps the year hint from the PDF's metadata.
+        Returns (status_code, response_object), with 415 for files that aren't PDFs
+        (e.g. an HTML error page served with 200), or None if the server didn't send
+        any of the file and the usual checks should run.
+        """
+        try:
+            info, response = sniff_pdf(url, get=lambda url, headers: self._get(url, headers=headers, stream=True))
+        except Exception as e:
+            print(f"[SNIFF] Range request failed for {url}: {str(e)}")
+            return None
+        
+        if info.is_pdf is None:
+            return None
+        if not info.is_pdf:
+            status_code = info.status if info.status not in (200, 206) else 415
+            print(f"[SNIFF] Not a PDF (status {status_code}): {url}")
+            return status_code, response
+        
+        print(f"[SNIFF] PDF verified: {url} (title: {info.title or 'none'}, "
+              f"year hint: {info.year or 'none'} from {info.year_source or '-'})")
+        self.verification_cache.put(url, response, info)
+        if info.year:
+            self.pdf_year_hints[url] = info.year
+        return 200, response
     
     def check_url_with_extended_retry(self, url):
         """
         Check if a URL exists with extended retry logic for rate limiting
         Returns: (status_code, response_object)
         """
+        # Recently verified URLs are answered from the verification cache
+        cached = self.verification_cache.get(url)
+        if cached is not None:
+            print(f"[CACHE] Verified recently: {url}")
+            if cached['year_hint']:
+                self.pdf_year_hints[url] = cached['year_hint']
+            return cached['status'], self.verification_cache.to_response(cached)
+        
+        # A few KB with a Range request confirm a real PDF and carry its metadata
+        sniffed = self.sniff_candidate(url)
+        if sniffed is not None:
+            return sniffed
+        
         max_retries = 2  # Maximum number of one-hour waits
         retry_count = 0
         
@@ -39,7 +133,7 @@ class FinancialReportFinder:
             try:
                 # First try HEAD request
                 print(f"Sending HEAD request to: {url}")
-                head_response = requests.head(url, headers=self.headers, timeout=self.request_timeout)
+                head_response = self._head(url)
                 
                 # Handle 202 status code (request accepted but processing)
                 if head_response.status_code == 202:
@@ -53,20 +147,22 @@ class FinancialReportFinder:
                         print(f"Waiting {wait_time} seconds before short retry (attempt {attempt+1}/3)...")
                         time.sleep(wait_time)
                         
-                        head_response = requests.head(url, headers=self.headers, timeout=self.request_timeout)
+                        head_response = self._head(url)
                         if head_response.status_code == 200:
                             print("[SUCCESS] Short retry succeeded, received status code 200")
+                            self.verification_cache.put(url, head_response)
                             return head_response.status_code, head_response
                         print(f"[FAILED] Still getting status code {head_response.status_code}")
                     
                     # If short retries didn't work, try with GET request
                     print(f"[STRATEGY] Trying GET request instead of HEAD")
                     try:
-                        get_response = requests.get(url, headers=self.headers, timeout=self.request_timeout, stream=True)
+                        get_response = self._get(url, stream=True)
                         # Close the connection immediately after checking status
                         get_response.close()
                         if get_response.status_code == 200:
                             print("[SUCCESS] GET request successful")
+                            self.verification_cache.put(url, get_response)
                             head_response.status_code = 200  # Use the HEAD response object but update status
                             return 200, head_response
                     except Exception as get_e:
@@ -101,16 +197,19 @@ class FinancialReportFinder:
                 if head_response.status_code != 200:
                     print(f"[STRATEGY] HEAD request failed with status {head_response.status_code}, trying GET request...")
                     try:
-                        get_response = requests.get(url, headers=self.headers, timeout=self.request_timeout, stream=True)
+                        get_response = self._get(url, stream=True)
                         # Close the connection immediately after checking status
                         get_response.close()
                         if get_response.status_code == 200:
                             print("[SUCCESS] GET request successful")
+                            self.verification_cache.put(url, get_response)
                             return 200, head_response  # We return the HEAD response object but with 200 status
                     except Exception as get_e:
                         print(f"[ERROR] GET request also failed: {str(get_e)}")
                 
                 # If we get here, return what we have
+                if head_response.status_code == 200:
+                    self.verification_cache.put(url, head_response)
                 return head_response.status_code, head_response
             
             except Exception as e:
@@ -122,6 +221,57 @@ class FinancialReportFinder:
         # If we exhausted all retries, return failure
         return 404, None
     
+    def verify_urls(self, candidates, top_k=None, check=None):
+        """
+        Probe candidate URLs in parallel and return the accessible ones in candidate order
+        
+        Up to self.verify_workers probes run at once. As soon as the first top_k
+        accessible candidates are known, probes that have not started are cancelled,
+        so a company costs about one probe of latency instead of the sum of all probes.
+        
+        Args:
+            candidates: dicts with a 'url' key, best candidate first
+            top_k: stop after this many accessible candidates (None checks all of them)
+            check: function returning the status code for a URL
+                   (defaults to check_url_with_extended_retry)
+        """
+        if not candidates:
+            return []
+        if check is None:
+            check = lambda url: self.check_url_with_extended_retry(url)[0]
+        
+        executor = ThreadPoolExecutor(max_workers=min(self.verify_workers, len(candidates)))
+        futures = [executor.submit(check, candidate['url']) for candidate in candidates]
+        verified = []
+        try:
+            # Waiting in candidate order keeps the best verified candidates first
+            for candidate, future in zip(candidates, futures):
+                try:
+                    status_code = future.result()
+                except Exception as e:
+                    print(f"[ERROR] Error checking URL {candidate['url']}: {str(e)}")
+                    continue
+                
+                if status_code == 200:
+                    # Candidates without a year in their URL or text take it from the PDF
+                    year_hint = self.pdf_year_hints.get(candidate['url'])
+                    if year_hint and not str(candidate.get('year') or '').isdigit():
+                        print(f"[SNIFF] Year {year_hint} from PDF metadata for {candidate['url']}")
+                        candidate['year'] = year_hint
+                    verified.append(candidate)
+                    if top_k and len(verified) >= top_k:
+                        break
+        finally:
+            # Probes already running finish in the background, the rest never start
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return verified
+    
+    @staticmethod
+    def report_sort_key(pdf):
+        """Rank reports by score, then by year"""
+        return (pdf.get('score', 0), int(pdf['year']) if pdf['year'].isdigit() else 0)
+    
     def search_duckduckgo(self, query):
         """Search DuckDuckGo and return results"""
         try:
@@ -133,7 +283,7 @@ class FinancialReportFinder:
             
             while retry_count <= max_retries:
                 print(f"Sending search request to DuckDuckGo for: {query}")
-                response = requests.get(search_url, headers=self.headers, timeout=self.request_timeout)
+                response = self._get_cached(search_url, ttl=24 * 60 * 60)  # search results go stale faster
                 
                 # Handle 202 status code (request accepted but processing)
                 if response.status_code == 202:
@@ -148,7 +298,7 @@ class FinancialReportFinder:
                         time.sleep(wait_time)
                         
                         print(f"Retrying search request for: {query}")
-                        response = requests.get(search_url, headers=self.headers, timeout=self.request_timeout)
+                        response = self._get(search_url)
                         if response.status_code == 200:
                             print("[SUCCESS] Short retry succeeded, received status code 200")
                             short_retry_success = True
@@ -273,8 +423,6 @@ class FinancialReportFinder:
             # If we found good results, no need to try more queries
             if len(filtered_results) >= 3:
                 break
-                
-            time.sleep(random.uniform(2, 3))  # Avoid rate limiting
         
         # Filter for likely investor relations pages
         ir_pages = []
@@ -294,11 +442,17 @@ class FinancialReportFinder:
         
         return ir_pages
     
-    def extract_pdf_links(self, url):
-        """Extract PDF links from a page"""
+    def extract_pdf_links(self, url, frontier=None, depth=0, probed_sites=None):
+        """
+        Extract PDF links from a page
+        
+        With a CrawlFrontier, the page's other links are queued on it. Pages deeper
+        than the search results skip the URL pattern guesses, and so do pages on a
+        site already in `probed_sites` (a set kept per company, updated here).
+        """
         try:
             print(f"Checking page: {url}")
-            response = requests.get(url, headers=self.headers, timeout=self.request_timeout)
+            response = self._get_cached(url, stream=True)
             
             # Handle 202 status code (request accepted but processing)
             if response.status_code == 202:
@@ -307,7 +461,8 @@ class FinancialReportFinder:
                 for attempt in range(3):
                     print(f"Waiting 5 seconds before retry (attempt {attempt+1}/3)...")
                     time.sleep(5)
-                    response = requests.get(url, headers=self.headers, timeout=self.request_timeout)
+                    response.close()
+                    response = self._get(url, stream=True)
                     if response.status_code == 200:
                         print("Request processed successfully")
                         break
@@ -315,15 +470,19 @@ class FinancialReportFinder:
             
             if response.status_code != 200:
                 print(f"Failed to load page: {response.status_code}")
+                response.close()
                 return []
                 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            # Links are handled while the page downloads; only <a> and <button> elements
+            # are kept, and big or non-HTML bodies are never read
+            elements = []
             pdf_links = []
             
             # Look for direct PDF links
-            for link in soup.find_all('a', href=True):
-                href = link.get('href', '')
-                if not href:
+            for link in iter_link_elements(response):
+                elements.append(link)
+                href = link.href
+                if link.tag != 'a' or not href:
                     continue
                 
                 # Make absolute URL if relative
@@ -331,26 +490,22 @@ class FinancialReportFinder:
                     href = urljoin(url, href)
                 
                 # Check if it's a PDF link
-                is_pdf = href.lower().endswith('.pdf') or '/pdf/' in href.lower()
-                link_text = link.get_text().strip().lower()
+                href_lower = href.lower()
+                if not (href_lower.endswith('.pdf') or '/pdf/' in href_lower):
+                    continue
                 
-                # Look for annual report keywords in the link text or URL
-                report_keywords = [
-                    'annual report', 'annual-report', 'financial report', 
-                    'financial-report', 'annual financial', 'jahresbericht',
-                    'yearly report', 'yearly-report', 'annual results'
-                ]
+                # One pass over URL and text finds report keywords (in the vocabulary
+                # chosen with --report-terms) and the year
+                match = match_report_keywords(href, link.text)
                 
-                if is_pdf and any(keyword in link_text or keyword in href.lower() for keyword in report_keywords):
-                    # Try to extract the year from the link text or URL
-                    year_match = re.search(r'20\d{2}', href) or re.search(r'20\d{2}', link_text)
-                    year = year_match.group(0) if year_match else "Unknown"
+                if match.is_report:
+                    year = match.year or "Unknown"
                     
                     # Score the link based on relevance
                     score = 0
-                    if 'annual' in link_text or 'annual' in href.lower():
+                    if match.annual:
                         score += 3
-                    if 'financial' in link_text or 'financial' in href.lower():
+                    if match.financial:
                         score += 2
                     if year.isdigit() and int(year) >= 2022:  # Prefer recent reports
                         score += 5
@@ -359,34 +514,34 @@ class FinancialReportFinder:
                     
                     pdf_links.append({
                         'url': href,
-                        'text': link.get_text().strip(),
+                        'text': link.text.strip(),
                         'year': year,
                         'score': score
                     })
             
+            self.response_cache.store(url, response)
+            
+            if frontier is not None:
+                page_links = []
+                for element in elements:
+                    if element.tag == 'a' and element.href:
+                        href = element.href if element.href.startswith(('http://', 'https://')) else urljoin(url, element.href)
+                        if not (href.lower().endswith('.pdf') or '/pdf/' in href.lower()):
+                            page_links.append((href, element.text.strip()))
+                frontier.add_links(url, depth, page_links)
+            
             # If no direct PDF links found, look for download buttons or links
             if not pdf_links:
-                download_buttons = soup.find_all(['a', 'button'], 
-                    string=re.compile(r'download|herunterladen|télécharger', re.I))
-                download_buttons += soup.find_all(['a', 'button'], 
-                    class_=re.compile(r'download|btn-download', re.I))
+                download_class = re.compile(r'download|btn-download', re.I)
+                download_buttons = [
+                    element for element in elements
+                    if match_report_keywords(element.text).download or download_class.search(element.css_class)
+                ]
                 
                 for button in download_buttons:
-                    # For buttons, look for nested <a> tags
-                    if button.name == 'button':
-                        link = button.find('a')
-                        if link:
-                            href = link.get('href')
-                        else:
-                            # Button might use JavaScript to trigger download
-                            for attr in ['data-url', 'data-href', 'data-download']:
-                                if button.has_attr(attr):
-                                    href = button.get(attr)
-                                    break
-                            else:
-                                continue  # Skip if no URL found
-                    else:
-                        href = button.get('href')
+                    # Buttons carry the href of a nested <a> tag, or a data-url style
+                    # attribute when they use JavaScript to trigger the download
+                    href = button.href
                     
                     if not href:
                         continue
@@ -397,25 +552,19 @@ class FinancialReportFinder:
                     
                     # Check if it's likely a PDF link
                     is_pdf = href.lower().endswith('.pdf') or '/pdf/' in href.lower()
-                    button_text = button.get_text().strip().lower()
-                    
-                    # Look for annual report keywords
-                    report_keywords = [
-                        'annual report', 'annual-report', 'financial report', 
-                        'financial-report', 'annual financial', 'jahresbericht'
-                    ]
+                    button_text = button.text.strip().lower()
                     
-                    # Try to extract the year from the button text or URL
-                    year_match = re.search(r'20\d{2}', href) or re.search(r'20\d{2}', button_text)
-                    year = year_match.group(0) if year_match else "Unknown"
+                    # Report keywords, download words and the year in one pass
+                    match = match_report_keywords(href, button_text)
+                    year = match.year or find_year(href, button_text) or "Unknown"
                     
                     # Score the button
                     score = 0
                     if is_pdf:
                         score += 3
-                    if any(keyword in button_text or keyword in href.lower() for keyword in report_keywords):
+                    if match.is_report:
                         score += 3
-                    if 'download' in button_text or 'download' in href.lower():
+                    if match.download:
                         score += 2
                     if year.isdigit() and int(year) >= 2022:  # Prefer recent reports
                         score += 5
@@ -430,6 +579,14 @@ class FinancialReportFinder:
                             'score': score
                         })
             
+            # Guesses are only worth it on the pages search found, once per site
+            site = urlparse(url).netloc.lower()
+            if depth > 0 or (probed_sites is not None and site in probed_sites):
+                pdf_links.sort(key=lambda x: (x.get('score', 0), int(x['year']) if x['year'].isdigit() else 0), reverse=True)
+                return pdf_links
+            if probed_sites is not None:
+                probed_sites.add(site)
+            
             # If still no links found, try common URL patterns
             if not pdf_links:
                 # Try to construct direct URLs based on common patterns
@@ -442,25 +599,21 @@ class FinancialReportFinder:
                     f"{url.rstrip('/')}/financial-report-{datetime.now().year-1}.pdf"
                 ]
                 
+                pattern_pdfs = []
                 for pattern_url in common_patterns:
-                    try:
-                        # Check if URL exists using our extended retry method
-                        status_code, _ = self.check_url_with_extended_retry(pattern_url)
-                        
-                        if status_code == 200:
-                            year_match = re.search(r'20\d{2}', pattern_url)
-                            year = year_match.group(0) if year_match else str(datetime.now().year)
-                            
-                            pdf_links.append({
-                                'url': pattern_url,
-                                'text': f"Annual Report {year}",
-                                'year': year,
-                                'score': 4  # Medium-high score for pattern-matched URLs
-                            })
-                            print(f"[SUCCESS] Found common pattern match: {pattern_url}")
-                    except Exception as e:
-                        print(f"[ERROR] Error checking pattern URL {pattern_url}: {str(e)}")
-                        continue
+                    year_match = re.search(r'20\d{2}', pattern_url)
+                    year = year_match.group(0) if year_match else str(datetime.now().year)
+                    pattern_pdfs.append({
+                        'url': pattern_url,
+                        'text': f"Annual Report {year}",
+                        'year': year,
+                        'score': 4  # Medium-high score for pattern-matched URLs
+                    })
+                
+                # Check all guesses at once
+                for pdf in self.verify_urls(pattern_pdfs):
+                    pdf_links.append(pdf)
+                    print(f"[SUCCESS] Found common pattern match: {pdf['url']}")
             
             # Company-specific patterns based on the companies in the list
             domain = urlparse(url).netloc
@@ -562,34 +715,30 @@ class FinancialReportFinder:
                     "https://medias.sncf.com/sncfcom/finances/Publications_financieres/SNCF_RAA_31122021_EN.pdf"
                 ]
                 
-            # Try each company-specific pattern
+            # Extract company name from domain
+            company_name = domain.split('.')[0]
+            if company_name.startswith('www.'):
+                company_name = company_name[4:]
+            company_name = company_name.capitalize()
+            
+            # Try all company-specific patterns at once
+            pattern_pdfs = []
             for pattern_url in company_patterns:
-                try:
-                    # Check if URL exists using our extended retry method
-                    status_code, head_response = self.check_url_with_extended_retry(pattern_url)
-                    
-                    if status_code == 200:
-                        year_match = re.search(r'20\d{2}', pattern_url) or re.search(r'FY(\d{4})', pattern_url)
-                        year = year_match.group(0) if year_match else str(datetime.now().year)
-                        if year.startswith('FY'):
-                            year = year[2:]  # Remove FY prefix
-                        
-                        # Extract company name from domain
-                        company_name = domain.split('.')[0]
-                        if company_name.startswith('www.'):
-                            company_name = company_name[4:]
-                        company_name = company_name.capitalize()
-                        
-                        pdf_links.append({
-                            'url': pattern_url,
-                            'text': f"{company_name} Annual Report {year}",
-                            'year': year,
-                            'score': 10  # High score for known patterns
-                        })
-                        print(f"[SUCCESS] Found valid PDF: {pattern_url}")
-                except Exception as e:
-                    print(f"[ERROR] Error checking URL {pattern_url}: {str(e)}")
-                    continue
+                year_match = re.search(r'20\d{2}', pattern_url) or re.search(r'FY(\d{4})', pattern_url)
+                year = year_match.group(0) if year_match else str(datetime.now().year)
+                if year.startswith('FY'):
+                    year = year[2:]  # Remove FY prefix
+                
+                pattern_pdfs.append({
+                    'url': pattern_url,
+                    'text': f"{company_name} Annual Report {year}",
+                    'year': year,
+                    'score': 10  # High score for known patterns
+                })
+            
+            for pdf in self.verify_urls(pattern_pdfs):
+                pdf_links.append(pdf)
+                print(f"[SUCCESS] Found valid PDF: {pdf['url']}")
                     
             # Sort PDF links by score and year
             if pdf_links:
@@ -601,6 +750,43 @@ class FinancialReportFinder:
             print(f"Error processing page {url}: {e}")
             return []
     
+    def sitemap_pdf_links(self, pages, company_name):
+        """Recent annual report PDFs listed in the sitemaps of the sites of `pages`, scored like extract_pdf_links"""
+        pdf_links = []
+        for origin in dict.fromkeys(origin_of(page['url']) for page in pages):
+            # Only the company's own sites; others' sitemaps are large and list other reports
+            if not is_company_host(origin, company_name):
+                continue
+            try:
+                reports = get_sitemap_index().report_pdfs(origin)
+            except Exception as e:
+                print(f"Could not use the sitemaps of {origin}: {e}")
+                continue
+            if len(reports) > MAX_SITEMAP_REPORTS:
+                print(f"  Ignoring the sitemaps of {origin}: {len(reports)} recent reports, not one company's")
+                continue
+            
+            for report in reports:
+                match = match_report_keywords(report['url'])
+                score = 0
+                if match.annual:
+                    score += 3
+                if match.financial:
+                    score += 2
+                if int(report['year']) >= 2022:
+                    score += 5
+                elif int(report['year']) >= 2020:
+                    score += 3
+                pdf_links.append({
+                    'url': report['url'],
+                    'text': '',
+                    'year': report['year'],
+                    'score': score
+                })
+            if reports:
+                print(f"  {len(reports)} recent reports in the sitemaps of {origin}")
+        return pdf_links
+    
     def find_company_reports(self, company_name):
         """Main method to find annual reports for a company"""
         print(f"\nProcessing: {company_name}")
@@ -660,7 +846,6 @@ class FinancialReportFinder:
             ir_pages.extend(pages)
             if pages:  # If we found some results, don't need to try all queries
                 break
-            time.sleep(random.uniform(2, 3))  # Avoid rate limiting
         
         # If we found direct PDFs, process them first
         verified_pdfs = []
@@ -673,12 +858,11 @@ class FinancialReportFinder:
                 reverse=True
             )
             
-            # Verify that PDFs are accessible
-            for pdf in sorted_direct_pdfs:
-                status_code, _ = self.check_url_with_extended_retry(pdf['url'])
-                if status_code == 200:
-                    verified_pdfs.append(pdf)
-                    print(f"[DIRECT PDF] Verified accessible PDF: {pdf['url']}")
+            # Verify the best candidates in parallel; only the top ones end up in the results
+            ranked_pdfs = sorted(sorted_direct_pdfs, key=self.report_sort_key, reverse=True)
+            verified_pdfs = self.verify_urls(ranked_pdfs, top_k=self.max_reports)
+            for pdf in verified_pdfs:
+                print(f"[DIRECT PDF] Verified accessible PDF: {pdf['url']}")
             
             if verified_pdfs:
                 return verified_pdfs
@@ -701,7 +885,6 @@ class FinancialReportFinder:
                 ir_pages.extend(pages)
                 if pages:  # If we found some results, break
                     break
-                time.sleep(random.uniform(2, 3))  # Avoid rate limiting
         
         # Process any direct PDFs found in the second round
         if direct_pdf_results and not verified_pdfs:
@@ -713,12 +896,11 @@ class FinancialReportFinder:
                 reverse=True
             )
             
-            # Verify that PDFs are accessible
-            for pdf in sorted_direct_pdfs:
-                status_code, _ = self.check_url_with_extended_retry(pdf['url'])
-                if status_code == 200:
-                    verified_pdfs.append(pdf)
-                    print(f"[DIRECT PDF] Verified accessible PDF: {pdf['url']}")
+            # Verify the best candidates in parallel; only the top ones end up in the results
+            ranked_pdfs = sorted(sorted_direct_pdfs, key=self.report_sort_key, reverse=True)
+            verified_pdfs = self.verify_urls(ranked_pdfs, top_k=self.max_reports)
+            for pdf in verified_pdfs:
+                print(f"[DIRECT PDF] Verified accessible PDF: {pdf['url']}")
             
             if verified_pdfs:
                 return verified_pdfs
@@ -736,7 +918,6 @@ class FinancialReportFinder:
                 ir_pages.extend(pages)
                 if pages:
                     break
-                time.sleep(random.uniform(2, 3))
         
         if not ir_pages:
             print(f"Could not find investor relations pages for {company_name}")
@@ -749,21 +930,23 @@ class FinancialReportFinder:
                 "https://medias.sncf.com/sncfcom/finances/Publications_financieres/SNCF_RAA_31122022_EN.pdf"
             ]
             
+            special_pdfs = []
             for url in special_urls:
                 print(f"[SPECIAL CASE] Checking SNCF special URL: {url}")
-                status_code, _ = self.check_url_with_extended_retry(url)
-                if status_code == 200:
-                    year_match = re.search(r'20\d{2}', url)
-                    year = year_match.group(0) if year_match else "2023"
-                    
-                    direct_result = [{
-                        'url': url,
-                        'text': f"SNCF Annual Financial Report {year}",
-                        'year': year,
-                        'score': 15  # Very high score for known URL
-                    }]
-                    print(f"[SPECIAL CASE] Found valid SNCF PDF: {url}")
-                    return direct_result
+                year_match = re.search(r'20\d{2}', url)
+                year = year_match.group(0) if year_match else "2023"
+                special_pdfs.append({
+                    'url': url,
+                    'text': f"SNCF Annual Financial Report {year}",
+                    'year': year,
+                    'score': 15  # Very high score for known URL
+                })
+            
+            # The first URL that works wins
+            direct_result = self.verify_urls(special_pdfs, top_k=1)
+            if direct_result:
+                print(f"[SPECIAL CASE] Found valid SNCF PDF: {direct_result[0]['url']}")
+                return direct_result
         
         # Remove duplicates from IR pages
         seen_urls = set()
@@ -773,19 +956,31 @@ class FinancialReportFinder:
                 seen_urls.add(page['url'])
                 unique_ir_pages.append(page)
         
-        # Step 2: Extract PDF links from each page
-        all_pdf_links = []
-        
-        # First check the most promising IR pages (first 3)
-        for page in unique_ir_pages[:3]:
-            pdf_links = self.extract_pdf_links(page['url'])
+        # Step 2: Crawl the IR sites, most promising pages first, and extract PDF links
+        latest_year = datetime.now().year - 1
+        is_latest = lambda link: link.get('score', 0) >= 8 and link['year'].isdigit() and int(link['year']) >= latest_year
+        
+        # Reports listed in the sites' sitemaps need no page fetches at all
+        all_pdf_links = self.sitemap_pdf_links(unique_ir_pages, company_name) if self.use_sitemaps else []
+        frontier = CrawlFrontier(**self.crawl_settings)
+        probed_sites = set()
+        if not any(is_latest(link) for link in all_pdf_links):
+            for rank, page in enumerate(unique_ir_pages):
+                # Search order counts most, then what the link itself says
+                frontier.add_seed(page['url'], 10 - rank + (score_page_link(page['url'], page.get('title', '')) or 0))
+        
+        while True:
+            next_page = frontier.pop()
+            if next_page is None:
+                break
+            page_url, depth, _ = next_page
+            pdf_links = self.extract_pdf_links(page_url, frontier, depth, probed_sites)
             all_pdf_links.extend(pdf_links)
             
-            # If we found good PDF links (with scores), we might not need to check more pages
-            if pdf_links and any(link.get('score', 0) >= 8 for link in pdf_links):
+            # Once a good link to the latest report turned up there is nothing left to find
+            if any(is_latest(link) for link in pdf_links):
                 break
-                
-            time.sleep(random.uniform(2, 3))  # Avoid rate limiting
+        print(f"  Crawl: {frontier.summary()}")
         
         # Step 3: Sort by score and year, then deduplicate
         seen_urls = set()
@@ -879,35 +1074,41 @@ class FinancialReportFinder:
         # If company matches a known pattern, try those URLs
         if matched_company:
             print(f"[MATCH] Found matched company pattern: {matched_company}")
+            pattern_pdfs = []
             for pattern_url in company_patterns[matched_company]:
-                try:
-                    # Check if URL exists using our extended retry method
-                    status_code, _ = self.check_url_with_extended_retry(pattern_url)
-                    
-                    if status_code == 200:
-                        # Extract year from URL
-                        year_match = re.search(r'20\d{2}', pattern_url)
-                        year = year_match.group(0) if year_match else str(datetime.now().year)
-                        
-                        pdf_links.append({
-                            'url': pattern_url,
-                            'text': f"{matched_company} Annual Report {year}",
-                            'year': year,
-                            'score': 10  # High score for direct pattern match
-                        })
-                        print(f"[SUCCESS] Found direct match: {pattern_url}")
-                except Exception as e:
-                    print(f"[ERROR] Error checking pattern URL {pattern_url}: {str(e)}")
-                    continue
+                # Extract year from URL
+                year_match = re.search(r'20\d{2}', pattern_url)
+                year = year_match.group(0) if year_match else str(datetime.now().year)
+                
+                pattern_pdfs.append({
+                    'url': pattern_url,
+                    'text': f"{matched_company} Annual Report {year}",
+                    'year': year,
+                    'score': 10  # High score for direct pattern match
+                })
+            
+            # Check all pattern URLs at once using our extended retry method
+            for pdf in self.verify_urls(pattern_pdfs):
+                pdf_links.append(pdf)
+                print(f"[SUCCESS] Found direct match: {pdf['url']}")
         
         return pdf_links
     
-    def process_company_list(self, companies):
-        """Process a list of companies and save results to CSV"""
+    def process_company_list(self, companies, writer=None):
+        """
+        Process a list of companies and save results to CSV
+        
+        Rows are appended to `writer` (an IncrementalCSVWriter) one company at a time.
+        Without a writer, results/financial_reports.csv is written.
+        """
         results = []
+        own_writer = writer is None
+        if own_writer:
+            writer = self.open_results_writer(f"{self.results_folder}/financial_reports.csv")
         
         for idx, company in enumerate(companies):
             print(f"Processing company {idx+1}/{len(companies)}: {company}")
+            company_start = len(results)
             
             # Try to find reports with up to 3 attempts
             attempt = 1
@@ -931,24 +1132,18 @@ class FinancialReportFinder:
                     print(f"Searching for: {query}")
                     
                     ir_pages = self.search_duckduckgo(query)
+                    probed_sites = set()
                     for page in ir_pages[:3]:  # Check top 3 results
-                        links = self.extract_pdf_links(page['url'])
+                        links = self.extract_pdf_links(page['url'], probed_sites=probed_sites)
                         pdf_links.extend(links)
                         if links:  # If we found links, we can stop
                             break
-                        time.sleep(random.uniform(2, 3))
                 else:
                     # Try direct known patterns for this company
                     print(f"Trying direct known patterns for {company}")
                     pdf_links = self.try_known_company_patterns(company)
                 
                 attempt += 1
-                
-                # Add a pause between attempts
-                if not pdf_links and attempt <= max_attempts:
-                    delay = random.uniform(3, 5)
-                    print(f"No results found. Waiting {delay:.1f} seconds before next attempt...")
-                    time.sleep(delay)
             
             # Add financial report (FIN_REP) entry
             if pdf_links:
@@ -991,18 +1186,19 @@ class FinancialReportFinder:
                     'REFYEAR': ''
                 })
             
-            # Save intermediate results after each company
-            self.save_to_csv(results, f"{self.results_folder}/financial_reports.csv")
+            # Append only this company's rows to the results file
+            writer.write_rows(results[company_start:])
             print(f"Completed processing {company}, found {sum(1 for r in results if r['COMPANY'] == company and r['SRC'])} reports")
-            
-            # Add a pause between companies
-            if idx < len(companies) - 1:
-                delay = random.uniform(3, 5)
-                print(f"Waiting {delay:.1f} seconds before next company...")
-                time.sleep(delay)
+        
+        if own_writer:
+            writer.close()
         
         return results
         
+    def open_results_writer(self, filename):
+        """Open an incremental writer for results in the save_to_csv format"""
+        return IncrementalCSVWriter(filename, fieldnames=['COMPANY', 'TYPE', 'SRC', 'REFYEAR'])
+    
     def save_to_csv(self, data, filename):
         """Save results to CSV file"""
         # Create directory if it doesn't exist
@@ -1016,6 +1212,43 @@ class FinancialReportFinder:
         
         print(f"Results saved to {filename}")
         
+    @staticmethod
+    def build_discovery_rows(df_input, df_template):
+        """
+        Build the discovery layout: one FIN_REP and five OTHER rows per template company
+        
+        Reports are ranked within (COMPANY, TYPE) and joined onto the template slots,
+        so the cost is linear in the number of companies and report rows.
+        
+        Args:
+            df_input: DataFrame with COMPANY, TYPE, SRC and REFYEAR columns
+            df_template: DataFrame with NAME and optionally ID columns
+        """
+        columns = ['ID', 'NAME', 'TYPE', 'SRC', 'REFYEAR']
+        
+        template = pd.DataFrame({
+            'ID': df_template['ID'] if 'ID' in df_template.columns else '',
+            'NAME': df_template['NAME'],
+        })
+        slots = pd.DataFrame({
+            'TYPE': ['FIN_REP', 'OTHER', 'OTHER', 'OTHER', 'OTHER', 'OTHER'],
+            'RANK': [0, 0, 1, 2, 3, 4],
+        })
+        layout = template.merge(slots, how='cross')
+        
+        # First FIN_REP and first five OTHER reports of each company, in file order
+        reports = df_input.loc[df_input['TYPE'].isin(['FIN_REP', 'OTHER']), ['COMPANY', 'TYPE', 'SRC', 'REFYEAR']]
+        reports = reports.assign(RANK=reports.groupby(['COMPANY', 'TYPE'], sort=False).cumcount())
+        reports = reports[reports['RANK'] < 5].rename(columns={'COMPANY': 'NAME'})
+        
+        # Object columns keep integer years intact when the merge adds gaps
+        reports = reports.astype({'SRC': object, 'REFYEAR': object})
+        
+        # A left merge keeps the template order
+        results = layout.merge(reports, how='left', on=['NAME', 'TYPE', 'RANK'])
+        results[['SRC', 'REFYEAR']] = results[['SRC', 'REFYEAR']].fillna('')
+        return results[columns]
+    
     def format_to_discovery_csv(self, input_file, template_file, output_file):
         """
         Format the results to match the required discovery.csv format
@@ -1038,55 +1271,9 @@ class FinancialReportFinder:
         df_input = pd.read_csv(input_file)
         df_template = pd.read_csv(template_file)
         
-        # Create results dataframe
-        results = []
-        
-        # Process each company in the template
-        for _, row in df_template.iterrows():
-            company_name = row['NAME']
-            company_id = row.get('ID', '')  # Get ID if exists, otherwise use empty string
-            
-            # Find reports for this company
-            company_reports = df_input[df_input['COMPANY'] == company_name]
-            
-            # Add financial report row (FIN_REP)
-            fin_rep = company_reports[company_reports['TYPE'] == 'FIN_REP'].iloc[0] if not company_reports[company_reports['TYPE'] == 'FIN_REP'].empty else None
-            
-            results.append({
-                'ID': company_id,
-                'NAME': company_name,
-                'TYPE': 'FIN_REP',
-                'SRC': fin_rep['SRC'] if fin_rep is not None else '',
-                'REFYEAR': fin_rep['REFYEAR'] if fin_rep is not None else ''
-            })
-            
-            # Add 5 OTHER rows
-            other_reports = company_reports[company_reports['TYPE'] == 'OTHER']
-            
-            for i in range(5):
-                if i < len(other_reports):
-                    results.append({
-                        'ID': company_id,
-                        'NAME': company_name,
-                        'TYPE': 'OTHER',
-                        'SRC': other_reports.iloc[i]['SRC'],
-                        'REFYEAR': other_reports.iloc[i]['REFYEAR']
-                    })
-                else:
-                    # Add empty rows to make 6 rows total per company
-                    results.append({
-                        'ID': company_id,
-                        'NAME': company_name,
-                        'TYPE': 'OTHER',
-                        'SRC': '',
-                        'REFYEAR': ''
-                    })
-        
-        # Write to CSV
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=['ID', 'NAME', 'TYPE', 'SRC', 'REFYEAR'])
-            writer.writeheader()
-            writer.writerows(results)
+        # Six rows per template company, filled in one vectorized pass
+        results = self.build_discovery_rows(df_input, df_template)
+        results.to_csv(output_file, index=False, encoding='utf-8')
         
         print(f"Discovery CSV saved to {output_file}")
     
@@ -1149,7 +1336,6 @@ class FinancialReportFinder:
             ir_pages.extend(pages)
             if pages:  # If we found some results, don't need to try all queries
                 break
-            time.sleep(random.uniform(2, 3))  # Avoid rate limiting
         
         # If we found direct PDFs, process them first
         if direct_pdf_results:
@@ -1161,13 +1347,11 @@ class FinancialReportFinder:
                 reverse=True
             )
             
-            # Verify that PDFs are accessible
-            verified_pdfs = []
-            for pdf in sorted_direct_pdfs:
-                status_code, _ = self.check_url_with_extended_retry(pdf['url'])
-                if status_code == 200:
-                    verified_pdfs.append(pdf)
-                    print(f"[DIRECT PDF] Verified accessible PDF: {pdf['url']}")
+            # Verify the best candidates in parallel; only the top ones end up in the results
+            ranked_pdfs = sorted(sorted_direct_pdfs, key=self.report_sort_key, reverse=True)
+            verified_pdfs = self.verify_urls(ranked_pdfs, top_k=self.max_reports)
+            for pdf in verified_pdfs:
+                print(f"[DIRECT PDF] Verified accessible PDF: {pdf['url']}")
             
             if verified_pdfs:
                 return verified_pdfs
@@ -1190,7 +1374,6 @@ class FinancialReportFinder:
                 ir_pages.extend(pages)
                 if pages:  # If we found some results, break
                     break
-                time.sleep(random.uniform(2, 3))  # Avoid rate limiting
         
         # Process any direct PDFs found in the second round
         if direct_pdf_results and not verified_pdfs:
@@ -1202,13 +1385,11 @@ class FinancialReportFinder:
                 reverse=True
             )
             
-            # Verify that PDFs are accessible
-            verified_pdfs = []
-            for pdf in sorted_direct_pdfs:
-                status_code, _ = self.check_url_with_extended_retry(pdf['url'])
-                if status_code == 200:
-                    verified_pdfs.append(pdf)
-                    print(f"[DIRECT PDF] Verified accessible PDF: {pdf['url']}")
+            # Verify the best candidates in parallel; only the top ones end up in the results
+            ranked_pdfs = sorted(sorted_direct_pdfs, key=self.report_sort_key, reverse=True)
+            verified_pdfs = self.verify_urls(ranked_pdfs, top_k=self.max_reports)
+            for pdf in verified_pdfs:
+                print(f"[DIRECT PDF] Verified accessible PDF: {pdf['url']}")
             
             if verified_pdfs:
                 return verified_pdfs
@@ -1226,7 +1407,6 @@ class FinancialReportFinder:
                 ir_pages.extend(pages)
                 if pages:
                     break
-                time.sleep(random.uniform(2, 3))
         
         if not ir_pages:
             print(f"Could not find investor relations pages for {company_name}")
@@ -1239,21 +1419,23 @@ class FinancialReportFinder:
                 "https://medias.sncf.com/sncfcom/finances/Publications_financieres/SNCF_RAA_31122022_EN.pdf"
             ]
             
+            special_pdfs = []
             for url in special_urls:
                 print(f"[SPECIAL CASE] Checking SNCF special URL: {url}")
-                status_code, _ = self.check_url_with_extended_retry(url)
-                if status_code == 200:
-                    year_match = re.search(r'20\d{2}', url)
-                    year = year_match.group(0) if year_match else "2023"
-                    
-                    direct_result = [{
-                        'url': url,
-                        'text': f"SNCF Annual Financial Report {year}",
-                        'year': year,
-                        'score': 15  # Very high score for known URL
-                    }]
-                    print(f"[SPECIAL CASE] Found valid SNCF PDF: {url}")
-                    return direct_result
+                year_match = re.search(r'20\d{2}', url)
+                year = year_match.group(0) if year_match else "2023"
+                special_pdfs.append({
+                    'url': url,
+                    'text': f"SNCF Annual Financial Report {year}",
+                    'year': year,
+                    'score': 15  # Very high score for known URL
+                })
+            
+            # The first URL that works wins
+            direct_result = self.verify_urls(special_pdfs, top_k=1)
+            if direct_result:
+                print(f"[SPECIAL CASE] Found valid SNCF PDF: {direct_result[0]['url']}")
+                return direct_result
         
         # Remove duplicates from IR pages
         seen_urls = set()
@@ -1263,19 +1445,31 @@ class FinancialReportFinder:
                 seen_urls.add(page['url'])
                 unique_ir_pages.append(page)
         
-        # Step 2: Extract PDF links from each page
-        all_pdf_links = []
-        
-        # First check the most promising IR pages (first 3)
-        for page in unique_ir_pages[:3]:
-            pdf_links = self.extract_pdf_links(page['url'])
+        # Step 2: Crawl the IR sites, most promising pages first, and extract PDF links
+        latest_year = datetime.now().year - 1
+        is_latest = lambda link: link.get('score', 0) >= 8 and link['year'].isdigit() and int(link['year']) >= latest_year
+        
+        # Reports listed in the sites' sitemaps need no page fetches at all
+        all_pdf_links = self.sitemap_pdf_links(unique_ir_pages, company_name) if self.use_sitemaps else []
+        frontier = CrawlFrontier(**self.crawl_settings)
+        probed_sites = set()
+        if not any(is_latest(link) for link in all_pdf_links):
+            for rank, page in enumerate(unique_ir_pages):
+                # Search order counts most, then what the link itself says
+                frontier.add_seed(page['url'], 10 - rank + (score_page_link(page['url'], page.get('title', '')) or 0))
+        
+        while True:
+            next_page = frontier.pop()
+            if next_page is None:
+                break
+            page_url, depth, _ = next_page
+            pdf_links = self.extract_pdf_links(page_url, frontier, depth, probed_sites)
             all_pdf_links.extend(pdf_links)
             
-            # If we found good PDF links (with scores), we might not need to check more pages
-            if pdf_links and any(link.get('score', 0) >= 8 for link in pdf_links):
+            # Once a good link to the latest report turned up there is nothing left to find
+            if any(is_latest(link) for link in pdf_links):
                 break
-                
-            time.sleep(random.uniform(2, 3))  # Avoid rate limiting
+        print(f"  Crawl: {frontier.summary()}")
         
         # Step 3: Sort by score and year, then deduplicate
         seen_urls = set()
@@ -1369,50 +1563,74 @@ class FinancialReportFinder:
         # If company matches a known pattern, try those URLs
         if matched_company:
             print(f"Matched company pattern: {matched_company}")
+            
+            def check_pattern(pattern_url):
+                cached = self.verification_cache.get(pattern_url)
+                if cached is not None:
+                    return cached['status']
+                
+                sniffed = self.sniff_candidate(pattern_url)
+                if sniffed is not None:
+                    return sniffed[0]
+                
+                # Check if URL exists
+                head_response = self._head(pattern_url)
+                
+                # Handle 202 status code
+                if head_response.status_code == 202:
+                    for attempt in range(3):
+                        print(f"Waiting 5 seconds before retry (attempt {attempt+1}/3)...")
+                        time.sleep(5)
+                        head_response = self._head(pattern_url)
+                        if head_response.status_code == 200:
+                            break
+                
+                # If HEAD request doesn't work, try GET
+                if head_response.status_code != 200:
+                    get_response = self._get(pattern_url, stream=True)
+                    get_response.close()
+                    if get_response.status_code == 200:
+                        self.verification_cache.put(pattern_url, get_response)
+                    return get_response.status_code
+                
+                self.verification_cache.put(pattern_url, head_response)
+                return head_response.status_code
+            
+            pattern_pdfs = []
             for pattern_url in company_patterns[matched_company]:
-                try:
-                    # Check if URL exists
-                    head_response = requests.head(pattern_url, headers=self.headers, timeout=self.request_timeout)
-                    
-                    # Handle 202 status code
-                    if head_response.status_code == 202:
-                        for attempt in range(3):
-                            print(f"Waiting 5 seconds before retry (attempt {attempt+1}/3)...")
-                            time.sleep(5)
-                            head_response = requests.head(pattern_url, headers=self.headers, timeout=self.request_timeout)
-                            if head_response.status_code == 200:
-                                break
-                    
-                    # If HEAD request doesn't work, try GET
-                    if head_response.status_code != 200:
-                        get_response = requests.get(pattern_url, headers=self.headers, timeout=self.request_timeout, stream=True)
-                        get_response.close()
-                        if get_response.status_code == 200:
-                            head_response.status_code = 200
-                    
-                    if head_response.status_code == 200:
-                        # Extract year from URL
-                        year_match = re.search(r'20\d{2}', pattern_url)
-                        year = year_match.group(0) if year_match else str(datetime.now().year)
-                        
-                        pdf_links.append({
-                            'url': pattern_url,
-                            'text': f"{matched_company} Annual Report {year}",
-                            'year': year,
-                            'score': 10  # High score for direct pattern match
-                        })
-                        print(f"Found direct match: {pattern_url}")
-                except Exception as e:
-                    print(f"Error checking pattern URL {pattern_url}: {e}")
+                # Extract year from URL
+                year_match = re.search(r'20\d{2}', pattern_url)
+                year = year_match.group(0) if year_match else str(datetime.now().year)
+                
+                pattern_pdfs.append({
+                    'url': pattern_url,
+                    'text': f"{matched_company} Annual Report {year}",
+                    'year': year,
+                    'score': 10  # High score for direct pattern match
+                })
+            
+            # All pattern URLs are checked at once
+            for pdf in self.verify_urls(pattern_pdfs, check=check_pattern):
+                pdf_links.append(pdf)
+                print(f"Found direct match: {pdf['url']}")
         
         return pdf_links
     
-    def process_company_list(self, companies):
-        """Process a list of companies and save results to CSV"""
+    def process_company_list(self, companies, writer=None):
+        """
+        Process a list of companies and save results to CSV
+        
+        Rows are appended to `writer` (an IncrementalCSVWriter) one company at a time.
+        Without a writer, results/financial_reports.csv is written.
+        """
         results = []
+        own_writer = writer is None
+        if own_writer:
+            writer = self.open_results_writer(f"{self.results_folder}/financial_reports.csv")
         
         for idx, company in enumerate(companies):
             print(f"Processing company {idx+1}/{len(companies)}: {company}")
+            company_start = len(results)
             
             # Try to find reports with up to 3 attempts
             attempt = 1
@@ -1436,24 +1654,18 @@ class FinancialReportFinder:
                     print(f"Searching for: {query}")
                     
                     ir_pages = self.search_duckduckgo(query)
+                    probed_sites = set()
                     for page in ir_pages[:3]:  # Check top 3 results
-                        links = self.extract_pdf_links(page['url'])
+                        links = self.extract_pdf_links(page['url'], probed_sites=probed_sites)
                         pdf_links.extend(links)
                         if links:  # If we found links, we can stop
                             break
-                        time.sleep(random.uniform(2, 3))
                 else:
                     # Try direct known patterns for this company
                     print(f"Trying direct known patterns for {company}")
                     pdf_links = self.try_known_company_patterns(company)
                 
                 attempt += 1
-                
-                # Add a pause between attempts
-                if not pdf_links and attempt <= max_attempts:
-                    delay = random.uniform(3, 5)
-                    print(f"No results found. Waiting {delay:.1f} seconds before next attempt...")
-                    time.sleep(delay)
             
             # Add financial report (FIN_REP) entry
             if pdf_links:
@@ -1496,18 +1708,19 @@ class FinancialReportFinder:
                     'REFYEAR': ''
                 })
             
-            # Save intermediate results after each company
-            self.save_to_csv(results, f"{self.results_folder}/financial_reports.csv")
+            # Append only this company's rows to the results file
+            writer.write_rows(results[company_start:])
             print(f"Completed processing {company}, found {sum(1 for r in results if r['COMPANY'] == company and r['SRC'])} reports")
-            
-            # Add a pause between companies
-            if idx < len(companies) - 1:
-                delay = random.uniform(3, 5)
-                print(f"Waiting {delay:.1f} seconds before next company...")
-                time.sleep(delay)
+        
+        if own_writer:
+            writer.close()
         
         return results
         
+    def open_results_writer(self, filename):
+        """Open an incremental writer for results in the save_to_csv format"""
+        return IncrementalCSVWriter(filename, fieldnames=['COMPANY', 'TYPE', 'SRC', 'REFYEAR'])
+    
     def save_to_csv(self, data, filename):
         """Save results to CSV file"""
         # Create directory if it doesn't exist
@@ -1521,6 +1734,43 @@ class FinancialReportFinder:
         
         print(f"Results saved to {filename}")
         
+    @staticmethod
+    def build_discovery_rows(df_input, df_template):
+        """
+        Build the discovery layout: one FIN_REP and five OTHER rows per template company
+        
+        Reports are ranked within (COMPANY, TYPE) and joined onto the template slots,
+        so the cost is linear in the number of companies and report rows.
+        
+        Args:
+            df_input: DataFrame with COMPANY, TYPE, SRC and REFYEAR columns
+            df_template: DataFrame with NAME and optionally ID columns
+        """
+        columns = ['ID', 'NAME', 'TYPE', 'SRC', 'REFYEAR']
+        
+        template = pd.DataFrame({
+            'ID': df_template['ID'] if 'ID' in df_template.columns else '',
+            'NAME': df_template['NAME'],
+        })
+        slots = pd.DataFrame({
+            'TYPE': ['FIN_REP', 'OTHER', 'OTHER', 'OTHER', 'OTHER', 'OTHER'],
+            'RANK': [0, 0, 1, 2, 3, 4],
+        })
+        layout = template.merge(slots, how='cross')
+        
+        # First FIN_REP and first five OTHER reports of each company, in file order
+        reports = df_input.loc[df_input['TYPE'].isin(['FIN_REP', 'OTHER']), ['COMPANY', 'TYPE', 'SRC', 'REFYEAR']]
+        reports = reports.assign(RANK=reports.groupby(['COMPANY', 'TYPE'], sort=False).cumcount())
+        reports = reports[reports['RANK'] < 5].rename(columns={'COMPANY': 'NAME'})
+        
+        # Object columns keep integer years intact when the merge adds gaps
+        reports = reports.astype({'SRC': object, 'REFYEAR': object})
+        
+        # A left merge keeps the template order
+        results = layout.merge(reports, how='left', on=['NAME', 'TYPE', 'RANK'])
+        results[['SRC', 'REFYEAR']] = results[['SRC', 'REFYEAR']].fillna('')
+        return results[columns]
+    
     def format_to_discovery_csv(self, input_file, template_file, output_file):
         """
         Format the results to match the required discovery.csv format
@@ -1543,54 +1793,8 @@ class FinancialReportFinder:
         df_input = pd.read_csv(input_file)
         df_template = pd.read_csv(template_file)
         
-        # Create results dataframe
-        results = []
-        
-        # Process each company in the template
-        for _, row in df_template.iterrows():
-            company_name = row['NAME']
-            company_id = row.get('ID', '')  # Get ID if exists, otherwise use empty string
-            
-            # Find reports for this company
-            company_reports = df_input[df_input['COMPANY'] == company_name]
-            
-            # Add financial report row (FIN_REP)
-            fin_rep = company_reports[company_reports['TYPE'] == 'FIN_REP'].iloc[0] if not company_reports[company_reports['TYPE'] == 'FIN_REP'].empty else None
-            
-            results.append({
-                'ID': company_id,
-                'NAME': company_name,
-                'TYPE': 'FIN_REP',
-                'SRC': fin_rep['SRC'] if fin_rep is not None else '',
-                'REFYEAR': fin_rep['REFYEAR'] if fin_rep is not None else ''
-            })
-            
-            # Add 5 OTHER rows
-            other_reports = company_reports[company_reports['TYPE'] == 'OTHER']
-            
-            for i in range(5):
-                if i < len(other_reports):
-                    results.append({
-                        'ID': company_id,
-                        'NAME': company_name,
-                        'TYPE': 'OTHER',
-                        'SRC': other_reports.iloc[i]['SRC'],
-                        'REFYEAR': other_reports.iloc[i]['REFYEAR']
-                    })
-                else:
-                    # Add empty rows to make 6 rows total per company
-                    results.append({
-                        'ID': company_id,
-                        'NAME': company_name,
-                        'TYPE': 'OTHER',
-                        'SRC': '',
-                        'REFYEAR': ''
-                    })
-        
-        # Write to CSV
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=['ID', 'NAME', 'TYPE', 'SRC', 'REFYEAR'])
-            writer.writeheader()
-            writer.writerows(results)
+        # Six rows per template company, filled in one vectorized pass
+        results = self.build_discovery_rows(df_input, df_template)
+        results.to_csv(output_file, index=False, encoding='utf-8')
         
         print(f"Discovery CSV saved to {output_file}")
@@ -1,6 +1,13 @@
 import pandas as pd
 import os
 import csv
+import argparse
+import itertools
+import sqlite3
+import tempfile
+
+OUTPUT_FIELDS = ['ID', 'NAME', 'TYPE', 'SRC', 'REFYEAR']
+ROWS_PER_COMPANY = 6
 
 def format_discovery_csv(input_file, template_file, output_file):
     """
@@ -67,13 +74,92 @@ def format_discovery_csv(input_file, template_file, output_file):
     
     print(f"Discovery CSV generated successfully: {output_file}")
 
+def _build_report_index(conn, input_file, chunksize):
+    """Copy the report rows into an indexed SQLite table, chunksize rows at a time"""
+    conn.execute('CREATE TABLE reports (company TEXT, src TEXT, refyear TEXT)')
+    
+    with open(input_file, 'r', newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        rows = ((row['COMPANY'], row.get('SRC') or '', row.get('REFYEAR') or '') for row in reader)
+        while True:
+            chunk = list(itertools.islice(rows, chunksize))
+            if not chunk:
+                break
+            conn.executemany('INSERT INTO reports VALUES (?, ?, ?)', chunk)
+    
+    # Index entries are ordered by (company, rowid), i.e. file order within a company
+    conn.execute('CREATE INDEX reports_company ON reports (company)')
+    conn.commit()
+
+def format_discovery_csv_streaming(input_file, template_file, output_file, chunksize=100000):
+    """
+    Constant-memory version of format_discovery_csv for very large results files
+    
+    The results are streamed into an on-disk index and the template is streamed
+    row by row, so memory stays bounded by chunksize no matter how many candidate
+    rows the results file holds. Values are written exactly as they appear in the
+    input files.
+    
+    Args:
+        input_file: CSV file with the extracted financial report links
+        template_file: The discovery template CSV with IDs and NAMEs
+        output_file: The path to save the formatted discovery.csv
+        chunksize: Number of result rows inserted per batch
+    """
+    output_dir = os.path.dirname(output_file) if os.path.dirname(output_file) else '.'
+    os.makedirs(output_dir, exist_ok=True)
+    
+    for path, label in ((input_file, 'Input'), (template_file, 'Template')):
+        if not os.path.exists(path):
+            print(f"Error: {label} file {path} not found")
+            return
+    
+    index_fd, index_file = tempfile.mkstemp(suffix='.sqlite', dir=output_dir)
+    os.close(index_fd)
+    conn = sqlite3.connect(index_file)
+    try:
+        conn.execute('PRAGMA journal_mode=OFF')
+        conn.execute('PRAGMA synchronous=OFF')
+        _build_report_index(conn, input_file, chunksize)
+        
+        with open(template_file, 'r', newline='', encoding='utf-8-sig') as template, \
+             open(output_file, 'w', newline='', encoding='utf-8') as out:
+            writer = csv.writer(out)
+            writer.writerow(OUTPUT_FIELDS)
+            
+            for row in csv.DictReader(template):
+                company_id = row.get('ID') or ''
+                company_name = row['NAME']
+                
+                # First report is the FIN_REP, the next five are OTHER
+                reports = conn.execute(
+                    'SELECT src, refyear FROM reports WHERE company = ? ORDER BY rowid LIMIT ?',
+                    (company_name, ROWS_PER_COMPANY)
+                ).fetchall()
+                reports += [('', '')] * (ROWS_PER_COMPANY - len(reports))
+                
+                for i, (src, refyear) in enumerate(reports):
+                    writer.writerow([company_id, company_name, 'FIN_REP' if i == 0 else 'OTHER', src, refyear])
+    finally:
+        conn.close()
+        os.remove(index_file)
+    
+    print(f"Discovery CSV generated successfully: {output_file}")
+
 def main():
-    # Example usage
-    input_file = "results/financial_reports.csv"
-    template_file = "challenge/discovery-subset.csv"
-    output_file = "discovery.csv"
+    parser = argparse.ArgumentParser(description='Format financial report links as discovery.csv')
+    parser.add_argument('--input', default="results/financial_reports.csv", help='CSV with the extracted report links')
+    parser.add_argument('--template', default="challenge/discovery-subset.csv", help='Discovery template CSV')
+    parser.add_argument('--output', default="discovery.csv", help='Output discovery CSV')
+    parser.add_argument('--stream', action='store_true',
+                        help='Use the constant-memory mode for very large results files')
+    parser.add_argument('--chunksize', type=int, default=100000, help='Result rows read per chunk in --stream mode')
+    args = parser.parse_args()
     
-    format_discovery_csv(input_file, template_file, output_file)
+    if args.stream:
+        format_discovery_csv_streaming(args.input, args.template, args.output, chunksize=args.chunksize)
+    else:
+        format_discovery_csv(args.input, args.template, args.output)
 
 if __name__ == "__main__":
     main()
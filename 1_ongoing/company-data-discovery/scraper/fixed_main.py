@@ -20,6 +20,10 @@ import shutil
 
 # Import our fixed version
 from company_report_finder_fixed import FinancialReportFinder
+from http_session import print_connection_stats
+from negative_cache import get_negative_cache
+from fiscal_year import update_refyear_csv, DEFAULT_WORKERS
+from report_keywords import VOCABULARIES, set_vocabulary
 
 
 def setup_args():
@@ -31,6 +35,12 @@ def setup_args():
                         help='Output discovery CSV file path')
     parser.add_argument('--batch-size', type=int, default=5,
                         help='Number of companies to process in batch')
+    parser.add_argument('--refyear-from-pdf', action='store_true',
+                        help='Set REFYEAR from the fiscal year named in the first pages of each report')
+    parser.add_argument('--refyear-workers', type=int, default=DEFAULT_WORKERS,
+                        help='Worker processes for --refyear-from-pdf')
+    parser.add_argument('--report-terms', choices=VOCABULARIES, default='legacy',
+                        help="Terms that make a link a report: 'legacy' (English) or 'multilingual'")
     parser.add_argument('--single-company', type=str, default='',
                         help='Process only a single company by name')
     return parser.parse_args()
@@ -44,66 +54,69 @@ def process_batch(companies, finder, batch_size, output_dir):
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Process in batches
-    for i in range(0, total_companies, batch_size):
-        batch = companies[i:min(i+batch_size, total_companies)]
-        print(f"\nProcessing batch {i//batch_size + 1} of {(total_companies-1)//batch_size + 1}")
-        print(f"Companies in this batch: {', '.join(batch)}")
-        
-        # Process this batch
-        batch_results = []
-        for company in batch:
-            try:
-                print(f"=" * 80)
-                print(f"STARTING COMPANY: {company}")
-                print(f"Current time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                print(f"=" * 80)
-                
-                # Process one company at a time for better handling
-                company_results = finder.process_company_list([company])
-                batch_results.extend(company_results)
-                
-                # Update overall results
-                results.extend(company_results)
-                
-                # Save intermediate results
-                finder.save_to_csv(results, f"{output_dir}/financial_reports.csv")
-                
-                print(f"=" * 80)
-                print(f"COMPLETED COMPANY: {company}")
-                print(f"Current time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                print(f"=" * 80)
-                
-            except Exception as e:
-                print(f"[ERROR] Error processing company {company}: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                
-                # Add empty result for this company to maintain structure
-                results.append({
-                    'COMPANY': company,
-                    'TYPE': 'FIN_REP',
-                    'SRC': '',
-                    'REFYEAR': ''
-                })
+    # Rows are appended company by company and moved into place at the end
+    writer = finder.open_results_writer(f"{output_dir}/financial_reports.csv")
+    
+    try:
+        # Process in batches
+        for i in range(0, total_companies, batch_size):
+            batch = companies[i:min(i+batch_size, total_companies)]
+            print(f"\nProcessing batch {i//batch_size + 1} of {(total_companies-1)//batch_size + 1}")
+            print(f"Companies in this batch: {', '.join(batch)}")
+            
+            # Process this batch
+            batch_results = []
+            for company in batch:
+                try:
+                    print(f"=" * 80)
+                    print(f"STARTING COMPANY: {company}")
+                    print(f"Current time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                    print(f"=" * 80)
+                    
+                    # Process one company at a time for better handling
+                    company_results = finder.process_company_list([company], writer=writer)
+                    batch_results.extend(company_results)
+                    
+                    # Update overall results
+                    results.extend(company_results)
+                    
+                    print(f"=" * 80)
+                    print(f"COMPLETED COMPANY: {company}")
+                    print(f"Current time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                    print(f"=" * 80)
+                    
+                except Exception as e:
+                    print(f"[ERROR] Error processing company {company}: {str(e)}")
+                    import traceback
+                    traceback.print_exc()
+                    
+                    # Add empty result for this company to maintain structure
+                    results.append({
+                        'COMPANY': company,
+                        'TYPE': 'FIN_REP',
+                        'SRC': '',
+                        'REFYEAR': ''
+                    })
+                    
+                    # Save the results even after error
+                    writer.write_rows(results[-1:])
+            
+            # Save batch results
+            batch_filename = f"{output_dir}/batch_{i//batch_size + 1}.csv"
+            finder.save_to_csv(batch_results, batch_filename)
+            
+            # Pause between batches (except for the last one)
+            if i + batch_size < total_companies:
+                pause_minutes = 3
+                pause_seconds = pause_minutes * 60
+                print(f"\nPausing for {pause_minutes} minutes before next batch...")
                 
-                # Save the results even after error
-                finder.save_to_csv(results, f"{output_dir}/financial_reports.csv")
-        
-        # Save batch results
-        batch_filename = f"{output_dir}/batch_{i//batch_size + 1}.csv"
-        finder.save_to_csv(batch_results, batch_filename)
-        
-        # Pause between batches (except for the last one)
-        if i + batch_size < total_companies:
-            pause_minutes = 3
-            pause_seconds = pause_minutes * 60
-            print(f"\nPausing for {pause_minutes} minutes before next batch...")
-            
-            # Show a countdown
-            for remaining in range(pause_seconds, 0, -30):
-                print(f"  {remaining//60} minutes {remaining%60} seconds remaining...")
-                time.sleep(30)
+                # Show a countdown
+                for remaining in range(pause_seconds, 0, -30):
+                    print(f"  {remaining//60} minutes {remaining%60} seconds remaining...")
+                    time.sleep(30)
+    finally:
+        writer.close()
     
     return results
 
@@ -193,6 +206,7 @@ def main():
     """Main function"""
     # Parse arguments
     args = setup_args()
+    set_vocabulary(args.report_terms)
     
     print("=" * 80)
     print("Financial Reports Discovery")
@@ -240,6 +254,10 @@ def main():
         try:
             results = process_batch(companies, finder, args.batch_size, 'results')
             
+            # Read the fiscal year from the reports themselves, a few hundred KB each
+            if args.refyear_from_pdf:
+                update_refyear_csv("results/financial_reports.csv", workers=args.refyear_workers)
+            
             # Format to discovery.csv
             finder.format_to_discovery_csv(
                 input_file="results/financial_reports.csv",
@@ -255,6 +273,12 @@ def main():
             print(f"- Found reports for {successful_companies}/{len(companies)} companies")
             print(f"- Total reports found: {sum(1 for r in results if r['SRC'])}")
             print(f"- Output file: {args.output}")
+            print("- Requests per host:")
+            finder.scheduler.print_stats()
+            print_connection_stats()
+            finder.response_cache.print_stats()
+            finder.verification_cache.print_stats()
+            get_negative_cache().print_stats()
             
             # Create code.zip
             create_code_zip()
@@ -278,6 +302,7 @@ def main():
             
         except KeyboardInterrupt:
             print("\nProcess interrupted by user")
+            print("Rows of finished companies are in results/financial_reports.csv")
             print("Saving partial results...")
             
             # Try to save what we have
@@ -317,6 +342,10 @@ import shutil
 
 # Import our fixed version
 from company_report_finder_fixed import FinancialReportFinder
+from http_session import print_connection_stats
+from negative_cache import get_negative_cache
+from fiscal_year import update_refyear_csv, DEFAULT_WORKERS
+from report_keywords import VOCABULARIES, set_vocabulary
 
 
 def setup_args():
@@ -328,6 +357,12 @@ def setup_args():
                         help='Output discovery CSV file path')
     parser.add_argument('--batch-size', type=int, default=5,
                         help='Number of companies to process in batch')
+    parser.add_argument('--refyear-from-pdf', action='store_true',
+                        help='Set REFYEAR from the fiscal year named in the first pages of each report')
+    parser.add_argument('--refyear-workers', type=int, default=DEFAULT_WORKERS,
+                        help='Worker processes for --refyear-from-pdf')
+    parser.add_argument('--report-terms', choices=VOCABULARIES, default='legacy',
+                        help="Terms that make a link a report: 'legacy' (English) or 'multilingual'")
     return parser.parse_args()
 
 
@@ -339,56 +374,59 @@ def process_batch(companies, finder, batch_size, output_dir):
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Process in batches
-    for i in range(0, total_companies, batch_size):
-        batch = companies[i:min(i+batch_size, total_companies)]
-        print(f"\nProcessing batch {i//batch_size + 1} of {(total_companies-1)//batch_size + 1}")
-        print(f"Companies in this batch: {', '.join(batch)}")
-        
-        # Process this batch
-        batch_results = []
-        for company in batch:
-            try:
-                # Process one company at a time for better handling
-                company_results = finder.process_company_list([company])
-                batch_results.extend(company_results)
-                
-                # Update overall results
-                results.extend(company_results)
-                
-                # Save intermediate results
-                finder.save_to_csv(results, f"{output_dir}/financial_reports.csv")
-                
-            except Exception as e:
-                print(f"Error processing company {company}: {e}")
-                import traceback
-                traceback.print_exc()
-                
-                # Add empty result for this company to maintain structure
-                results.append({
-                    'COMPANY': company,
-                    'TYPE': 'FIN_REP',
-                    'SRC': '',
-                    'REFYEAR': ''
-                })
+    # Rows are appended company by company and moved into place at the end
+    writer = finder.open_results_writer(f"{output_dir}/financial_reports.csv")
+    
+    try:
+        # Process in batches
+        for i in range(0, total_companies, batch_size):
+            batch = companies[i:min(i+batch_size, total_companies)]
+            print(f"\nProcessing batch {i//batch_size + 1} of {(total_companies-1)//batch_size + 1}")
+            print(f"Companies in this batch: {', '.join(batch)}")
+            
+            # Process this batch
+            batch_results = []
+            for company in batch:
+                try:
+                    # Process one company at a time for better handling
+                    company_results = finder.process_company_list([company], writer=writer)
+                    batch_results.extend(company_results)
+                    
+                    # Update overall results
+                    results.extend(company_results)
+                    
+                except Exception as e:
+                    print(f"Error processing company {company}: {e}")
+                    import traceback
+                    traceback.print_exc()
+                    
+                    # Add empty result for this company to maintain structure
+                    results.append({
+                        'COMPANY': company,
+                        'TYPE': 'FIN_REP',
+                        'SRC': '',
+                        'REFYEAR': ''
+                    })
+                    
+                    # Save the results even after error
+                    writer.write_rows(results[-1:])
+            
+            # Save batch results
+            batch_filename = f"{output_dir}/batch_{i//batch_size + 1}.csv"
+            finder.save_to_csv(batch_results, batch_filename)
+            
+            # Pause between batches (except for the last one)
+            if i + batch_size < total_companies:
+                pause_minutes = 3
+                pause_seconds = pause_minutes * 60
+                print(f"\nPausing for {pause_minutes} minutes before next batch...")
                 
-                # Save the results even after error
-                finder.save_to_csv(results, f"{output_dir}/financial_reports.csv")
-        
-        # Save batch results
-        batch_filename = f"{output_dir}/batch_{i//batch_size + 1}.csv"
-        finder.save_to_csv(batch_results, batch_filename)
-        
-        # Pause between batches (except for the last one)
-        if i + batch_size < total_companies:
-            pause_minutes = 3
-            pause_seconds = pause_minutes * 60
-            print(f"\nPausing for {pause_minutes} minutes before next batch...")
-            
-            # Show a countdown
-            for remaining in range(pause_seconds, 0, -30):
-                print(f"  {remaining//60} minutes {remaining%60} seconds remaining...")
-                time.sleep(30)
+                # Show a countdown
+                for remaining in range(pause_seconds, 0, -30):
+                    print(f"  {remaining//60} minutes {remaining%60} seconds remaining...")
+                    time.sleep(30)
+    finally:
+        writer.close()
     
     return results
 
@@ -424,6 +462,7 @@ def main():
     """Main function"""
     # Parse arguments
     args = setup_args()
+    set_vocabulary(args.report_terms)
     
     print("=" * 80)
     print("Financial Reports Discovery")
@@ -465,6 +504,10 @@ def main():
         try:
             results = process_batch(companies, finder, args.batch_size, 'results')
             
+            # Read the fiscal year from the reports themselves, a few hundred KB each
+            if args.refyear_from_pdf:
+                update_refyear_csv("results/financial_reports.csv", workers=args.refyear_workers)
+            
             # Format to discovery.csv
             finder.format_to_discovery_csv(
                 input_file="results/financial_reports.csv",
@@ -480,6 +523,12 @@ def main():
             print(f"- Found reports for {successful_companies}/{len(companies)} companies")
             print(f"- Total reports found: {sum(1 for r in results if r['SRC'])}")
             print(f"- Output file: {args.output}")
+            print("- Requests per host:")
+            finder.scheduler.print_stats()
+            print_connection_stats()
+            finder.response_cache.print_stats()
+            finder.verification_cache.print_stats()
+            get_negative_cache().print_stats()
             
             # Create code.zip
             create_code_zip()
@@ -503,6 +552,7 @@ def main():
             
         except KeyboardInterrupt:
             print("\nProcess interrupted by user")
+            print("Rows of finished companies are in results/financial_reports.csv")
             print("Saving partial results...")
             
             # Try to save what we have
@@ -0,0 +1,57 @@
+import csv
+import os
+
+
+class IncrementalCSVWriter:
+    """
+    Write a CSV file company by company without rewriting earlier rows
+
+    Rows go to '<filename>.partial', which is flushed and fsynced after every
+    company, so a crash never loses finished companies. close() atomically
+    renames the partial file to the final filename. A partial file left behind
+    by a crash is moved into place when the next writer for the file opens.
+    """
+    def __init__(self, filename, fieldnames):
+        self.filename = filename
+        self.partial_filename = filename + '.partial'
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        self._recover_partial()
+        
+        self.file = open(self.partial_filename, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=fieldnames)
+        self.writer.writeheader()
+        self._sync()
+    
+    def _recover_partial(self):
+        """Move the rows of a crashed run into place, dropping a half-written last row"""
+        if not os.path.exists(self.partial_filename):
+            return
+        
+        with open(self.partial_filename, 'rb+') as f:
+            data = f.read()
+            f.truncate(data.rfind(b'\n') + 1)
+        os.replace(self.partial_filename, self.filename)
+        print(f"Recovered rows of an interrupted run from {self.partial_filename} into {self.filename}")
+    
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+    
+    def write_rows(self, rows):
+        """Append the rows of one company and make sure they reach the disk"""
+        self.writer.writerows(rows)
+        self._sync()
+    
+    def close(self):
+        """Move the finished file into place"""
+        if self.file.closed:
+            return
+        self.file.close()
+        os.replace(self.partial_filename, self.filename)
+        print(f"Results saved to {self.filename}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()